@@ -0,0 +1,34 @@
+"""Add extracted text columns to student_project_contents
+
+Revision ID: 20251217_0012
+Revises: 20251216_0011
+Create Date: 2025-12-17
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251217_0012"
+down_revision: Union[str, None] = "20251216_0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("student_project_contents", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("extracted_text", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("page_count", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("char_count", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("extraction_status", sa.String(length=50), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("student_project_contents", schema=None) as batch_op:
+        batch_op.drop_column("extraction_status")
+        batch_op.drop_column("char_count")
+        batch_op.drop_column("page_count")
+        batch_op.drop_column("extracted_text")
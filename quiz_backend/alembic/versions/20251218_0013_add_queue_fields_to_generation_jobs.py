@@ -0,0 +1,44 @@
+"""Add queue lease and retry fields to generation_jobs
+
+Revision ID: 20251218_0013
+Revises: 20251217_0012
+Create Date: 2025-12-18
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251218_0013"
+down_revision: Union[str, None] = "20251217_0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("generation_jobs", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("max_attempts", sa.Integer(), nullable=False, server_default="3"))
+        batch_op.add_column(sa.Column("available_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("locked_by", sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+        batch_op.create_index(
+            "ix_generation_jobs_status_available_at",
+            ["status", "available_at"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("generation_jobs", schema=None) as batch_op:
+        batch_op.drop_index("ix_generation_jobs_status_available_at")
+        batch_op.drop_column("heartbeat_at")
+        batch_op.drop_column("lease_expires_at")
+        batch_op.drop_column("locked_by")
+        batch_op.drop_column("available_at")
+        batch_op.drop_column("max_attempts")
+        batch_op.drop_column("attempts")
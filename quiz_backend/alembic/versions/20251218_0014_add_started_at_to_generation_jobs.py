@@ -0,0 +1,28 @@
+"""Add started_at to generation_jobs
+
+Revision ID: 20251218_0014
+Revises: 20251218_0013
+Create Date: 2025-12-18
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251218_0014"
+down_revision: Union[str, None] = "20251218_0013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("generation_jobs", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("started_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("generation_jobs", schema=None) as batch_op:
+        batch_op.drop_column("started_at")
@@ -0,0 +1,41 @@
+"""Add generation_cache_entries table
+
+Revision ID: 20251219_0015
+Revises: 20251218_0014
+Create Date: 2025-12-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251219_0015"
+down_revision: Union[str, None] = "20251218_0014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "generation_cache_entries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("content_type", sa.String(length=50), nullable=False),
+        sa.Column("source_hash", sa.String(length=64), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_generation_cache_entries_cache_key", "generation_cache_entries", ["cache_key"])
+    op.create_index("ix_generation_cache_entries_last_used_at", "generation_cache_entries", ["last_used_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generation_cache_entries_last_used_at", table_name="generation_cache_entries")
+    op.drop_index("ix_generation_cache_entries_cache_key", table_name="generation_cache_entries")
+    op.drop_table("generation_cache_entries")
@@ -0,0 +1,34 @@
+"""Add cached_tokens to token_usage and generation_jobs
+
+Revision ID: 20251219_0016
+Revises: 20251219_0015
+Create Date: 2025-12-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251219_0016"
+down_revision: Union[str, None] = "20251219_0015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("token_usage", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("cached_tokens", sa.Integer(), nullable=False, server_default="0"))
+
+    with op.batch_alter_table("generation_jobs", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("cached_tokens", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("generation_jobs", schema=None) as batch_op:
+        batch_op.drop_column("cached_tokens")
+
+    with op.batch_alter_table("token_usage", schema=None) as batch_op:
+        batch_op.drop_column("cached_tokens")
@@ -0,0 +1,41 @@
+"""Add project_content_chunks table
+
+Revision ID: 20251220_0017
+Revises: 20251219_0016
+Create Date: 2025-12-20
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251220_0017"
+down_revision: Union[str, None] = "20251219_0016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "project_content_chunks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("student_projects.id"), nullable=False),
+        sa.Column("content_id", sa.Integer(), sa.ForeignKey("student_project_contents.id"), nullable=False),
+        sa.Column("chunk_index", sa.Integer(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("token_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("term_counts", sa.JSON(), nullable=False),
+        sa.Column("embedding", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_project_content_chunks_project_id", "project_content_chunks", ["project_id"])
+    op.create_index("ix_project_content_chunks_content_id", "project_content_chunks", ["content_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_project_content_chunks_content_id", table_name="project_content_chunks")
+    op.drop_index("ix_project_content_chunks_project_id", table_name="project_content_chunks")
+    op.drop_table("project_content_chunks")
@@ -0,0 +1,52 @@
+"""Add chat_sessions and chat_messages tables
+
+Revision ID: 20251220_0018
+Revises: 20251220_0017
+Create Date: 2025-12-20
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251220_0018"
+down_revision: Union[str, None] = "20251220_0017"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("student_projects.id"), nullable=False),
+        sa.Column("user_id", sa.String(length=255), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("content_id", sa.Integer(), sa.ForeignKey("student_project_contents.id"), nullable=True),
+        sa.Column("title", sa.String(length=255), nullable=True),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("summarized_through_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_chat_sessions_project_id_user_id", "chat_sessions", ["project_id", "user_id"])
+
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("session_id", sa.Integer(), sa.ForeignKey("chat_sessions.id"), nullable=False),
+        sa.Column("role", sa.String(length=20), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("token_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_chat_messages_session_id", "chat_messages", ["session_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_messages_session_id", table_name="chat_messages")
+    op.drop_table("chat_messages")
+    op.drop_index("ix_chat_sessions_project_id_user_id", table_name="chat_sessions")
+    op.drop_table("chat_sessions")
@@ -0,0 +1,45 @@
+"""Add indexes for the student project listing
+
+Revision ID: 20251221_0019
+Revises: 20251220_0018
+Create Date: 2025-12-21
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251221_0019"
+down_revision: Union[str, None] = "20251220_0018"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_INDEXES = (
+    ("ix_student_projects_user_id_created_at_id", "student_projects", ["user_id", "created_at", "id"]),
+    ("ix_student_project_contents_project_id", "student_project_contents", ["project_id"]),
+    ("ix_student_project_quiz_refs_project_id", "student_project_quiz_references", ["project_id"]),
+    ("ix_student_project_flashcard_refs_project_id", "student_project_flashcard_references", ["project_id"]),
+    ("ix_student_project_essay_refs_project_id", "student_project_essay_references", ["project_id"]),
+)
+
+
+def _index_exists(inspector, table_name: str, index_name: str) -> bool:
+    return any(index["name"] == index_name for index in inspector.get_indexes(table_name))
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for index_name, table_name, columns in _INDEXES:
+        if not _index_exists(inspector, table_name, index_name):
+            op.create_index(index_name, table_name, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for index_name, table_name, _ in reversed(_INDEXES):
+        if _index_exists(inspector, table_name, index_name):
+            op.drop_index(index_name, table_name=table_name)
@@ -0,0 +1,28 @@
+"""Add content_version to student_projects
+
+Revision ID: 20251221_0020
+Revises: 20251221_0019
+Create Date: 2025-12-21
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251221_0020"
+down_revision: Union[str, None] = "20251221_0019"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("student_projects", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("content_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("student_projects", schema=None) as batch_op:
+        batch_op.drop_column("content_version")
@@ -0,0 +1,59 @@
+"""Add user_analytics and user_category_analytics rollup tables
+
+Revision ID: 20251222_0021
+Revises: 20251221_0020
+Create Date: 2025-12-22
+
+Rollups are built from existing attempts the first time a user's
+analytics are read, so no backfill runs here.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251222_0021"
+down_revision: Union[str, None] = "20251221_0020"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_analytics",
+        sa.Column("user_id", sa.String(length=255), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("total_quizzes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_time_spent", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("score_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("best_score", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("scores", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "user_category_analytics",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.String(length=255), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("correct_answers", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_questions", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index(
+        "ix_user_category_analytics_user_id_category",
+        "user_category_analytics",
+        ["user_id", "category"],
+        unique=True,
+    )
+
+    op.create_index("ix_quiz_attempts_user_id_timestamp", "quiz_attempts", ["user_id", "timestamp"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_quiz_attempts_user_id_timestamp", table_name="quiz_attempts")
+    op.drop_index("ix_user_category_analytics_user_id_category", table_name="user_category_analytics")
+    op.drop_table("user_category_analytics")
+    op.drop_table("user_analytics")
@@ -0,0 +1,43 @@
+"""Add generation_usage per-period counters
+
+Revision ID: 20251223_0022
+Revises: 20251222_0021
+Create Date: 2025-12-23
+
+Counters are seeded from the content tables the first time a user's
+current period is checked, so no backfill runs here.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251223_0022"
+down_revision: Union[str, None] = "20251222_0021"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "generation_usage",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.String(length=255), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("period_start", sa.DateTime(), nullable=False),
+        sa.Column("generations", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        "ix_generation_usage_user_id_period_start",
+        "generation_usage",
+        ["user_id", "period_start"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generation_usage_user_id_period_start", table_name="generation_usage")
+    op.drop_table("generation_usage")
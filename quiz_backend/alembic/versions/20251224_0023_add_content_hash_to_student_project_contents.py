@@ -0,0 +1,33 @@
+"""Add content_hash to student_project_contents
+
+Revision ID: 20251224_0023
+Revises: 20251223_0022
+Create Date: 2025-12-24
+
+Existing rows keep a NULL hash; their text cache entries are left to the
+size and age limits of the cache.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251224_0023"
+down_revision: Union[str, None] = "20251223_0022"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("student_project_contents", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("content_hash", sa.String(length=64), nullable=True))
+        batch_op.create_index("ix_student_project_contents_content_hash", ["content_hash"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("student_project_contents", schema=None) as batch_op:
+        batch_op.drop_index("ix_student_project_contents_content_hash")
+        batch_op.drop_column("content_hash")
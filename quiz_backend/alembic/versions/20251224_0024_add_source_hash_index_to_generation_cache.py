@@ -0,0 +1,32 @@
+"""Index generation_cache_entries by source_hash
+
+Revision ID: 20251224_0024
+Revises: 20251224_0023
+Create Date: 2025-12-24
+
+Data erasure deletes the cached results generated from a user's documents
+by their source hash.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20251224_0024"
+down_revision: Union[str, None] = "20251224_0023"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_generation_cache_entries_source_hash",
+        "generation_cache_entries",
+        ["source_hash"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generation_cache_entries_source_hash", table_name="generation_cache_entries")
@@ -20,7 +20,9 @@ from backend.api_routers.routers import (
     payment_router,
     gdpr_router,
 )
+from backend.components.custom_components import shutdown_extraction_pool
 from backend.middleware.rate_limit import RateLimitMiddleware
+from backend.services.job_queue import start_worker_threads
 
 app = FastAPI(title="Quiz Maker API")
 
@@ -66,3 +68,21 @@ app.include_router(config_router.router)
 app.include_router(admin_router.router)
 app.include_router(payment_router.router)
 app.include_router(gdpr_router.router)
+
+
+@app.on_event("startup")
+def start_embedded_generation_workers() -> None:
+    """
+    Run generation queue workers inside the API process unless a separate
+    `python -m backend.worker` deployment handles the queue
+    (set GENERATION_EMBEDDED_WORKERS=0 in that case).
+    """
+    embedded_workers = int(os.getenv("GENERATION_EMBEDDED_WORKERS", "2"))
+    if embedded_workers > 0:
+        start_worker_threads(student_project_router.GENERATION_JOB_PROCESSORS, embedded_workers)
+
+
+@app.on_event("shutdown")
+def stop_pdf_extraction_pool() -> None:
+    """Stop the worker processes used for parallel PDF text extraction."""
+    shutdown_extraction_pool()
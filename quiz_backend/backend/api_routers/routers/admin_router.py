@@ -91,6 +91,7 @@ async def get_admin_stats(
             func.sum(TokenUsage.input_tokens).label("total_input_tokens"),
             func.sum(TokenUsage.output_tokens).label("total_output_tokens"),
             func.sum(TokenUsage.total_tokens).label("total_tokens"),
+            func.sum(TokenUsage.cached_tokens).label("total_cached_tokens"),
         ).first()
         
         # From GenerationJob table (async jobs)
@@ -98,6 +99,7 @@ async def get_admin_stats(
             func.sum(GenerationJob.input_tokens).label("job_input_tokens"),
             func.sum(GenerationJob.output_tokens).label("job_output_tokens"),
             func.sum(GenerationJob.total_tokens).label("job_total_tokens"),
+            func.sum(GenerationJob.cached_tokens).label("job_cached_tokens"),
         ).filter(
             GenerationJob.input_tokens.isnot(None)
         ).first()
@@ -106,6 +108,7 @@ async def get_admin_stats(
         total_input_tokens = (token_usage_stats.total_input_tokens or 0) + (job_token_stats.job_input_tokens or 0)
         total_output_tokens = (token_usage_stats.total_output_tokens or 0) + (job_token_stats.job_output_tokens or 0)
         total_tokens = (token_usage_stats.total_tokens or 0) + (job_token_stats.job_total_tokens or 0)
+        total_cached_tokens = (token_usage_stats.total_cached_tokens or 0) + (job_token_stats.job_cached_tokens or 0)
         
         return JSONResponse(
             content={
@@ -120,6 +123,7 @@ async def get_admin_stats(
                 "total_input_tokens": int(total_input_tokens),
                 "total_output_tokens": int(total_output_tokens),
                 "total_tokens": int(total_tokens),
+                "total_cached_tokens": int(total_cached_tokens),
             },
             headers={"Content-Type": "application/json; charset=utf-8"}
         )
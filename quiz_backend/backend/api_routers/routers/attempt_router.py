@@ -17,7 +17,15 @@ from backend.database.sqlite_dal import (
     StudentProjectQuizReference,
     User,
 )
+from backend.services.user_analytics import (
+    GENERATED_QUIZ_TOPIC_ID,
+    attempt_category,
+    load_user_analytics,
+    recent_attempts,
+    record_attempt,
+)
 from backend.utils.feedback import generate_quiz_feedback
+from backend.utils.generation_executor import run_generation
 from backend.components.custom_components import PDFTextExtractor
 
 router = APIRouter()
@@ -62,6 +70,10 @@ def _retrieve_source_material_for_quiz(
         if not content:
             return None
         
+        # Prefer the text stored when the PDF was uploaded
+        if content.extracted_text:
+            return content.extracted_text
+
         # If it's a PDF, extract text
         if content.content_type == "pdf" and content.content_url:
             import os
@@ -268,6 +280,7 @@ async def record_quiz_result(request: QuizAttemptResultRequest, db: Session = De
     )
     
     db.add(quiz_attempt)
+    record_attempt(db, quiz_attempt, attempt_category(request.topic_id, topic))
     db.commit()
     db.refresh(quiz_attempt)
 
@@ -286,7 +299,8 @@ async def record_quiz_result(request: QuizAttemptResultRequest, db: Session = De
             correct_answers=request.correct_answers,
             db=db,
         )
-        ai_feedback = generate_quiz_feedback(
+        ai_feedback = await run_generation(
+            generate_quiz_feedback,
             topic_name=topic_name,
             score=request.score,
             total_questions=request.total_questions,
@@ -573,11 +587,12 @@ async def get_user_analytics(user_id: str, db: Session = Depends(get_db)) -> JSO
         .count()
     )
 
-    # Get all attempts for the user
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == user_id).order_by(QuizAttempt.timestamp.desc()).all()
-    logging.warning(f"[ANALYTICS] Found {len(attempts)} attempts for user_id: {user_id}")
+    # Read the pre-aggregated rollup instead of rescanning the attempt history
+    rollup, category_rows = load_user_analytics(db, user_id)
+    db.commit()  # Persist a rollup rebuilt on first use
+    logging.warning(f"[ANALYTICS] Found {rollup.total_quizzes} attempts for user_id: {user_id}")
     
-    if not attempts:
+    if not rollup.total_quizzes:
         return JSONResponse(
             content={
                 "user_id": user_id,
@@ -599,70 +614,33 @@ async def get_user_analytics(user_id: str, db: Session = Depends(get_db)) -> JSO
         )
     
     # Calculate basic statistics
-    total_quizzes = len(attempts)
-    total_time_spent = sum(attempt.time_taken_seconds for attempt in attempts)
-    average_score = sum(attempt.percentage_score for attempt in attempts) / total_quizzes
-    best_score = max(attempt.percentage_score for attempt in attempts)
+    total_quizzes = rollup.total_quizzes
+    total_time_spent = rollup.total_time_spent
+    average_score = rollup.score_sum / total_quizzes
+    best_score = rollup.best_score
     
-    # Get topic details and calculate category statistics
-    category_attempts = {}
-    category_correct_answers = {}
-    category_total_questions = {}
-    scores = []
-    recent_history = []
+    # Category statistics, in order of first attempt
+    category_attempts = {row.category: row.attempts for row in category_rows}
+    category_correct_answers = {row.category: row.correct_answers for row in category_rows}
+    category_total_questions = {row.category: row.total_questions for row in category_rows}
     
-    # Sort attempts by timestamp (oldest first) for proper trend analysis
-    attempts_chronological = sorted(attempts, key=lambda x: x.timestamp)
-    
-    for attempt in attempts_chronological:
-        if attempt.topic_id == 999:
-            # Handle URL/PDF quizzes
-            category = "Generated Content"
-            topic_name = attempt.source_info if attempt.source_info else "URL/PDF Quiz"
-        else:
-            # Handle regular quizzes
-            topic = db.query(QuizTopic).filter(QuizTopic.id == attempt.topic_id).first()
-            if topic:
-                category = topic.category
-                topic_name = topic.topic
-            else:
-                category = "Unknown Category"
-                topic_name = "Unknown Topic"
-        
-        score_percentage = attempt.percentage_score
-        
-        # Track category attempts
-        category_attempts[category] = category_attempts.get(category, 0) + 1
-        
-        # Track category accuracy
-        category_correct_answers[category] = category_correct_answers.get(category, 0) + attempt.score
-        category_total_questions[category] = category_total_questions.get(category, 0) + attempt.total_questions
-        
-        # Store scores for trend analysis (in chronological order)
-        scores.append(score_percentage)
+    # Scores in chronological order for trend analysis
+    scores = list(rollup.scores or [])
     
     # Get recent history (most recent attempts)
-    recent_attempts = sorted(attempts, key=lambda x: x.timestamp, reverse=True)[:5]
-    for attempt in recent_attempts:
-        if attempt.topic_id == 999:
+    recent_history = []
+    for attempt, topic in recent_attempts(db, user_id, limit=5):
+        if attempt.topic_id == GENERATED_QUIZ_TOPIC_ID:
             # Handle URL/PDF quizzes
-            category = "Generated Content"
             topic_name = attempt.source_info if attempt.source_info else "URL/PDF Quiz"
         else:
-            # Handle regular quizzes
-            topic = db.query(QuizTopic).filter(QuizTopic.id == attempt.topic_id).first()
-            if topic:
-                category = topic.category
-                topic_name = topic.topic
-            else:
-                category = "Unknown Category"
-                topic_name = "Unknown Topic"
+            topic_name = topic.topic if topic else "Unknown Topic"
         
         recent_history.append({
             "id": attempt.id,
             "topic_id": attempt.topic_id,
             "topic_name": topic_name,
-            "category": category,
+            "category": attempt_category(attempt.topic_id, topic),
             "subcategory": attempt.source_type if attempt.source_type else "Quiz",
             "timestamp": attempt.timestamp.isoformat(),
             "score": attempt.score,
@@ -711,8 +689,6 @@ async def get_user_analytics(user_id: str, db: Session = Depends(get_db)) -> JSO
         elif accuracy < 0.6:  # Below 60%
             weaknesses.append(category)
     
-    # Scores are already in chronological order (oldest to newest) for trend analysis
-    
     logging.warning(f"[ANALYTICS] Returning analytics for user_id: {user_id}")
     return JSONResponse(
         content={
@@ -2,7 +2,7 @@ from datetime import date, timedelta
 from enum import Enum
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr, Field
@@ -15,11 +15,13 @@ from backend.utils.auth import (
     create_access_token,
     create_user,
     get_user_by_id,
+    verify_request_token,
     verify_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
 from backend.utils.admin import get_user_account_type
-from backend.utils.credits import count_monthly_generations
+from backend.services.principals import invalidate_principal, load_current_user
+from backend.utils.credits import monthly_generations_used
 from backend.config import get_pro_generation_limit
 
 router = APIRouter()
@@ -240,7 +242,7 @@ async def get_current_user_subscription(
             display_plan_type = "pro"
 
         pro_monthly_limit = get_pro_generation_limit()
-        monthly_generations = count_monthly_generations(db, user, active_subscription)
+        monthly_generations = monthly_generations_used(db, user, active_subscription)
         remaining_generations = max(0, pro_monthly_limit - monthly_generations)
 
         subscription_info = SubscriptionInfo(
@@ -312,6 +314,7 @@ async def update_current_user(
     update_data.apply(user)
     db.add(user)
     db.commit()
+    invalidate_principal([user.id])
     db.refresh(user)
 
     return _serialize_user(user, db)
@@ -319,13 +322,14 @@ async def update_current_user(
 
 # Optional dependency to get current user
 async def get_optional_current_user_dependency(
+    request: Request,
     token: Optional[str] = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> Optional[User]:
     if not token:
         return None
 
-    payload = verify_token(token)
+    payload = verify_request_token(request, token)
     if payload is None:
         return None
 
@@ -333,17 +337,17 @@ async def get_optional_current_user_dependency(
     if not user_id:
         return None
 
-    user = get_user_by_id(db, user_id)
-    return user
+    return load_current_user(db, user_id)
 
 
 # Dependency to get current user
 async def get_current_user_dependency(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> User:
     """Dependency to get current authenticated user"""
-    payload = verify_token(token)
+    payload = verify_request_token(request, token)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -358,7 +362,7 @@ async def get_current_user_dependency(
             detail="Invalid authentication credentials",
         )
     
-    user = get_user_by_id(db, user_id)
+    user = load_current_user(db, user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -389,7 +393,7 @@ def _serialize_user(user: User, db: Session) -> UserResponse:
             display_plan_type = "pro"
 
         pro_monthly_limit = get_pro_generation_limit()
-        monthly_generations = count_monthly_generations(db, user, active_subscription)
+        monthly_generations = monthly_generations_used(db, user, active_subscription)
         remaining_generations = max(0, pro_monthly_limit - monthly_generations)
 
         subscription_info = SubscriptionInfo(
@@ -5,22 +5,55 @@ import datetime
 import requests
 from typing import Optional
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 import logging
 
 from backend.api_routers.schemas import EssayQARequest, StoreEssayAnswerRequest, StoreEssayAnswersRequest
 from backend.database.db import get_db
 from backend.database.sqlite_dal import EssayQATopic, EssayQAQuestion, TokenUsage
-from backend.utils.utils import generate_essay_qa, generate_essay_qa_from_pdf
+from backend.services.generated_content import save_essay_qa
+from backend.services.student_projects import bump_content_version
+from backend.utils.utils import generate_essay_qa, generate_essay_qa_from_pdf, generate_essay_qa_from_text
 from backend.api_routers.routers.auth_router import get_current_user_dependency
 from backend.database.sqlite_dal import User as UserModel
-from backend.utils.credits import consume_generation_token
+from backend.utils.credits import check_generation_token_available, consume_generation_token
 from backend.utils.feedback_context import collect_feedback_context
+from backend.utils.generation_executor import run_generation
+from backend.utils.sse import persist_for_user, sse_response, stream_generation
 
 router = APIRouter()
 
 
+def _save_generated_essay_qa(
+    db: Session,
+    user: UserModel,
+    essay_qa_data: dict,
+    token_usage: dict,
+    difficulty: str,
+) -> dict:
+    """Store generated essay questions, consume the generation token and record usage."""
+    # Store Essay QA in database
+    essay_qa_topic_id = save_essay_qa(db, essay_qa_data, user.id, difficulty)
+
+    # Consume 1 token for this essay generation
+    consume_generation_token(db, user, amount=1)
+
+    # Store token usage
+    token_usage_record = TokenUsage(
+        user_id=user.id,
+        generation_type="essay_qa",
+        topic_id=essay_qa_topic_id,
+        input_tokens=token_usage.get("input_tokens", 0),
+        output_tokens=token_usage.get("output_tokens", 0),
+        total_tokens=token_usage.get("total_tokens", 0),
+        cached_tokens=token_usage.get("cached_tokens", 0),
+    )
+    db.add(token_usage_record)
+
+    return essay_qa_data
+
+
 @router.post("/generate-essay-qa", tags=["EssayQA"])
 async def create_essay_qa(
     request: EssayQARequest,
@@ -40,66 +73,15 @@ async def create_essay_qa(
 
         feedback_context = collect_feedback_context(db, user_id=current_user.id)
 
-        essay_qa_data, token_usage = generate_essay_qa(
+        essay_qa_data, token_usage = await run_generation(
+            generate_essay_qa,
             url,
             request.num_questions,
             request.difficulty,
             feedback=feedback_context,
         )
 
-        # Store Essay QA in database
-        try:
-            # Try to create with difficulty first
-            essay_qa_topic = EssayQATopic(
-                topic=essay_qa_data["topic"],
-                category=essay_qa_data["category"],
-                subcategory=essay_qa_data["subcategory"],
-                difficulty=request.difficulty,  # Store the difficulty level
-                creation_timestamp=datetime.datetime.now(),
-                created_by_user_id=current_user.id,
-            )
-            db.add(essay_qa_topic)
-            db.flush()  # Get the ID of the newly created topic
-        except Exception as e:
-            # Fallback: create without difficulty if column doesn't exist
-            logging.warning(f"Creating essay topic without difficulty column: {e}")
-            db.rollback()  # Rollback the failed transaction
-            
-            # Create without difficulty field
-            essay_qa_topic = EssayQATopic(
-                topic=essay_qa_data["topic"],
-                category=essay_qa_data["category"],
-                subcategory=essay_qa_data["subcategory"],
-                creation_timestamp=datetime.datetime.now(),
-                created_by_user_id=current_user.id,
-            )
-            db.add(essay_qa_topic)
-            db.flush()  # Get the ID of the newly created topic
-
-        # Add questions
-        for q in essay_qa_data["questions"]:
-            essay_qa_question = EssayQAQuestion(
-                question=q["question"],
-                full_answer=q["full_answer"],
-                key_info=q["key_info"],
-                topic_id=essay_qa_topic.id,
-            )
-            db.add(essay_qa_question)
-
-        # Consume 1 token for this essay generation
-        consume_generation_token(db, current_user, amount=1)
-        
-        # Store token usage
-        token_usage_record = TokenUsage(
-            user_id=current_user.id,
-            generation_type="essay_qa",
-            topic_id=essay_qa_topic.id,
-            input_tokens=token_usage.get("input_tokens", 0),
-            output_tokens=token_usage.get("output_tokens", 0),
-            total_tokens=token_usage.get("total_tokens", 0),
-        )
-        db.add(token_usage_record)
-        
+        _save_generated_essay_qa(db, current_user, essay_qa_data, token_usage, request.difficulty)
         db.commit()
         return JSONResponse(
             content=essay_qa_data,
@@ -113,6 +95,9 @@ async def create_essay_qa(
             )
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -120,6 +105,49 @@ async def create_essay_qa(
         )
 
 
+@router.post("/generate-essay-qa/stream", tags=["EssayQA"])
+async def create_essay_qa_stream(
+    request: EssayQARequest,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user_dependency),
+) -> StreamingResponse:
+    """
+    Same as /generate-essay-qa, streamed as Server-Sent Events.
+
+    Each question is sent as an `item` event as soon as the model has written
+    it; the saved question set follows as the `done` event.
+    """
+    url = str(request.url).rstrip("/")
+    if request.difficulty not in ["easy", "medium", "hard"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid difficulty level. Choose from: easy, medium, hard",
+        )
+
+    check_generation_token_available(db, current_user, amount=1)
+    feedback_context = collect_feedback_context(db, user_id=current_user.id)
+    db.rollback()  # Release the user row locked by the availability check
+
+    # From here on, failures are reported as an `error` event inside the stream
+    persist = persist_for_user(
+        current_user.id,
+        lambda session, user, essay_qa_data, token_usage: _save_generated_essay_qa(
+            session, user, essay_qa_data, token_usage, request.difficulty
+        ),
+    )
+    return sse_response(
+        stream_generation(
+            generate_essay_qa,
+            url,
+            request.num_questions,
+            request.difficulty,
+            feedback=feedback_context,
+            item_key="questions",
+            persist=persist,
+        )
+    )
+
+
 @router.post("/generate-essay-qa-from-pdf", tags=["EssayQA"])
 async def create_essay_qa_from_pdf(
     pdf_file: UploadFile = File(None),  # Make optional when content_id is provided
@@ -139,6 +167,7 @@ async def create_essay_qa_from_pdf(
             )
         
         temp_file_path = None
+        stored_text = None
         
         # If content_id is provided, use the stored PDF file
         if content_id is not None:
@@ -158,6 +187,7 @@ async def create_essay_qa_from_pdf(
             
             # Use the stored PDF file path
             temp_file_path = content.content_url
+            stored_text = content.extracted_text
             logging.warning(f"[ESSAY QA] Using stored PDF from content_id {content_id}: {temp_file_path}")
         else:
             # No content_id provided, require PDF file upload
@@ -190,64 +220,39 @@ async def create_essay_qa_from_pdf(
             feedback_context = collect_feedback_context(db, user_id=current_user.id)
 
             # Generate Essay QA from the PDF
-            essay_qa_data, token_usage = generate_essay_qa_from_pdf(
-                temp_file_path,
-                num_questions,
-                difficulty,
-                feedback=feedback_context,
-            )
-            
-            # Store Essay QA in database
-            try:
-                # Try to create with difficulty first
-                essay_qa_topic = EssayQATopic(
-                    topic=essay_qa_data["topic"],
-                    category=essay_qa_data["category"],
-                    subcategory=essay_qa_data["subcategory"],
-                    difficulty=difficulty,  # Store the difficulty level
-                    creation_timestamp=datetime.datetime.now(),
-                    created_by_user_id=current_user.id,
+            if stored_text:
+                essay_qa_data, token_usage = await run_generation(
+                    generate_essay_qa_from_text,
+                    stored_text,
+                    num_questions,
+                    difficulty,
+                    feedback=feedback_context,
                 )
-                db.add(essay_qa_topic)
-                db.flush()  # Get the ID of the newly created topic
-            except Exception as e:
-                # Fallback: create without difficulty if column doesn't exist
-                logging.warning(f"Creating essay topic without difficulty column: {e}")
-                db.rollback()  # Rollback the failed transaction
-                
-                # Create without difficulty field
-                essay_qa_topic = EssayQATopic(
-                    topic=essay_qa_data["topic"],
-                    category=essay_qa_data["category"],
-                    subcategory=essay_qa_data["subcategory"],
-                    creation_timestamp=datetime.datetime.now(),
-                    created_by_user_id=current_user.id,
-                )
-                db.add(essay_qa_topic)
-                db.flush()  # Get the ID of the newly created topic
-
-            # Add questions
-            for q in essay_qa_data["questions"]:
-                essay_qa_question = EssayQAQuestion(
-                    question=q["question"],
-                    full_answer=q["full_answer"],
-                    key_info=q["key_info"],
-                    topic_id=essay_qa_topic.id,
+            else:
+                essay_qa_data, token_usage = await run_generation(
+                    generate_essay_qa_from_pdf,
+                    temp_file_path,
+                    num_questions,
+                    difficulty,
+                    feedback=feedback_context,
                 )
-                db.add(essay_qa_question)
+            
+            # Store Essay QA in database
+            essay_qa_topic_id = save_essay_qa(db, essay_qa_data, current_user.id, difficulty)
 
             # If project_id is provided, create a reference
-            logging.warning(f"[ESSAY] project_id: {project_id}, content_id: {content_id}, essay_topic_id: {essay_qa_topic.id}")
+            logging.warning(f"[ESSAY] project_id: {project_id}, content_id: {content_id}, essay_topic_id: {essay_qa_topic_id}")
             if project_id is not None:
                 from backend.database.sqlite_dal import StudentProjectEssayReference
                 essay_reference = StudentProjectEssayReference(
                     project_id=project_id,
                     content_id=content_id,  # Add content_id
-                    essay_topic_id=essay_qa_topic.id,
+                    essay_topic_id=essay_qa_topic_id,
                     created_at=datetime.datetime.now()
                 )
                 db.add(essay_reference)
-                logging.warning(f"[ESSAY] Created reference: project_id={project_id}, content_id={content_id}, essay_topic_id={essay_qa_topic.id}")
+                bump_content_version(db, [project_id])
+                logging.warning(f"[ESSAY] Created reference: project_id={project_id}, content_id={content_id}, essay_topic_id={essay_qa_topic_id}")
             else:
                 logging.warning(f"[ESSAY] No project_id provided, skipping reference creation")
 
@@ -258,10 +263,11 @@ async def create_essay_qa_from_pdf(
             token_usage_record = TokenUsage(
                 user_id=current_user.id,
                 generation_type="essay_qa",
-                topic_id=essay_qa_topic.id,
+                topic_id=essay_qa_topic_id,
                 input_tokens=token_usage.get("input_tokens", 0),
                 output_tokens=token_usage.get("output_tokens", 0),
                 total_tokens=token_usage.get("total_tokens", 0),
+                cached_tokens=token_usage.get("cached_tokens", 0),
             )
             db.add(token_usage_record)
             
@@ -288,6 +294,9 @@ async def create_essay_qa_from_pdf(
         raise HTTPException(
             status_code=400, detail=str(e)
         )
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -459,7 +468,8 @@ async def store_essay_answer(
         if user_answer.strip():  # Only generate feedback if answer is not empty
             try:
                 key_info = question.key_info if isinstance(question.key_info, list) else []
-                feedback, score_value = generate_essay_feedback(
+                feedback, score_value = await run_generation(
+                    generate_essay_feedback,
                     question=question.question,
                     user_answer=user_answer,
                     correct_answer=question.full_answer,
@@ -569,7 +579,8 @@ async def store_essay_answers(
         
         if questions_and_answers_for_feedback and any(qa.get("user_answer", "").strip() for qa in questions_and_answers_for_feedback):
             try:
-                feedback, score_value = generate_combined_essay_feedback(
+                feedback, score_value = await run_generation(
+                    generate_combined_essay_feedback,
                     questions_and_answers=questions_and_answers_for_feedback,
                 )
                 ai_feedback = feedback
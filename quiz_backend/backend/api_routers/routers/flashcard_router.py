@@ -5,22 +5,54 @@ import datetime
 import requests
 from typing import Optional
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 import logging
 
 from backend.api_routers.schemas import FlashcardRequest
 from backend.database.db import get_db
 from backend.database.sqlite_dal import FlashcardTopic, FlashcardCard, TokenUsage
-from backend.utils.utils import generate_flashcards, generate_flashcards_from_pdf
+from backend.services.generated_content import save_flashcards
+from backend.services.student_projects import bump_content_version
+from backend.utils.utils import generate_flashcards, generate_flashcards_from_pdf, generate_flashcards_from_text
 from backend.api_routers.routers.auth_router import get_current_user_dependency
 from backend.database.sqlite_dal import User as UserModel
-from backend.utils.credits import consume_generation_token
+from backend.utils.credits import check_generation_token_available, consume_generation_token
 from backend.utils.feedback_context import collect_feedback_context
+from backend.utils.generation_executor import run_generation
+from backend.utils.sse import persist_for_user, sse_response, stream_generation
 
 router = APIRouter()
 
 
+def _save_generated_flashcards(
+    db: Session,
+    user: UserModel,
+    flashcard_data: dict,
+    token_usage: dict,
+) -> dict:
+    """Store generated flashcards, consume the generation token and record usage."""
+    # Store flashcards in database
+    flashcard_topic_id = save_flashcards(db, flashcard_data, user.id)
+
+    # Consume 1 token for this flashcard generation
+    consume_generation_token(db, user, amount=1)
+
+    # Store token usage
+    token_usage_record = TokenUsage(
+        user_id=user.id,
+        generation_type="flashcard",
+        topic_id=flashcard_topic_id,
+        input_tokens=token_usage.get("input_tokens", 0),
+        output_tokens=token_usage.get("output_tokens", 0),
+        total_tokens=token_usage.get("total_tokens", 0),
+        cached_tokens=token_usage.get("cached_tokens", 0),
+    )
+    db.add(token_usage_record)
+
+    return flashcard_data
+
+
 @router.post("/generate-flashcards", tags=["Flashcards"])
 async def create_flashcards(
     request: FlashcardRequest,
@@ -33,65 +65,14 @@ async def create_flashcards(
 
         feedback_context = collect_feedback_context(db, user_id=current_user.id)
 
-        flashcard_data, token_usage = generate_flashcards(
+        flashcard_data, token_usage = await run_generation(
+            generate_flashcards,
             url,
             num_cards=request.num_cards,
             feedback=feedback_context,
         )
 
-        # Store flashcards in database
-        try:
-            # Try to create with difficulty first
-            flashcard_topic = FlashcardTopic(
-                topic=flashcard_data["topic"],
-                category=flashcard_data["category"],
-                subcategory=flashcard_data["subcategory"],
-                difficulty="medium",  # Default difficulty for flashcards
-                creation_timestamp=datetime.datetime.now(),
-                created_by_user_id=current_user.id,
-            )
-            db.add(flashcard_topic)
-            db.flush()  # Get the ID of the newly created topic
-        except Exception as e:
-            # Fallback: create without difficulty if column doesn't exist
-            logging.warning(f"Creating flashcard topic without difficulty column: {e}")
-            db.rollback()  # Rollback the failed transaction
-            
-            # Create without difficulty field
-            flashcard_topic = FlashcardTopic(
-                topic=flashcard_data["topic"],
-                category=flashcard_data["category"],
-                subcategory=flashcard_data["subcategory"],
-                creation_timestamp=datetime.datetime.now(),
-                created_by_user_id=current_user.id,
-            )
-            db.add(flashcard_topic)
-            db.flush()  # Get the ID of the newly created topic
-
-        # Add cards
-        for card in flashcard_data["cards"]:
-            flashcard_card = FlashcardCard(
-                front=card["front"],
-                back=card["back"],
-                importance=card.get("importance", "medium"),
-                topic_id=flashcard_topic.id,
-            )
-            db.add(flashcard_card)
-
-        # Consume 1 token for this flashcard generation
-        consume_generation_token(db, current_user, amount=1)
-        
-        # Store token usage
-        token_usage_record = TokenUsage(
-            user_id=current_user.id,
-            generation_type="flashcard",
-            topic_id=flashcard_topic.id,
-            input_tokens=token_usage.get("input_tokens", 0),
-            output_tokens=token_usage.get("output_tokens", 0),
-            total_tokens=token_usage.get("total_tokens", 0),
-        )
-        db.add(token_usage_record)
-        
+        _save_generated_flashcards(db, current_user, flashcard_data, token_usage)
         db.commit()
         return JSONResponse(
             content=flashcard_data,
@@ -105,6 +86,9 @@ async def create_flashcards(
             )
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -112,6 +96,37 @@ async def create_flashcards(
         )
 
 
+@router.post("/generate-flashcards/stream", tags=["Flashcards"])
+async def create_flashcards_stream(
+    request: FlashcardRequest,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user_dependency),
+) -> StreamingResponse:
+    """
+    Same as /generate-flashcards, streamed as Server-Sent Events.
+
+    Each card is sent as an `item` event as soon as the model has written it;
+    the saved flashcard set follows as the `done` event.
+    """
+    url = str(request.url).rstrip("/")
+
+    check_generation_token_available(db, current_user, amount=1)
+    feedback_context = collect_feedback_context(db, user_id=current_user.id)
+    db.rollback()  # Release the user row locked by the availability check
+
+    # From here on, failures are reported as an `error` event inside the stream
+    return sse_response(
+        stream_generation(
+            generate_flashcards,
+            url,
+            num_cards=request.num_cards,
+            feedback=feedback_context,
+            item_key="cards",
+            persist=persist_for_user(current_user.id, _save_generated_flashcards),
+        )
+    )
+
+
 @router.post("/generate-flashcards-from-pdf", tags=["Flashcards"])
 async def create_flashcards_from_pdf(
     pdf_file: UploadFile = File(None),  # Make optional when content_id is provided
@@ -123,6 +138,7 @@ async def create_flashcards_from_pdf(
 ) -> JSONResponse:
     try:
         temp_file_path = None
+        stored_text = None
         feedback_context = None
         scoped_topic_ids: list[int] = []
         
@@ -147,6 +163,7 @@ async def create_flashcards_from_pdf(
             
             # Use the stored PDF file path
             temp_file_path = content.content_url
+            stored_text = content.extracted_text
             logging.warning(f"[FLASHCARDS] Using stored PDF from content_id {content_id}: {temp_file_path}")
 
             # Aggregate AI feedback from related quiz attempts to guide flashcard generation
@@ -197,60 +214,37 @@ async def create_flashcards_from_pdf(
                 feedback_context = collect_feedback_context(db, user_id=current_user.id)
 
             # Generate flashcards from the PDF
-            flashcard_data, token_usage = generate_flashcards_from_pdf(
-                temp_file_path,
-                num_cards=num_cards,
-                feedback=feedback_context,
-            )
-            
-            # Store flashcards in database
-            try:
-                flashcard_topic = FlashcardTopic(
-                    topic=flashcard_data["topic"],
-                    category=flashcard_data["category"],
-                    subcategory=flashcard_data["subcategory"],
-                    difficulty="medium",  # Default difficulty for flashcards
-                    creation_timestamp=datetime.datetime.now(),
-                    created_by_user_id=current_user.id,
+            if stored_text:
+                flashcard_data, token_usage = await run_generation(
+                    generate_flashcards_from_text,
+                    stored_text,
+                    num_cards=num_cards,
+                    feedback=feedback_context,
                 )
-                db.add(flashcard_topic)
-                db.flush()  # Get the ID of the newly created topic
-            except Exception as e:
-                # Fallback: create without difficulty if column doesn't exist
-                logging.warning(f"Creating flashcard topic without difficulty column: {e}")
-                db.rollback()
-                flashcard_topic = FlashcardTopic(
-                    topic=flashcard_data["topic"],
-                    category=flashcard_data["category"],
-                    subcategory=flashcard_data["subcategory"],
-                    creation_timestamp=datetime.datetime.now(),
-                    created_by_user_id=current_user.id,
-                )
-                db.add(flashcard_topic)
-                db.flush()  # Get the ID of the newly created topic
-
-            # Add cards
-            for card in flashcard_data["cards"]:
-                flashcard_card = FlashcardCard(
-                    front=card["front"],
-                    back=card["back"],
-                    importance=card.get("importance", "medium"),
-                    topic_id=flashcard_topic.id,
+            else:
+                flashcard_data, token_usage = await run_generation(
+                    generate_flashcards_from_pdf,
+                    temp_file_path,
+                    num_cards=num_cards,
+                    feedback=feedback_context,
                 )
-                db.add(flashcard_card)
+            
+            # Store flashcards in database
+            flashcard_topic_id = save_flashcards(db, flashcard_data, current_user.id)
 
             # If project_id is provided, create a reference
-            logging.warning(f"[FLASHCARDS] project_id: {project_id}, content_id: {content_id}, flashcard_topic_id: {flashcard_topic.id}")
+            logging.warning(f"[FLASHCARDS] project_id: {project_id}, content_id: {content_id}, flashcard_topic_id: {flashcard_topic_id}")
             if project_id is not None:
                 from backend.database.sqlite_dal import StudentProjectFlashcardReference
                 flashcard_reference = StudentProjectFlashcardReference(
                     project_id=project_id,
                     content_id=content_id,  # Add content_id
-                    flashcard_topic_id=flashcard_topic.id,
+                    flashcard_topic_id=flashcard_topic_id,
                     created_at=datetime.datetime.now()
                 )
                 db.add(flashcard_reference)
-                logging.warning(f"[FLASHCARDS] Created reference: project_id={project_id}, content_id={content_id}, flashcard_topic_id={flashcard_topic.id}")
+                bump_content_version(db, [project_id])
+                logging.warning(f"[FLASHCARDS] Created reference: project_id={project_id}, content_id={content_id}, flashcard_topic_id={flashcard_topic_id}")
             else:
                 logging.warning(f"[FLASHCARDS] No project_id provided, skipping reference creation")
 
@@ -261,10 +255,11 @@ async def create_flashcards_from_pdf(
             token_usage_record = TokenUsage(
                 user_id=current_user.id,
                 generation_type="flashcard",
-                topic_id=flashcard_topic.id,
+                topic_id=flashcard_topic_id,
                 input_tokens=token_usage.get("input_tokens", 0),
                 output_tokens=token_usage.get("output_tokens", 0),
                 total_tokens=token_usage.get("total_tokens", 0),
+                cached_tokens=token_usage.get("cached_tokens", 0),
             )
             db.add(token_usage_record)
             
@@ -291,6 +286,9 @@ async def create_flashcards_from_pdf(
         raise HTTPException(
             status_code=400, detail=str(e)
         )
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -39,10 +39,19 @@ from backend.database.sqlite_dal import (
     Referral,
     TokenUsage,
     GenerationJob,
+    GenerationUsage,
+    ChatSession,
     User as UserModel,
 )
 from backend.api_routers.routers.auth_router import get_current_user_dependency
+from backend.services.chat_sessions import delete_sessions
+from backend.services.generation_cache import hash_source_text, purge_sources as purge_generation_cache
+from backend.services.principals import invalidate_principal
+from backend.services.project_retrieval import remove_project as remove_project_passages
+from backend.services.user_analytics import invalidate_user_analytics
 from backend.utils.admin import get_user_token_usage
+from backend.utils.content_extraction import release_text_cache
+from backend.utils.pdf_text_cache import compute_file_sha256
 
 router = APIRouter()
 
@@ -292,6 +301,7 @@ async def update_data_rectification(
         if updated_fields:
             user.updated_at = datetime.now()
             db.commit()
+            invalidate_principal([user_id])
             db.refresh(user)
             
             logger.info(f"[GDPR] Data rectification for user {user_id}, updated fields: {updated_fields}")
@@ -441,8 +451,9 @@ async def delete_data_erasure(
         # 1. Delete generation jobs
         db.query(GenerationJob).filter(GenerationJob.user_id == user_id).delete()
         
-        # 2. Delete token usage records
+        # 2. Delete token usage records and generation counters
         db.query(TokenUsage).filter(TokenUsage.user_id == user_id).delete()
+        db.query(GenerationUsage).filter(GenerationUsage.user_id == user_id).delete()
         
         # 3. Delete referrals
         db.query(Referral).filter(
@@ -461,14 +472,26 @@ async def delete_data_erasure(
         
         # 5. Delete student projects and their content
         projects = db.query(StudentProject).filter(StudentProject.user_id == user_id).all()
+        content_hashes = []
+        source_hashes = []
         for project in projects:
             # Delete project content and files
             contents = db.query(StudentProjectContent).filter(
                 StudentProjectContent.project_id == project.id
             ).all()
+            content_hashes.extend(content.content_hash for content in contents)
             for content in contents:
-                # Delete PDF files from disk
                 import os
+                # Generation cache keys for this document: its bytes, its extracted text or its text
+                if content.content_hash:
+                    source_hashes.append(content.content_hash)
+                elif content.content_url and os.path.exists(content.content_url):
+                    source_hashes.append(compute_file_sha256(content.content_url))
+                for text in (content.extracted_text, content.content_text):
+                    if text:
+                        source_hashes.append(hash_source_text(text))
+                
+                # Delete PDF files from disk
                 if content.content_url and os.path.exists(content.content_url):
                     try:
                         os.remove(content.content_url)
@@ -495,11 +518,16 @@ async def delete_data_erasure(
                     StudentProjectMindMapReference.content_id == content.id
                 ).delete()
             
+            remove_project_passages(db, project.id)
             db.query(StudentProjectContent).filter(
                 StudentProjectContent.project_id == project.id
             ).delete()
         
+        session_ids = [row.id for row in db.query(ChatSession.id).filter(ChatSession.user_id == user_id)]
+        delete_sessions(db, session_ids)
         db.query(StudentProject).filter(StudentProject.user_id == user_id).delete()
+        # Cached results generated from these documents, whoever requested them
+        purge_generation_cache(db, source_hashes)
         
         # 6. Delete essay answers
         db.query(EssayAnswer).filter(EssayAnswer.user_id == user_id).delete()
@@ -517,13 +545,20 @@ async def delete_data_erasure(
             db.query(FlashcardCard).filter(FlashcardCard.topic_id == topic.id).delete()
         db.query(FlashcardTopic).filter(FlashcardTopic.created_by_user_id == user_id).delete()
         
-        # 9. Delete quiz attempts
+        # 9. Delete quiz attempts and the analytics rolled up from them
         db.query(QuizAttempt).filter(QuizAttempt.user_id == user_id).delete()
+        invalidate_user_analytics(db, [user_id])
         
         # 10. Delete quiz topics created by user
         quiz_topics = db.query(QuizTopic).filter(QuizTopic.created_by_user_id == user_id).all()
         for topic in quiz_topics:
             db.query(QuizQuestion).filter(QuizQuestion.topic_id == topic.id).delete()
+            # Other users lose attempts on these quizzes; their rollups are rebuilt on next read
+            attempt_user_ids = {
+                row.user_id
+                for row in db.query(QuizAttempt.user_id).filter(QuizAttempt.topic_id == topic.id).distinct()
+            }
+            invalidate_user_analytics(db, attempt_user_ids)
             db.query(QuizAttempt).filter(QuizAttempt.topic_id == topic.id).delete()
         db.query(QuizTopic).filter(QuizTopic.created_by_user_id == user_id).delete()
         
@@ -551,6 +586,9 @@ async def delete_data_erasure(
         # Note: Transactions are kept for legal/accounting compliance but user is anonymized
         
         db.commit()
+        invalidate_principal([user_id])
+        # Extracted PDF text is removed unless another user's PDF has the same bytes
+        release_text_cache(db, content_hashes)
         
         logger.warning(f"[GDPR] Data erasure completed for user {user_id}")
         
@@ -602,6 +640,7 @@ async def restrict_processing(
         logger.warning(f"[GDPR] Processing restriction for user {user_id}: {restriction_reason}")
         
         db.commit()
+        invalidate_principal([user_id])
         
         return JSONResponse(
             content={
@@ -654,6 +693,7 @@ async def object_to_processing(
         user.is_active = False
         user.updated_at = datetime.now()
         db.commit()
+        invalidate_principal([user_id])
         
         return JSONResponse(
             content={
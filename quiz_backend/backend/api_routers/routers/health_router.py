@@ -1,8 +1,16 @@
 from fastapi import APIRouter
 
+from backend.utils.generation_executor import generation_executor
+
 router = APIRouter()
 
 
 @router.get("/health", tags=["Health"])
 async def health_check():
-    return {"status": "I am healthy"} 
\ No newline at end of file
+    return {"status": "I am healthy"}
+
+
+@router.get("/health/generation", tags=["Health"])
+async def generation_health():
+    """Queue depth and saturation of the shared LLM generation executor."""
+    return generation_executor.metrics()
@@ -12,6 +12,7 @@ from backend.api_routers.schemas import (
     PaymentMethodCreate, PaymentMethodResponse, TransactionResponse,
     CreatePaymentIntentRequest, PaymentIntentResponse, SubscriptionPlan
 )
+from backend.services.principals import invalidate_principal
 from backend.services.stripe_service import StripeService
 from backend.api_routers.routers.auth_router import get_current_user_dependency
 import stripe
@@ -282,6 +283,7 @@ def create_payment_method(
             customer_id = StripeService.create_customer(user.email, user.firebase_uid)
             user.stripe_customer_id = customer_id
             db.commit()
+            invalidate_principal([user.id])
             db.refresh(user)
         
         # Attach payment method to customer in Stripe
@@ -476,6 +478,7 @@ def create_checkout_session(
                 )
                 current_user.stripe_customer_id = stripe_customer_id
                 db.commit()
+                invalidate_principal([current_user.id])
                 db.refresh(current_user)
             except Exception as e:
                 raise HTTPException(
@@ -17,13 +17,18 @@ import logging
 from backend.api_routers.schemas import URLRequest
 from backend.database.db import get_db
 from backend.database.sqlite_dal import QuizQuestion, QuizTopic, QuizAttempt, TokenUsage
-from backend.utils.utils import generate_quiz, generate_quiz_from_pdf
+from backend.services.generated_content import save_quiz
+from backend.services.student_projects import bump_content_version, bump_content_version_for_quiz
+from backend.services.user_analytics import record_attempt
+from backend.utils.utils import generate_quiz, generate_quiz_from_pdf, generate_quiz_from_text
 from backend.utils.quiz_export import build_quiz_docx, build_quiz_pdf
 from backend.api_routers.routers.auth_router import get_current_user_dependency
 from backend.database.sqlite_dal import User as UserModel
-from backend.utils.credits import consume_generation_token
+from backend.utils.credits import check_generation_token_available, consume_generation_token
 from backend.utils.feedback import generate_quiz_feedback
 from backend.utils.feedback_context import collect_feedback_context
+from backend.utils.generation_executor import run_generation
+from backend.utils.sse import persist_for_user, sse_response, stream_generation
 
 router = APIRouter()
 
@@ -40,6 +45,35 @@ def generate_share_code(db: Session) -> str:
     raise HTTPException(status_code=500, detail="Failed to generate unique share code")
 
 
+def _save_generated_quiz(
+    db: Session,
+    user: UserModel,
+    quiz_data: dict,
+    token_usage: dict,
+    difficulty: str,
+) -> dict:
+    """Store a generated quiz, consume the generation token and record usage. Returns the quiz with its id."""
+    quiz_topic_id = save_quiz(db, quiz_data, user.id, difficulty)
+
+    # Consume 1 token for this quiz generation
+    consume_generation_token(db, user, amount=1)
+
+    # Store token usage
+    token_usage_record = TokenUsage(
+        user_id=user.id,
+        generation_type="quiz",
+        topic_id=quiz_topic_id,
+        input_tokens=token_usage.get("input_tokens", 0),
+        output_tokens=token_usage.get("output_tokens", 0),
+        total_tokens=token_usage.get("total_tokens", 0),
+        cached_tokens=token_usage.get("cached_tokens", 0),
+    )
+    db.add(token_usage_record)
+
+    # Add quiz_id to response
+    return {**quiz_data, "quiz_id": quiz_topic_id}
+
+
 @router.post("/generate-quiz", tags=["Quiz"])
 async def create_quiz(
     request: URLRequest,
@@ -63,52 +97,16 @@ async def create_quiz(
 
         feedback_context = collect_feedback_context(db, user_id=current_user.id)
 
-        quiz_data, token_usage = generate_quiz(
+        quiz_data, token_usage = await run_generation(
+            generate_quiz,
             url,
             requested_questions,
             request.difficulty,
             feedback=feedback_context,
         )
 
-        # Store quiz in database
-        quiz_topic = QuizTopic(
-            topic=quiz_data["topic"],
-            category=quiz_data["category"],
-            subcategory=quiz_data["subcategory"],
-            difficulty=request.difficulty,  # Store the difficulty level
-            creation_timestamp=datetime.datetime.now(),
-            created_by_user_id=current_user.id
-        )
-        db.add(quiz_topic)
-        db.flush()  # Get the ID of the newly created topic
-
-        # Add questions
-        for q in quiz_data["questions"]:
-            quiz_question = QuizQuestion(
-                question=q["question"],
-                options=q["options"],
-                right_option=q["right_option"],
-                topic_id=quiz_topic.id,
-            )
-            db.add(quiz_question)
-
-        # Consume 1 token for this quiz generation
-        consume_generation_token(db, current_user, amount=1)
-        
-        # Store token usage
-        token_usage_record = TokenUsage(
-            user_id=current_user.id,
-            generation_type="quiz",
-            topic_id=quiz_topic.id,
-            input_tokens=token_usage.get("input_tokens", 0),
-            output_tokens=token_usage.get("output_tokens", 0),
-            total_tokens=token_usage.get("total_tokens", 0),
-        )
-        db.add(token_usage_record)
-        
+        quiz_data_with_id = _save_generated_quiz(db, current_user, quiz_data, token_usage, request.difficulty)
         db.commit()
-        # Add quiz_id to response
-        quiz_data_with_id = {**quiz_data, "quiz_id": quiz_topic.id}
         return JSONResponse(
             content=quiz_data_with_id,
             headers={"Content-Type": "application/json; charset=utf-8"}
@@ -119,6 +117,9 @@ async def create_quiz(
                 status_code=404, detail=f"Content not found at URL: {request.url}"
             )
         raise HTTPException(status_code=500, detail=str(e))
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -126,6 +127,52 @@ async def create_quiz(
         )
 
 
+@router.post("/generate-quiz/stream", tags=["Quiz"])
+async def create_quiz_stream(
+    request: URLRequest,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user_dependency),
+) -> StreamingResponse:
+    """
+    Same as /generate-quiz, streamed as Server-Sent Events.
+
+    Each question is sent as an `item` event as soon as the model has written
+    it; the saved quiz (with quiz_id) follows as the `done` event.
+    """
+    url = str(request.url).rstrip("/")
+    if request.difficulty not in ["easy", "medium", "hard"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid difficulty level. Choose from: easy, medium, hard",
+        )
+    requested_questions = (
+        request.num_questions if request.num_questions and request.num_questions > 0 else None
+    )
+
+    check_generation_token_available(db, current_user, amount=1)
+    feedback_context = collect_feedback_context(db, user_id=current_user.id)
+    db.rollback()  # Release the user row locked by the availability check
+
+    # From here on, failures are reported as an `error` event inside the stream
+    persist = persist_for_user(
+        current_user.id,
+        lambda session, user, quiz_data, token_usage: _save_generated_quiz(
+            session, user, quiz_data, token_usage, request.difficulty
+        ),
+    )
+    return sse_response(
+        stream_generation(
+            generate_quiz,
+            url,
+            requested_questions,
+            request.difficulty,
+            feedback=feedback_context,
+            item_key="questions",
+            persist=persist,
+        )
+    )
+
+
 @router.post("/generate-quiz-from-pdf", tags=["Quiz"])
 async def create_quiz_from_pdf(
     pdf_file: UploadFile = File(None),  # Make optional when content_id is provided
@@ -145,6 +192,7 @@ async def create_quiz_from_pdf(
             )
         
         temp_file_path = None
+        stored_text = None
         
         # If content_id is provided, use the stored PDF file
         if content_id is not None:
@@ -164,6 +212,7 @@ async def create_quiz_from_pdf(
             
             # Use the stored PDF file path
             temp_file_path = content.content_url
+            stored_text = content.extracted_text
             logging.warning(f"[QUIZ] Using stored PDF from content_id {content_id}: {temp_file_path}")
         else:
             # No content_id provided, require PDF file upload
@@ -200,51 +249,25 @@ async def create_quiz_from_pdf(
 
             feedback_context = collect_feedback_context(db, user_id=current_user.id)
 
-            quiz_data, token_usage = generate_quiz_from_pdf(
-                temp_file_path,
-                requested_questions,
-                difficulty,
-                feedback=feedback_context,
-            )
-            
-            # Store quiz in database
-            try:
-                # Try to create with difficulty first
-                quiz_topic = QuizTopic(
-                    topic=quiz_data["topic"],
-                    category=quiz_data["category"],
-                    subcategory=quiz_data["subcategory"],
-                    difficulty=difficulty,  # Store the difficulty level
-                    creation_timestamp=datetime.datetime.now(),
-                    created_by_user_id=current_user.id
+            if stored_text:
+                quiz_data, token_usage = await run_generation(
+                    generate_quiz_from_text,
+                    stored_text,
+                    requested_questions,
+                    difficulty,
+                    feedback=feedback_context,
                 )
-                db.add(quiz_topic)
-                db.flush()  # Get the ID of the newly created topic
-            except Exception as e:
-                # Fallback: create without difficulty if column doesn't exist
-                logging.warning(f"Creating quiz topic without difficulty column: {e}")
-                db.rollback()  # Rollback the failed transaction
-                
-                # Create without difficulty field
-                quiz_topic = QuizTopic(
-                    topic=quiz_data["topic"],
-                    category=quiz_data["category"],
-                    subcategory=quiz_data["subcategory"],
-                    creation_timestamp=datetime.datetime.now(),
-                    created_by_user_id=current_user.id
+            else:
+                quiz_data, token_usage = await run_generation(
+                    generate_quiz_from_pdf,
+                    temp_file_path,
+                    requested_questions,
+                    difficulty,
+                    feedback=feedback_context,
                 )
-                db.add(quiz_topic)
-                db.flush()  # Get the ID of the newly created topic
-
-            # Add questions
-            for q in quiz_data["questions"]:
-                quiz_question = QuizQuestion(
-                    question=q["question"],
-                    options=q["options"],
-                    right_option=q["right_option"],
-                    topic_id=quiz_topic.id,
-                )
-                db.add(quiz_question)
+            
+            # Store quiz in database
+            quiz_topic_id = save_quiz(db, quiz_data, current_user.id, difficulty)
 
             # If project_id is provided, create a reference
             if project_id is not None:
@@ -252,10 +275,11 @@ async def create_quiz_from_pdf(
                 quiz_reference = StudentProjectQuizReference(
                     project_id=project_id,
                     content_id=content_id,  # Add content_id
-                    quiz_topic_id=quiz_topic.id,
+                    quiz_topic_id=quiz_topic_id,
                     created_at=datetime.datetime.now()
                 )
                 db.add(quiz_reference)
+                bump_content_version(db, [project_id])
 
             # Consume 1 token for this quiz generation
             consume_generation_token(db, current_user, amount=1)
@@ -264,16 +288,17 @@ async def create_quiz_from_pdf(
             token_usage_record = TokenUsage(
                 user_id=current_user.id,
                 generation_type="quiz",
-                topic_id=quiz_topic.id,
+                topic_id=quiz_topic_id,
                 input_tokens=token_usage.get("input_tokens", 0),
                 output_tokens=token_usage.get("output_tokens", 0),
                 total_tokens=token_usage.get("total_tokens", 0),
+                cached_tokens=token_usage.get("cached_tokens", 0),
             )
             db.add(token_usage_record)
             
             db.commit()
             # Add quiz_id to response
-            quiz_data_with_id = {**quiz_data, "quiz_id": quiz_topic.id}
+            quiz_data_with_id = {**quiz_data, "quiz_id": quiz_topic_id}
             return JSONResponse(
                 content=quiz_data_with_id,
                 headers={"Content-Type": "application/json; charset=utf-8"}
@@ -296,6 +321,9 @@ async def create_quiz_from_pdf(
         raise HTTPException(
             status_code=400, detail=str(e)
         )
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -661,6 +689,7 @@ async def submit_shared_quiz(
     )
     
     db.add(quiz_attempt)
+    record_attempt(db, quiz_attempt, quiz.category)
     db.commit()
     db.refresh(quiz_attempt)
 
@@ -701,7 +730,8 @@ async def submit_shared_quiz(
         except Exception as source_error:
             logging.debug("[QUIZ FEEDBACK] Could not retrieve source material for shared quiz: %s", source_error)
         
-        ai_feedback = generate_quiz_feedback(
+        ai_feedback = await run_generation(
+            generate_quiz_feedback,
             topic_name=quiz.topic,
             score=score,
             total_questions=total_questions,
@@ -846,6 +876,7 @@ async def add_quiz_question(
     )
     
     db.add(new_question)
+    bump_content_version_for_quiz(db, topic_id)
     db.commit()
     db.refresh(new_question)
     
@@ -900,6 +931,7 @@ async def delete_quiz_question(
         )
     
     db.delete(question)
+    bump_content_version_for_quiz(db, topic_id)
     db.commit()
     
     return JSONResponse(
@@ -1,11 +1,12 @@
 import datetime
 import logging
 import os
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from backend.api_routers.schemas import (
     StudentProjectCreate,
@@ -13,7 +14,9 @@ from backend.api_routers.schemas import (
     StudentProjectListResponse,
     StudentProjectContentCreate,
     StudentProjectContentResponse,
-    StudentProjectReferenceCreate
+    StudentProjectReferenceCreate,
+    ChatSessionCreate,
+    ChatMessageCreate,
 )
 from backend.database.db import get_db
 from backend.database.sqlite_dal import (
@@ -25,35 +28,73 @@ from backend.database.sqlite_dal import (
     StudentProjectMindMapReference,
     User,
     QuizTopic,
-    QuizQuestion,
     FlashcardTopic,
     EssayQATopic,
-    EssayQAQuestion,
     MindMap,
-    Subscription,
     GenerationJob,
     TokenUsage,
+    ChatSession,
+    ChatMessage,
 )
 from backend.api_routers.routers.auth_router import get_current_user_dependency
-from backend.utils.credits import consume_generation_token
-from backend.utils.utils import generate_quiz_from_pdf, generate_essay_qa_from_pdf, generate_mind_map_from_pdf
+from backend.utils.credits import check_generation_token_available, consume_generation_token
+from backend.utils.utils import generate_quiz_from_text, generate_essay_qa_from_text, generate_mind_map_from_text
 from backend.database.sqlite_dal import User as UserModel
 from backend.config.settings import get_app_config, get_pdf_storage_dir
 from backend.database.db import SessionLocal
+from backend.utils.content_extraction import (
+    EXTRACTION_NO_TEXT,
+    EXTRACTION_PENDING,
+    NO_TEXT_MESSAGE,
+    get_content_text,
+    release_text_cache,
+    schedule_content_extraction,
+)
 from pydantic import BaseModel
 from backend.utils.feedback_context import collect_feedback_context
+from backend.utils.openai_client import get_async_openai_client, get_openai_api_key
+from backend.utils.tokens import count_tokens
+from backend.utils.sse import persist_for_user, sse_error, sse_event, sse_response
+from backend.services.chat_sessions import (
+    chat_model,
+    compact_if_needed,
+    delete_sessions,
+    history_prompt,
+    pending_messages,
+    record_turn,
+    usage_from_response,
+)
+from backend.services.generated_content import save_essay_qa, save_quiz
+from backend.services.job_queue import (
+    JobLease,
+    LeaseLostError,
+    enqueue_job,
+    finish_job,
+    get_queue_position,
+    mark_job_failed_or_retry,
+)
+from backend.services.principals import get_principal_tier
+from backend.services.project_retrieval import (
+    embed_query,
+    index_content,
+    indexed_content_ids,
+    remove_content as remove_content_passages,
+    remove_project as remove_project_passages,
+    retrieve_passages,
+)
+from backend.services.student_projects import (
+    bump_content_version,
+    count_user_projects,
+    list_user_projects,
+    load_generated_content,
+)
 
 router = APIRouter()
 
 
 def get_user_tier(user_id: str, db: Session) -> str:
     """Determine if user is on free tier or pro tier based on active subscription"""
-    active_subscription = db.query(Subscription).filter(
-        Subscription.user_id == user_id,
-        Subscription.status == "active"
-    ).first()
-    
-    return "pro_tier" if active_subscription else "free_tier"
+    return get_principal_tier(db, user_id)
 
 
 def get_max_projects_for_user(user_id: str, db: Session) -> int:
@@ -94,6 +135,8 @@ class GenerationJobStatusResponse(BaseModel):
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
     completed_at: Optional[str] = None
+    queue_position: Optional[int] = None
+    estimated_start_at: Optional[str] = None
 
 
 @router.post("/student-projects", tags=["Student Projects"])
@@ -168,10 +211,17 @@ async def create_student_project(
 
 @router.get("/student-projects", tags=["Student Projects"])
 async def get_student_projects(
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
     current_user: UserModel = Depends(get_current_user_dependency),
     db: Session = Depends(get_db)
 ) -> JSONResponse:
-    """Get all projects for the current authenticated user"""
+    """
+    Get the projects of the current authenticated user, newest first.
+
+    Without `limit` every project is returned. With it, the response holds one
+    page and `next_cursor`, which is passed back as `cursor` for the next page.
+    """
     user_id = current_user.id
     logging.warning(f"[STUDENT PROJECT] Fetching projects for user: {user_id}")
     
@@ -191,13 +241,13 @@ async def get_student_projects(
         db.commit()
         db.refresh(user)
     
-    # Get all projects for the user
-    projects = db.query(StudentProject).filter(StudentProject.user_id == user_id).order_by(StudentProject.created_at.desc()).all()
+    try:
+        projects, next_cursor = list_user_projects(db, user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     projects_data = []
-    for project in projects:
-        # Get contents
-        contents = db.query(StudentProjectContent).filter(StudentProjectContent.project_id == project.id).all()
+    for project, counts in projects:
         contents_data = [
             {
                 "id": content.id,
@@ -206,17 +256,14 @@ async def get_student_projects(
                 "content_url": content.content_url,
                 "content_text": content.content_text,
                 "file_size": content.file_size,
+                "page_count": content.page_count,
+                "char_count": content.char_count,
+                "extraction_status": content.extraction_status,
                 "uploaded_at": content.uploaded_at.isoformat()
             }
-            for content in contents
+            for content in project.contents
         ]
         
-        # Get references
-        quiz_refs = db.query(StudentProjectQuizReference).filter(StudentProjectQuizReference.project_id == project.id).all()
-        flashcard_refs = db.query(StudentProjectFlashcardReference).filter(StudentProjectFlashcardReference.project_id == project.id).all()
-        essay_refs = db.query(StudentProjectEssayReference).filter(StudentProjectEssayReference.project_id == project.id).all()
-        mind_map_refs = db.query(StudentProjectMindMapReference).filter(StudentProjectMindMapReference.project_id == project.id).all()
-        
         project_data = {
             "id": project.id,
             "user_id": project.user_id,
@@ -225,10 +272,11 @@ async def get_student_projects(
             "created_at": project.created_at.isoformat(),
             "updated_at": project.updated_at.isoformat(),
             "contents": contents_data,
-            "quiz_references": [ref.quiz_topic_id for ref in quiz_refs],
-            "flashcard_references": [ref.flashcard_topic_id for ref in flashcard_refs],
-            "essay_references": [ref.essay_topic_id for ref in essay_refs],
-            "mind_map_references": [ref.mind_map_id for ref in mind_map_refs],
+            "quiz_references": [ref.quiz_topic_id for ref in project.quiz_references],
+            "flashcard_references": [ref.flashcard_topic_id for ref in project.flashcard_references],
+            "essay_references": [ref.essay_topic_id for ref in project.essay_references],
+            "mind_map_references": [ref.mind_map_id for ref in project.mind_map_references],
+            **counts,
         }
         projects_data.append(project_data)
     
@@ -237,7 +285,8 @@ async def get_student_projects(
     return JSONResponse(
         content={
             "projects": projects_data,
-            "total_count": len(projects_data)
+            "total_count": count_user_projects(db, user_id) if limit else len(projects_data),
+            "next_cursor": next_cursor,
         }
     )
 
@@ -271,6 +320,9 @@ async def get_student_project(
             "content_url": content.content_url,
             "content_text": content.content_text,
             "file_size": content.file_size,
+            "page_count": content.page_count,
+            "char_count": content.char_count,
+            "extraction_status": content.extraction_status,
             "uploaded_at": content.uploaded_at.isoformat()
         }
         for content in contents
@@ -359,6 +411,7 @@ async def delete_student_project(
     try:
         # Get all content files to delete from disk
         contents = db.query(StudentProjectContent).filter(StudentProjectContent.project_id == project_id).all()
+        content_hashes = [content.content_hash for content in contents]
         
         # Delete PDF files from disk
         for content in contents:
@@ -375,6 +428,8 @@ async def delete_student_project(
         db.query(StudentProjectEssayReference).filter(StudentProjectEssayReference.project_id == project_id).delete()
         db.query(StudentProjectMindMapReference).filter(StudentProjectMindMapReference.project_id == project_id).delete()
         db.query(MindMap).filter(MindMap.project_id == project_id).delete()
+        remove_project_passages(db, project_id)
+        delete_sessions(db, [row.id for row in db.query(ChatSession.id).filter(ChatSession.project_id == project_id)])
         
         # Then delete content
         db.query(StudentProjectContent).filter(StudentProjectContent.project_id == project_id).delete()
@@ -382,6 +437,7 @@ async def delete_student_project(
         # Finally delete the project
         db.delete(project)
         db.commit()
+        release_text_cache(db, content_hashes)
         
         return JSONResponse(
             content={
@@ -403,6 +459,8 @@ async def delete_student_project(
             db.query(StudentProjectEssayReference).filter(StudentProjectEssayReference.project_id == project_id).delete()
             db.query(StudentProjectMindMapReference).filter(StudentProjectMindMapReference.project_id == project_id).delete()
             db.query(MindMap).filter(MindMap.project_id == project_id).delete()
+            remove_project_passages(db, project_id)
+            delete_sessions(db, [row.id for row in db.query(ChatSession.id).filter(ChatSession.project_id == project_id)])
             
             # Then delete content
             db.query(StudentProjectContent).filter(StudentProjectContent.project_id == project_id).delete()
@@ -491,6 +549,7 @@ async def add_project_content(
                 name=pdf_file.filename or 'uploaded_file.pdf',
                 content_url=file_path,  # Store persistent path
                 file_size=file_size,
+                extraction_status=EXTRACTION_PENDING,
                 uploaded_at=datetime.datetime.now()
             )
             
@@ -504,6 +563,7 @@ async def add_project_content(
                 "name": content.name,
                 "content_url": content.content_url,
                 "file_size": content.file_size,
+                "extraction_status": content.extraction_status,
                 "uploaded_at": content.uploaded_at.isoformat()
             })
         except Exception as e:
@@ -514,6 +574,9 @@ async def add_project_content(
     # Commit all successful uploads at once
     if uploaded_contents:
         db.commit()
+        # Extract text off the request path so generation never re-parses the PDF
+        for uploaded in uploaded_contents:
+            schedule_content_extraction(uploaded["id"])
     
     # Return response
     if errors and not uploaded_contents:
@@ -588,7 +651,8 @@ async def view_project_content(
     )
 
 
-def _process_quiz_generation_job(job_id: int) -> None:
+def _process_quiz_generation_job(lease: JobLease) -> None:
+    job_id = lease.job_id
     session = SessionLocal()
     try:
         job = session.query(GenerationJob).filter(GenerationJob.id == job_id).first()
@@ -596,17 +660,9 @@ def _process_quiz_generation_job(job_id: int) -> None:
             logging.error("[GEN JOB] Job %s not found", job_id)
             return
 
-        job.status = "in_progress"
-        job.updated_at = datetime.datetime.now()
-        session.commit()
-
         user = session.query(User).filter(User.id == job.user_id).first()
         if not user:
-            job.status = "failed"
-            job.error_message = "User not found"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="User not found")
             return
 
         content = session.query(StudentProjectContent).filter(
@@ -615,19 +671,11 @@ def _process_quiz_generation_job(job_id: int) -> None:
         ).first()
 
         if not content:
-            job.status = "failed"
-            job.error_message = "Content not found"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="Content not found")
             return
 
         if content.content_type != "pdf" or not content.content_url:
-            job.status = "failed"
-            job.error_message = "Only PDF content is supported for quiz generation"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="Only PDF content is supported for quiz generation")
             return
 
         payload = job.payload or {}
@@ -651,40 +699,24 @@ def _process_quiz_generation_job(job_id: int) -> None:
         if not feedback_context:
             feedback_context = collect_feedback_context(session, user_id=user.id)
 
-        quiz_data, token_usage = generate_quiz_from_pdf(
-            content.content_url,
+        quiz_data, token_usage = generate_quiz_from_text(
+            get_content_text(content),
             requested_questions if requested_questions and requested_questions > 0 else None,
             difficulty,
             feedback=feedback_context,
         )
 
-        quiz_topic = QuizTopic(
-            topic=quiz_data["topic"],
-            category=quiz_data["category"],
-            subcategory=quiz_data["subcategory"],
-            difficulty=difficulty,
-            creation_timestamp=datetime.datetime.now(),
-            created_by_user_id=user.id,
-        )
-        session.add(quiz_topic)
-        session.flush()
-
-        for question in quiz_data["questions"]:
-            quiz_question = QuizQuestion(
-                question=question["question"],
-                options=question["options"],
-                right_option=question["right_option"],
-                topic_id=quiz_topic.id,
-            )
-            session.add(quiz_question)
+        lease.check()
+        quiz_topic_id = save_quiz(session, quiz_data, user.id, difficulty)
 
         quiz_reference = StudentProjectQuizReference(
             project_id=job.project_id,
             content_id=job.content_id,
-            quiz_topic_id=quiz_topic.id,
+            quiz_topic_id=quiz_topic_id,
             created_at=datetime.datetime.now(),
         )
         session.add(quiz_reference)
+        bump_content_version(session, [job.project_id])
 
         # Consume 1 token for this generation (quiz/flashcard/essay/mind_map)
         consume_generation_token(session, user, amount=1)
@@ -693,37 +725,33 @@ def _process_quiz_generation_job(job_id: int) -> None:
         job.input_tokens = token_usage.get("input_tokens", 0)
         job.output_tokens = token_usage.get("output_tokens", 0)
         job.total_tokens = token_usage.get("total_tokens", 0)
+        job.cached_tokens = token_usage.get("cached_tokens", 0)
         logging.info("[GEN JOB] Quiz token usage: input=%d, output=%d, total=%d", 
                     job.input_tokens, job.output_tokens, job.total_tokens)
 
-        job.status = "completed"
-        job.result_topic_id = quiz_topic.id
-        job.completed_at = datetime.datetime.now()
-        job.updated_at = datetime.datetime.now()
-        session.commit()
+        finish_job(session, lease, "completed", result_topic_id=quiz_topic_id)
 
         logging.info(
             "[GEN JOB] Quiz generation completed for job %s -> quiz %s",
             job_id,
-            quiz_topic.id,
+            quiz_topic_id,
         )
+    except LeaseLostError:
+        session.rollback()
+        logging.warning("[GEN JOB] Lease on job %s was lost; discarding this quiz generation", job_id)
     except Exception as exc:  # pylint: disable=broad-except
         logging.exception("[GEN JOB] Quiz generation failed for job %s: %s", job_id, exc)
         try:
-            job = session.query(GenerationJob).filter(GenerationJob.id == job_id).first()
-            if job:
-                job.status = "failed"
-                job.error_message = str(exc)
-                job.completed_at = datetime.datetime.now()
-                job.updated_at = datetime.datetime.now()
-                session.commit()
+            session.rollback()
+            mark_job_failed_or_retry(session, lease, exc)
         except Exception:  # pylint: disable=broad-except
             session.rollback()
     finally:
         session.close()
 
 
-def _process_essay_generation_job(job_id: int) -> None:
+def _process_essay_generation_job(lease: JobLease) -> None:
+    job_id = lease.job_id
     session = SessionLocal()
     try:
         job = session.query(GenerationJob).filter(GenerationJob.id == job_id).first()
@@ -731,17 +759,9 @@ def _process_essay_generation_job(job_id: int) -> None:
             logging.error("[GEN JOB] Job %s not found", job_id)
             return
 
-        job.status = "in_progress"
-        job.updated_at = datetime.datetime.now()
-        session.commit()
-
         user = session.query(User).filter(User.id == job.user_id).first()
         if not user:
-            job.status = "failed"
-            job.error_message = "User not found"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="User not found")
             return
 
         content = session.query(StudentProjectContent).filter(
@@ -750,19 +770,11 @@ def _process_essay_generation_job(job_id: int) -> None:
         ).first()
 
         if not content:
-            job.status = "failed"
-            job.error_message = "Content not found"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="Content not found")
             return
 
         if content.content_type != "pdf" or not content.content_url:
-            job.status = "failed"
-            job.error_message = "Only PDF content is supported for essay generation"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="Only PDF content is supported for essay generation")
             return
 
         payload = job.payload or {}
@@ -786,53 +798,25 @@ def _process_essay_generation_job(job_id: int) -> None:
         if not feedback_context:
             feedback_context = collect_feedback_context(session, user_id=user.id)
 
-        essay_data, token_usage = generate_essay_qa_from_pdf(
-            content.content_url,
+        essay_data, token_usage = generate_essay_qa_from_text(
+            get_content_text(content),
             requested_questions,
             difficulty,
             feedback=feedback_context,
         )
 
-        # Create essay topic
-        try:
-            essay_topic = EssayQATopic(
-                topic=essay_data["topic"],
-                category=essay_data["category"],
-                subcategory=essay_data["subcategory"],
-                difficulty=difficulty,
-                creation_timestamp=datetime.datetime.now(),
-                created_by_user_id=user.id,
-            )
-        except Exception:
-            # Fallback: create without difficulty if column doesn't exist
-            essay_topic = EssayQATopic(
-                topic=essay_data["topic"],
-                category=essay_data["category"],
-                subcategory=essay_data["subcategory"],
-                creation_timestamp=datetime.datetime.now(),
-                created_by_user_id=user.id,
-            )
-        session.add(essay_topic)
-        session.flush()
-
-        # Add questions
-        for q in essay_data["questions"]:
-            essay_question = EssayQAQuestion(
-                question=q["question"],
-                full_answer=q["full_answer"],
-                key_info=q["key_info"],
-                topic_id=essay_topic.id,
-            )
-            session.add(essay_question)
+        lease.check()
+        essay_topic_id = save_essay_qa(session, essay_data, user.id, difficulty)
 
         # Create reference
         essay_reference = StudentProjectEssayReference(
             project_id=job.project_id,
             content_id=job.content_id,
-            essay_topic_id=essay_topic.id,
+            essay_topic_id=essay_topic_id,
             created_at=datetime.datetime.now(),
         )
         session.add(essay_reference)
+        bump_content_version(session, [job.project_id])
 
         # Consume 1 token for this generation (quiz/flashcard/essay/mind_map)
         consume_generation_token(session, user, amount=1)
@@ -841,37 +825,33 @@ def _process_essay_generation_job(job_id: int) -> None:
         job.input_tokens = token_usage.get("input_tokens", 0)
         job.output_tokens = token_usage.get("output_tokens", 0)
         job.total_tokens = token_usage.get("total_tokens", 0)
+        job.cached_tokens = token_usage.get("cached_tokens", 0)
         logging.info("[GEN JOB] Essay token usage: input=%d, output=%d, total=%d", 
                     job.input_tokens, job.output_tokens, job.total_tokens)
 
-        job.status = "completed"
-        job.result_topic_id = essay_topic.id
-        job.completed_at = datetime.datetime.now()
-        job.updated_at = datetime.datetime.now()
-        session.commit()
+        finish_job(session, lease, "completed", result_topic_id=essay_topic_id)
 
         logging.info(
             "[GEN JOB] Essay generation completed for job %s -> essay %s",
             job_id,
-            essay_topic.id,
+            essay_topic_id,
         )
+    except LeaseLostError:
+        session.rollback()
+        logging.warning("[GEN JOB] Lease on job %s was lost; discarding this essay generation", job_id)
     except Exception as exc:  # pylint: disable=broad-except
         logging.exception("[GEN JOB] Essay generation failed for job %s: %s", job_id, exc)
         try:
-            job = session.query(GenerationJob).filter(GenerationJob.id == job_id).first()
-            if job:
-                job.status = "failed"
-                job.error_message = str(exc)
-                job.completed_at = datetime.datetime.now()
-                job.updated_at = datetime.datetime.now()
-                session.commit()
+            session.rollback()
+            mark_job_failed_or_retry(session, lease, exc)
         except Exception:  # pylint: disable=broad-except
             session.rollback()
     finally:
         session.close()
 
 
-def _process_mind_map_generation_job(job_id: int) -> None:
+def _process_mind_map_generation_job(lease: JobLease) -> None:
+    job_id = lease.job_id
     session = SessionLocal()
     try:
         logging.info("[MIND MAP JOB] Starting mind map generation job %s", job_id)
@@ -883,19 +863,10 @@ def _process_mind_map_generation_job(job_id: int) -> None:
         logging.debug("[MIND MAP JOB] Job %s found: user_id=%s, project_id=%s, content_id=%s", 
                      job_id, job.user_id, job.project_id, job.content_id)
 
-        job.status = "in_progress"
-        job.updated_at = datetime.datetime.now()
-        session.commit()
-        logging.debug("[MIND MAP JOB] Job %s status set to 'in_progress'", job_id)
-
         user = session.query(User).filter(User.id == job.user_id).first()
         if not user:
             logging.error("[MIND MAP JOB] User %s not found for job %s", job.user_id, job_id)
-            job.status = "failed"
-            job.error_message = "User not found"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="User not found")
             return
 
         logging.debug("[MIND MAP JOB] User %s validated for job %s", user.id, job_id)
@@ -907,21 +878,13 @@ def _process_mind_map_generation_job(job_id: int) -> None:
 
         if not content:
             logging.error("[MIND MAP JOB] Content %s not found for job %s", job.content_id, job_id)
-            job.status = "failed"
-            job.error_message = "Content not found"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="Content not found")
             return
 
         if content.content_type != "pdf" or not content.content_url:
             logging.error("[MIND MAP JOB] Invalid content type for job %s: type=%s, url=%s", 
                          job_id, content.content_type, bool(content.content_url))
-            job.status = "failed"
-            job.error_message = "Only PDF content is supported for mind map generation"
-            job.completed_at = datetime.datetime.now()
-            job.updated_at = datetime.datetime.now()
-            session.commit()
+            finish_job(session, lease, "failed", error_message="Only PDF content is supported for mind map generation")
             return
 
         logging.info("[MIND MAP JOB] Processing PDF content: %s (content_id=%s)", 
@@ -937,9 +900,9 @@ def _process_mind_map_generation_job(job_id: int) -> None:
         if feedback_context:
             logging.debug("[MIND MAP JOB] Collected feedback context (length: %d chars)", len(feedback_context))
 
-        logging.info("[MIND MAP JOB] Calling generate_mind_map_from_pdf for job %s", job_id)
-        mind_map_data, token_usage = generate_mind_map_from_pdf(
-            content.content_url,
+        logging.info("[MIND MAP JOB] Calling generate_mind_map_from_text for job %s", job_id)
+        mind_map_data, token_usage = generate_mind_map_from_text(
+            get_content_text(content),
             focus=focus,
             feedback=feedback_context,
         )
@@ -951,6 +914,7 @@ def _process_mind_map_generation_job(job_id: int) -> None:
                 node.pop("examples", None)
             logging.debug("[MIND MAP JOB] Removed examples from %d nodes", original_node_count)
 
+        lease.check()
         logging.info("[MIND MAP JOB] Creating MindMap record for job %s", job_id)
         mind_map = MindMap(
             user_id=user.id,
@@ -987,6 +951,7 @@ def _process_mind_map_generation_job(job_id: int) -> None:
             created_at=datetime.datetime.now(),
         )
         session.add(mind_map_reference)
+        bump_content_version(session, [job.project_id])
         logging.debug("[MIND MAP JOB] Created mind map reference for project %s, content %s", 
                      job.project_id, job.content_id)
 
@@ -998,6 +963,7 @@ def _process_mind_map_generation_job(job_id: int) -> None:
         job.input_tokens = token_usage.get("input_tokens", 0)
         job.output_tokens = token_usage.get("output_tokens", 0)
         job.total_tokens = token_usage.get("total_tokens", 0)
+        job.cached_tokens = token_usage.get("cached_tokens", 0)
         logging.info("[MIND MAP JOB] Token usage: input=%d, output=%d, total=%d", 
                     job.input_tokens, job.output_tokens, job.total_tokens)
 
@@ -1009,29 +975,24 @@ def _process_mind_map_generation_job(job_id: int) -> None:
             input_tokens=token_usage.get("input_tokens", 0),
             output_tokens=token_usage.get("output_tokens", 0),
             total_tokens=token_usage.get("total_tokens", 0),
+            cached_tokens=token_usage.get("cached_tokens", 0),
         )
         session.add(token_usage_record)
         logging.debug("[MIND MAP JOB] Created TokenUsage record for mind_map id=%s", mind_map.id)
 
-        job.status = "completed"
-        job.result_topic_id = mind_map.id
-        job.completed_at = datetime.datetime.now()
-        job.updated_at = datetime.datetime.now()
-        session.commit()
+        finish_job(session, lease, "completed", result_topic_id=mind_map.id)
 
         logging.info("[MIND MAP JOB] Mind map generation completed successfully: job_id=%s, mind_map_id=%s, nodes=%d, edges=%d", 
                     job_id, mind_map.id, len(nodes_payload), len(mind_map_data.get("edges", [])))
+    except LeaseLostError:
+        session.rollback()
+        logging.warning("[MIND MAP JOB] Lease on job %s was lost; discarding this mind map generation", job_id)
     except Exception as exc:  # pylint: disable=broad-except
         logging.exception("[MIND MAP JOB] Mind map generation failed for job %s: %s", job_id, exc)
         try:
-            job = session.query(GenerationJob).filter(GenerationJob.id == job_id).first()
-            if job:
-                logging.error("[MIND MAP JOB] Marking job %s as failed with error: %s", job_id, str(exc))
-                job.status = "failed"
-                job.error_message = str(exc)
-                job.completed_at = datetime.datetime.now()
-                job.updated_at = datetime.datetime.now()
-                session.commit()
+            session.rollback()
+            logging.error("[MIND MAP JOB] Recording failed attempt for job %s: %s", job_id, str(exc))
+            mark_job_failed_or_retry(session, lease, exc)
         except Exception as inner_exc:  # pylint: disable=broad-except
             logging.error("[MIND MAP JOB] Failed to update job %s status after error: %s", job_id, str(inner_exc))
             session.rollback()
@@ -1039,6 +1000,14 @@ def _process_mind_map_generation_job(job_id: int) -> None:
         session.close()
 
 
+# Job processors run by the generation queue workers (see backend/worker.py), keyed by job_type
+GENERATION_JOB_PROCESSORS = {
+    "quiz": _process_quiz_generation_job,
+    "essay": _process_essay_generation_job,
+    "mind_map": _process_mind_map_generation_job,
+}
+
+
 @router.post(
     "/student-projects/{project_id}/content/{content_id}/quiz-generation",
     tags=["Student Projects"],
@@ -1048,7 +1017,6 @@ async def start_quiz_generation_job(
     project_id: int,
     content_id: int,
     request: QuizGenerationJobRequest,
-    background_tasks: BackgroundTasks,
     current_user: UserModel = Depends(get_current_user_dependency),
     db: Session = Depends(get_db),
 ) -> JSONResponse:
@@ -1081,6 +1049,9 @@ async def start_quiz_generation_job(
             detail="Only PDF content can be used for quiz generation",
         )
 
+    if content.extraction_status == EXTRACTION_NO_TEXT:
+        raise HTTPException(status_code=422, detail=NO_TEXT_MESSAGE)
+
     payload = {
         "num_questions": request.num_questions if request.num_questions and request.num_questions > 0 else None,
         "difficulty": request.difficulty,
@@ -1096,11 +1067,7 @@ async def start_quiz_generation_job(
         created_at=datetime.datetime.now(),
         updated_at=datetime.datetime.now(),
     )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-
-    background_tasks.add_task(_process_quiz_generation_job, job.id)
+    enqueue_job(db, job)
 
     return JSONResponse(
         content={
@@ -1151,6 +1118,9 @@ async def get_generation_job_status(
             if mind_map:
                 result = {"mind_map_id": mind_map.id, "topic": mind_map.title}
 
+    queue_info = get_queue_position(db, job) or {}
+    estimated_start_at = queue_info.get("estimated_start_at")
+
     return GenerationJobStatusResponse(
         job_id=job.id,
         status=job.status,
@@ -1162,6 +1132,8 @@ async def get_generation_job_status(
         created_at=job.created_at.isoformat() if job.created_at else None,
         updated_at=job.updated_at.isoformat() if job.updated_at else None,
         completed_at=job.completed_at.isoformat() if job.completed_at else None,
+        queue_position=queue_info.get("queue_position"),
+        estimated_start_at=estimated_start_at.isoformat() if estimated_start_at else None,
     )
 
 
@@ -1174,7 +1146,6 @@ async def start_essay_generation_job(
     project_id: int,
     content_id: int,
     request: EssayGenerationJobRequest,
-    background_tasks: BackgroundTasks,
     current_user: UserModel = Depends(get_current_user_dependency),
     db: Session = Depends(get_db),
 ) -> JSONResponse:
@@ -1207,6 +1178,9 @@ async def start_essay_generation_job(
             detail="Only PDF content can be used for essay generation",
         )
 
+    if content.extraction_status == EXTRACTION_NO_TEXT:
+        raise HTTPException(status_code=422, detail=NO_TEXT_MESSAGE)
+
     payload = {
         "num_questions": request.num_questions if request.num_questions and request.num_questions > 0 else None,
         "difficulty": request.difficulty,
@@ -1222,11 +1196,7 @@ async def start_essay_generation_job(
         created_at=datetime.datetime.now(),
         updated_at=datetime.datetime.now(),
     )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-
-    background_tasks.add_task(_process_essay_generation_job, job.id)
+    enqueue_job(db, job)
 
     return JSONResponse(
         content={
@@ -1250,7 +1220,6 @@ async def start_mind_map_generation_job(
     project_id: int,
     content_id: int,
     request: MindMapGenerationJobRequest,
-    background_tasks: BackgroundTasks,
     current_user: UserModel = Depends(get_current_user_dependency),
     db: Session = Depends(get_db),
 ) -> JSONResponse:
@@ -1284,6 +1253,9 @@ async def start_mind_map_generation_job(
             detail="Only PDF content can be used for mind map generation",
         )
 
+    if content.extraction_status == EXTRACTION_NO_TEXT:
+        raise HTTPException(status_code=422, detail=NO_TEXT_MESSAGE)
+
     payload = {
         "focus": request.focus,
         "include_examples": request.include_examples,
@@ -1301,15 +1273,12 @@ async def start_mind_map_generation_job(
         created_at=datetime.datetime.now(),
         updated_at=datetime.datetime.now(),
     )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
+    enqueue_job(db, job)
 
     logging.info("[MIND MAP API] Created generation job %s for user %s, project %s, content %s", 
                 job.id, current_user.id, project_id, content_id)
 
-    background_tasks.add_task(_process_mind_map_generation_job, job.id)
-    logging.debug("[MIND MAP API] Enqueued background task for job %s", job.id)
+    logging.debug("[MIND MAP API] Enqueued job %s on the generation queue", job.id)
 
     return JSONResponse(
         content={
@@ -1351,6 +1320,7 @@ async def delete_project_content(
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
+    content_hash = content.content_hash
     try:
         # Delete the PDF file from disk if it exists
         if content.content_url and os.path.exists(content.content_url):
@@ -1366,10 +1336,17 @@ async def delete_project_content(
         db.query(StudentProjectEssayReference).filter(StudentProjectEssayReference.content_id == content_id).delete()
         db.query(StudentProjectMindMapReference).filter(StudentProjectMindMapReference.content_id == content_id).delete()
         db.query(MindMap).filter(MindMap.content_id == content_id).delete()
+        remove_content_passages(db, content_id)
+        bump_content_version(db, [project_id])
+        # Sessions pinned to this PDF fall back to chatting with the whole project
+        db.query(ChatSession).filter(ChatSession.content_id == content_id).update(
+            {ChatSession.content_id: None}, synchronize_session=False
+        )
         
         # Then delete the content
         db.delete(content)
         db.commit()
+        release_text_cache(db, [content_hash])
         
         return JSONResponse(
             content={
@@ -1388,6 +1365,11 @@ async def delete_project_content(
             # Delete the content directly (references will be handled by cascade or manual cleanup)
             db.query(StudentProjectMindMapReference).filter(StudentProjectMindMapReference.content_id == content_id).delete()
             db.query(MindMap).filter(MindMap.content_id == content_id).delete()
+            remove_content_passages(db, content_id)
+            bump_content_version(db, [project_id])
+            db.query(ChatSession).filter(ChatSession.content_id == content_id).update(
+                {ChatSession.content_id: None}, synchronize_session=False
+            )
             db.delete(content)
             db.commit()
             
@@ -1494,6 +1476,7 @@ async def add_project_reference(
         raise HTTPException(status_code=400, detail="Invalid reference type")
     
     db.add(reference)
+    bump_content_version(db, [project_id])
     db.commit()
     db.refresh(reference)
     
@@ -1556,6 +1539,7 @@ async def delete_project_reference(
     
     # Delete the reference
     db.delete(reference)
+    bump_content_version(db, [project_id])
     db.commit()
     
     return JSONResponse(
@@ -1585,99 +1569,11 @@ async def get_project_generated_content(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Get quiz references
-    quiz_references = db.query(StudentProjectQuizReference).filter(
-        StudentProjectQuizReference.project_id == project_id
-    ).all()
-    
-    quizzes = []
-    for ref in quiz_references:
-        quiz_topic = db.query(QuizTopic).filter(QuizTopic.id == ref.quiz_topic_id).first()
-        if quiz_topic:
-            # Get the number of questions for this quiz
-            question_count = db.query(QuizQuestion).filter(QuizQuestion.topic_id == quiz_topic.id).count()
-            
-            quizzes.append({
-                "id": quiz_topic.id,
-                "topic": quiz_topic.topic,
-                "category": quiz_topic.category,
-                "subcategory": quiz_topic.subcategory,
-                "difficulty": quiz_topic.difficulty,
-                "question_count": question_count,
-                "creation_timestamp": quiz_topic.creation_timestamp.isoformat() if quiz_topic.creation_timestamp else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None,
-                "content_id": ref.content_id
-            })
-    
-    # Get flashcard references
-    flashcard_references = db.query(StudentProjectFlashcardReference).filter(
-        StudentProjectFlashcardReference.project_id == project_id
-    ).all()
-    
-    flashcards = []
-    for ref in flashcard_references:
-        flashcard_topic = db.query(FlashcardTopic).filter(FlashcardTopic.id == ref.flashcard_topic_id).first()
-        if flashcard_topic:
-            # Get the number of cards for this flashcard set
-            from backend.database.sqlite_dal import FlashcardCard
-            card_count = db.query(FlashcardCard).filter(FlashcardCard.topic_id == flashcard_topic.id).count()
-            
-            flashcards.append({
-                "id": flashcard_topic.id,
-                "topic": flashcard_topic.topic,
-                "category": flashcard_topic.category,
-                "subcategory": flashcard_topic.subcategory,
-                "difficulty": flashcard_topic.difficulty,
-                "card_count": card_count,
-                "creation_timestamp": flashcard_topic.creation_timestamp.isoformat() if flashcard_topic.creation_timestamp else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None,
-                "content_id": ref.content_id
-            })
-    
-    # Get essay references
-    essay_references = db.query(StudentProjectEssayReference).filter(
-        StudentProjectEssayReference.project_id == project_id
-    ).all()
-    
-    essays = []
-    for ref in essay_references:
-        essay_topic = db.query(EssayQATopic).filter(EssayQATopic.id == ref.essay_topic_id).first()
-        if essay_topic:
-            # Get the number of questions for this essay set
-            from backend.database.sqlite_dal import EssayQAQuestion
-            question_count = db.query(EssayQAQuestion).filter(EssayQAQuestion.topic_id == essay_topic.id).count()
-            
-            essays.append({
-                "id": essay_topic.id,
-                "topic": essay_topic.topic,
-                "category": essay_topic.category,
-                "subcategory": essay_topic.subcategory,
-                "difficulty": essay_topic.difficulty,
-                "question_count": question_count,
-                "creation_timestamp": essay_topic.creation_timestamp.isoformat() if essay_topic.creation_timestamp else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None,
-                "content_id": ref.content_id
-            })
-    
-    # Get mind map references
-    mind_map_references = db.query(StudentProjectMindMapReference).filter(
-        StudentProjectMindMapReference.project_id == project_id
-    ).all()
-
-    mind_maps = []
-    for ref in mind_map_references:
-        mind_map = db.query(MindMap).filter(MindMap.id == ref.mind_map_id).first()
-        if mind_map:
-            mind_maps.append({
-                "id": mind_map.id,
-                "title": mind_map.title,
-                "central_idea": mind_map.central_idea,
-                "category": mind_map.category,
-                "subcategory": mind_map.subcategory,
-                "node_count": len(mind_map.nodes or []),
-                "created_at": mind_map.created_at.isoformat() if mind_map.created_at else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None
-            })
+    generated = load_generated_content(db, project)
+    quizzes = generated["quizzes"]
+    flashcards = generated["flashcards"]
+    essays = generated["essays"]
+    mind_maps = generated["mind_maps"]
 
     return JSONResponse(
         content={
@@ -1725,100 +1621,11 @@ async def get_content_generated_content(
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
-    # Get quiz references for this specific content
-    quiz_references = db.query(StudentProjectQuizReference).filter(
-        StudentProjectQuizReference.project_id == project_id,
-        StudentProjectQuizReference.content_id == content_id
-    ).all()
-    
-    quizzes = []
-    for ref in quiz_references:
-        quiz_topic = db.query(QuizTopic).filter(QuizTopic.id == ref.quiz_topic_id).first()
-        if quiz_topic:
-            # Get the number of questions for this quiz
-            question_count = db.query(QuizQuestion).filter(QuizQuestion.topic_id == quiz_topic.id).count()
-            
-            quizzes.append({
-                "id": quiz_topic.id,
-                "topic": quiz_topic.topic,
-                "category": quiz_topic.category,
-                "subcategory": quiz_topic.subcategory,
-                "difficulty": quiz_topic.difficulty,
-                "question_count": question_count,
-                "creation_timestamp": quiz_topic.creation_timestamp.isoformat() if quiz_topic.creation_timestamp else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None
-            })
-    
-    # Get flashcard references for this specific content
-    flashcard_references = db.query(StudentProjectFlashcardReference).filter(
-        StudentProjectFlashcardReference.project_id == project_id,
-        StudentProjectFlashcardReference.content_id == content_id
-    ).all()
-    
-    flashcards = []
-    for ref in flashcard_references:
-        flashcard_topic = db.query(FlashcardTopic).filter(FlashcardTopic.id == ref.flashcard_topic_id).first()
-        if flashcard_topic:
-            # Get the number of cards for this flashcard set
-            from backend.database.sqlite_dal import FlashcardCard
-            card_count = db.query(FlashcardCard).filter(FlashcardCard.topic_id == flashcard_topic.id).count()
-            
-            flashcards.append({
-                "id": flashcard_topic.id,
-                "topic": flashcard_topic.topic,
-                "category": flashcard_topic.category,
-                "subcategory": flashcard_topic.subcategory,
-                "difficulty": flashcard_topic.difficulty,
-                "card_count": card_count,
-                "creation_timestamp": flashcard_topic.creation_timestamp.isoformat() if flashcard_topic.creation_timestamp else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None
-            })
-    
-    # Get essay references for this specific content
-    essay_references = db.query(StudentProjectEssayReference).filter(
-        StudentProjectEssayReference.project_id == project_id,
-        StudentProjectEssayReference.content_id == content_id
-    ).all()
-    
-    essays = []
-    for ref in essay_references:
-        essay_topic = db.query(EssayQATopic).filter(EssayQATopic.id == ref.essay_topic_id).first()
-        if essay_topic:
-            # Get the number of questions for this essay set
-            from backend.database.sqlite_dal import EssayQAQuestion
-            question_count = db.query(EssayQAQuestion).filter(EssayQAQuestion.topic_id == essay_topic.id).count()
-            
-            essays.append({
-                "id": essay_topic.id,
-                "topic": essay_topic.topic,
-                "category": essay_topic.category,
-                "subcategory": essay_topic.subcategory,
-                "difficulty": essay_topic.difficulty,
-                "question_count": question_count,
-                "creation_timestamp": essay_topic.creation_timestamp.isoformat() if essay_topic.creation_timestamp else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None
-            })
-
-    # Mind maps for this content
-    mind_map_references = db.query(StudentProjectMindMapReference).filter(
-        StudentProjectMindMapReference.project_id == project_id,
-        StudentProjectMindMapReference.content_id == content_id
-    ).all()
-
-    mind_maps = []
-    for ref in mind_map_references:
-        mind_map = db.query(MindMap).filter(MindMap.id == ref.mind_map_id).first()
-        if mind_map:
-            mind_maps.append({
-                "id": mind_map.id,
-                "title": mind_map.title,
-                "central_idea": mind_map.central_idea,
-                "category": mind_map.category,
-                "subcategory": mind_map.subcategory,
-                "node_count": len(mind_map.nodes or []),
-                "created_at": mind_map.created_at.isoformat() if mind_map.created_at else None,
-                "reference_created_at": ref.created_at.isoformat() if ref.created_at else None
-            })
+    generated = load_generated_content(db, project, content_id)
+    quizzes = generated["quizzes"]
+    flashcards = generated["flashcards"]
+    essays = generated["essays"]
+    mind_maps = generated["mind_maps"]
     
     return JSONResponse(
         content={
@@ -1881,18 +1688,32 @@ async def get_mind_map(
     )
 
 
-@router.post("/student-projects/{project_id}/chat", tags=["Student Projects"])
-async def chat_with_project_pdfs(
+_PROJECT_CHAT_INSTRUCTIONS = """You are a helpful assistant that answers questions based on excerpts from PDFs. 
+Answer the user's question using only the information provided in the excerpts. If the answer is not in them, say so."""
+
+
+def _project_chat_system_message(pdf_excerpts: str) -> str:
+    return f"""{_PROJECT_CHAT_INSTRUCTIONS}
+
+PDF Excerpts:
+{pdf_excerpts}"""
+
+
+def _build_project_chat_context(
+    db: Session,
+    user_id: int,
     project_id: int,
-    message: str = Form(...),
-    content_id: Optional[int] = Form(None),  # Optional: chat with specific PDF, or all PDFs if None
-    current_user: UserModel = Depends(get_current_user_dependency),
-    db: Session = Depends(get_db)
-) -> JSONResponse:
-    """Chat with PDFs in a student project"""
-    user_id = current_user.id
-    logging.warning(f"[STUDENT PROJECT] Chat request for project {project_id} from user: {user_id}")
-    
+    content_id: Optional[int],
+    message: str,
+    query_embedding: Optional[List[float]] = None,
+) -> Tuple[List[StudentProjectContent], str]:
+    """
+    Load the project's PDFs for a chat request and collect the passages most
+    relevant to `message`. Returns (contents, pdf_excerpts).
+
+    Documents not indexed yet are extracted and indexed here, which blocks,
+    so async handlers call this through run_in_threadpool.
+    """
     # Verify project exists and belongs to user
     project = db.query(StudentProject).filter(
         StudentProject.id == project_id,
@@ -1923,33 +1744,39 @@ async def chat_with_project_pdfs(
             detail="No PDFs found in this project" if not content_id else "PDF not found"
         )
     
-    # Extract text from all PDFs
-    from backend.components.custom_components import PDFTextExtractor
-    pdf_extractor = PDFTextExtractor()
-    
-    all_pdf_text = []
+    # Index documents that have no passages yet (uploaded before the retrieval index
+    # existed, or still waiting for background extraction)
+    indexed_ids = indexed_content_ids(db, [content.id for content in contents])
+    searchable_contents = []
     missing_files = []
     for content in contents:
-        if not content.content_url:
-            logging.warning(f"[STUDENT PROJECT] PDF has no content_url: {content.name}")
-            missing_files.append(content.name)
-            continue
-            
-        if not os.path.exists(content.content_url):
-            logging.warning(f"[STUDENT PROJECT] PDF file not found: {content.content_url}")
-            missing_files.append(content.name)
+        if content.id in indexed_ids:
+            searchable_contents.append(content)
             continue
+
+        if not content.extracted_text:
+            if not content.content_url:
+                logging.warning(f"[STUDENT PROJECT] PDF has no content_url: {content.name}")
+                missing_files.append(content.name)
+                continue
+
+            if not os.path.exists(content.content_url):
+                logging.warning(f"[STUDENT PROJECT] PDF file not found: {content.content_url}")
+                missing_files.append(content.name)
+                continue
         
         try:
-            result = pdf_extractor.run(content.content_url)
-            pdf_text = result["text"]
-            all_pdf_text.append(f"=== {content.name} ===\n{pdf_text}\n")
+            pdf_text = get_content_text(content)
+            if index_content(db, content, pdf_text):
+                searchable_contents.append(content)
+            db.commit()
         except Exception as e:
+            db.rollback()
             logging.error(f"[STUDENT PROJECT] Error extracting text from {content.name}: {e}")
             missing_files.append(content.name)
             continue
     
-    if not all_pdf_text:
+    if not searchable_contents:
         error_msg = "Failed to extract text from PDFs"
         if missing_files:
             error_msg += f". The following PDFs could not be accessed: {', '.join(missing_files)}. Please re-upload them."
@@ -1961,36 +1788,55 @@ async def chat_with_project_pdfs(
     if missing_files:
         logging.warning(f"[STUDENT PROJECT] Some PDFs were missing but continuing with available ones: {missing_files}")
     
-    # Combine all PDF text
-    combined_pdf_text = "\n\n".join(all_pdf_text)
+    # Only the passages most relevant to the message go into the prompt
+    passages = retrieve_passages(
+        db,
+        [content.id for content in searchable_contents],
+        message,
+        query_embedding=query_embedding,
+    )
+    content_names = {content.id: content.name for content in searchable_contents}
+    combined_pdf_text = "\n\n".join(
+        f"=== {content_names[passage.content_id]} ===\n{passage.text}\n" for passage in passages
+    )
+    return contents, combined_pdf_text
+
+
+@router.post("/student-projects/{project_id}/chat", tags=["Student Projects"])
+async def chat_with_project_pdfs(
+    project_id: int,
+    message: str = Form(...),
+    content_id: Optional[int] = Form(None),  # Optional: chat with specific PDF, or all PDFs if None
+    current_user: UserModel = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+) -> JSONResponse:
+    """Chat with PDFs in a student project"""
+    user_id = current_user.id
+    logging.warning(f"[STUDENT PROJECT] Chat request for project {project_id} from user: {user_id}")
+    
+    query_embedding = await embed_query(message)
+    contents, pdf_excerpts = await run_in_threadpool(
+        _build_project_chat_context,
+        db, user_id, project_id, content_id, message, query_embedding
+    )
+    system_message = _project_chat_system_message(pdf_excerpts)
     
     # Call LLM using OpenAI API
     try:
-        from openai import OpenAI
-        
-        # Get API key (support both OPENAI_API_KEY and OPEN_API_KEY for compatibility)
-        api_key = os.environ.get("OPENAI_API_KEY") or os.environ.get("OPEN_API_KEY")
-        if not api_key:
+        if not get_openai_api_key():
             raise HTTPException(
                 status_code=500,
                 detail="OPENAI_API_KEY environment variable must be set"
             )
         
-        # Initialize OpenAI client (default endpoint)
-        client = OpenAI(api_key=api_key)
+        # Shared pooled async client (default endpoint)
+        client = get_async_openai_client()
         
         # Get model from environment or use default
         model = os.environ.get("OPENAI_MODEL", "gpt-4.1-2025-04-14")
         
-        # Create system message with PDF context
-        system_message = f"""You are a helpful assistant that answers questions based on the following PDF content. 
-Answer the user's question using only the information provided in the PDFs. If the answer is not in the PDFs, say so.
-
-PDF Content:
-{combined_pdf_text}"""
-        
         # Call the API with messages format
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": system_message},
@@ -2003,7 +1849,7 @@ PDF Content:
         response_text = response.choices[0].message.content if response.choices else "I'm sorry, I couldn't generate a response."
         
         # Consume 1 token for this generation
-        consume_generation_token(db, current_user, amount=1)
+        consume_generation_token(db, current_user, amount=1, count_in_period=False)
         db.commit()
 
         return JSONResponse(
@@ -2015,10 +1861,293 @@ PDF Content:
             },
             headers={"Content-Type": "application/json; charset=utf-8"}
         )
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         logging.error(f"[STUDENT PROJECT] Error calling LLM: {e}")
         db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate response: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.post("/student-projects/{project_id}/chat/stream", tags=["Student Projects"])
+async def chat_with_project_pdfs_stream(
+    project_id: int,
+    message: str = Form(...),
+    content_id: Optional[int] = Form(None),  # Optional: chat with specific PDF, or all PDFs if None
+    current_user: UserModel = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Chat with PDFs in a student project, streamed as Server-Sent Events.
+
+    Model output is sent as `token` events while it is generated. The `done`
+    event carries the full response with the same fields as the JSON endpoint.
+    """
+    user_id = current_user.id
+    logging.warning(f"[STUDENT PROJECT] Streaming chat request for project {project_id} from user: {user_id}")
+
+    query_embedding = await embed_query(message)
+    contents, pdf_excerpts = await run_in_threadpool(
+        _build_project_chat_context,
+        db, user_id, project_id, content_id, message, query_embedding
+    )
+    system_message = _project_chat_system_message(pdf_excerpts)
+    if not get_openai_api_key():
+        raise HTTPException(
+            status_code=500,
+            detail="OPENAI_API_KEY environment variable must be set"
+        )
+    check_generation_token_available(db, current_user, amount=1)
+    db.rollback()  # Release the user row locked by the availability check
+
+    pdfs_used = [c.name for c in contents]
+
+    def consume_chat_token(session: Session, user: UserModel, result: dict, token_usage: dict) -> dict:
+        # Consume 1 token for this generation
+        consume_generation_token(session, user, amount=1, count_in_period=False)
+        return result
+
+    persist = persist_for_user(user_id, consume_chat_token)
+
+    async def events():
+        try:
+            stream = await get_async_openai_client().chat.completions.create(
+                model=os.environ.get("OPENAI_MODEL", "gpt-4.1-2025-04-14"),
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": message}
+                ],
+                temperature=0.7,
+                max_tokens=2000,
+                stream=True,
+            )
+            response_parts = []
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    response_parts.append(delta)
+                    yield sse_event("token", {"text": delta})
+
+            response_text = "".join(response_parts) or "I'm sorry, I couldn't generate a response."
+            payload = await run_in_threadpool(
+                persist,
+                {
+                    "response": response_text,
+                    "project_id": project_id,
+                    "content_id": content_id,
+                    "pdfs_used": pdfs_used,
+                },
+                {},
+            )
+            yield sse_event("done", payload)
+        except HTTPException as e:
+            yield sse_error(e)
+        except Exception as e:
+            logging.error(f"[STUDENT PROJECT] Error streaming LLM response: {e}")
+            yield sse_event("error", {"status_code": 500, "detail": f"Failed to generate response: {str(e)}"})
+
+    return sse_response(events())
+
+
+def _get_chat_session(db: Session, user_id: str, project_id: int, session_id: int) -> ChatSession:
+    session = db.query(ChatSession).filter(
+        ChatSession.id == session_id,
+        ChatSession.project_id == project_id,
+        ChatSession.user_id == user_id
+    ).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return session
+
+
+def _chat_session_data(session: ChatSession) -> dict:
+    return {
+        "id": session.id,
+        "project_id": session.project_id,
+        "content_id": session.content_id,
+        "title": session.title,
+        "summary": session.summary,
+        "created_at": session.created_at.isoformat() if session.created_at else None,
+        "updated_at": session.updated_at.isoformat() if session.updated_at else None,
+    }
+
+
+@router.post("/student-projects/{project_id}/chat/sessions", tags=["Student Projects"])
+async def create_chat_session(
+    project_id: int,
+    session_data: ChatSessionCreate,
+    current_user: UserModel = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+) -> JSONResponse:
+    """Start a chat session whose history is kept server-side"""
+    user_id = current_user.id
+    project = db.query(StudentProject).filter(
+        StudentProject.id == project_id,
+        StudentProject.user_id == user_id
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if session_data.content_id:
+        content = db.query(StudentProjectContent).filter(
+            StudentProjectContent.id == session_data.content_id,
+            StudentProjectContent.project_id == project_id,
+            StudentProjectContent.content_type == 'pdf'
+        ).first()
+        if not content:
+            raise HTTPException(status_code=404, detail="PDF not found")
+
+    session = ChatSession(
+        project_id=project_id,
+        user_id=user_id,
+        content_id=session_data.content_id,
+        title=session_data.title,
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    logging.warning(f"[STUDENT PROJECT] Created chat session {session.id} for project {project_id}")
+
+    return JSONResponse(content=_chat_session_data(session), status_code=201)
+
+
+@router.get("/student-projects/{project_id}/chat/sessions", tags=["Student Projects"])
+async def list_chat_sessions(
+    project_id: int,
+    current_user: UserModel = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+) -> JSONResponse:
+    """List the chat sessions of a project, most recently active first"""
+    sessions = db.query(ChatSession).filter(
+        ChatSession.project_id == project_id,
+        ChatSession.user_id == current_user.id
+    ).order_by(ChatSession.updated_at.desc()).all()
+    return JSONResponse(content={"sessions": [_chat_session_data(session) for session in sessions]})
+
+
+@router.get("/student-projects/{project_id}/chat/sessions/{session_id}", tags=["Student Projects"])
+async def get_chat_session(
+    project_id: int,
+    session_id: int,
+    current_user: UserModel = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+) -> JSONResponse:
+    """Get a chat session with its full message history"""
+    session = _get_chat_session(db, current_user.id, project_id, session_id)
+    messages = db.query(ChatMessage).filter(ChatMessage.session_id == session.id).order_by(ChatMessage.id).all()
+    session_data = _chat_session_data(session)
+    session_data["messages"] = [
+        {
+            "id": message.id,
+            "role": message.role,
+            "content": message.content,
+            "created_at": message.created_at.isoformat() if message.created_at else None,
+        }
+        for message in messages
+    ]
+    return JSONResponse(content=session_data)
+
+
+@router.delete("/student-projects/{project_id}/chat/sessions/{session_id}", tags=["Student Projects"])
+async def delete_chat_session(
+    project_id: int,
+    session_id: int,
+    current_user: UserModel = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+) -> JSONResponse:
+    """Delete a chat session and its messages"""
+    session = _get_chat_session(db, current_user.id, project_id, session_id)
+    delete_sessions(db, [session.id])
+    db.commit()
+    return JSONResponse(content={"message": "Chat session deleted successfully", "session_id": session_id})
+
+
+@router.post("/student-projects/{project_id}/chat/sessions/{session_id}/messages", tags=["Student Projects"])
+async def send_chat_session_message(
+    project_id: int,
+    session_id: int,
+    message_data: ChatMessageCreate,
+    current_user: UserModel = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+) -> JSONResponse:
+    """
+    Send a message in a chat session.
+
+    The prompt holds the chat instructions, the session summary, the turns not
+    yet summarized, the PDF passages relevant to this message and the message
+    itself. Older turns are folded into the summary once they pass
+    `project_chat.history_token_budget`.
+    """
+    user_id = current_user.id
+    message = message_data.message
+    logging.warning(f"[STUDENT PROJECT] Chat session {session_id} message for project {project_id} from user: {user_id}")
+
+    if not get_openai_api_key():
+        raise HTTPException(
+            status_code=500,
+            detail="OPENAI_API_KEY environment variable must be set"
+        )
+    check_generation_token_available(db, current_user, amount=1)
+    db.rollback()  # Release the user row locked by the availability check
+
+    session = _get_chat_session(db, user_id, project_id, session_id)
+    messages = pending_messages(db, session)
+    messages = await compact_if_needed(db, session, messages, count_tokens(message))
+    # The summary call is paid for whether or not this turn succeeds
+    db.commit()
+
+    # Follow-ups like "explain that again" need the previous question to find their passages
+    previous_question = next((m.content for m in reversed(messages) if m.role == "user"), "")
+    retrieval_query = f"{previous_question}\n{message}".strip()
+    query_embedding = await embed_query(retrieval_query)
+    contents, pdf_excerpts = await run_in_threadpool(
+        _build_project_chat_context,
+        db, user_id, project_id, session.content_id, retrieval_query, query_embedding
+    )
+
+    # Static instructions and history come first so consecutive turns share a cacheable prefix
+    prompt = [{"role": "system", "content": _PROJECT_CHAT_INSTRUCTIONS}]
+    prompt.extend(history_prompt(session, messages))
+    prompt.append({"role": "system", "content": f"PDF Excerpts:\n{pdf_excerpts}"})
+    prompt.append({"role": "user", "content": message})
+
+    try:
+        response = await get_async_openai_client().chat.completions.create(
+            model=chat_model(),
+            messages=prompt,
+            temperature=0.7,
+            max_tokens=2000
+        )
+
+        response_text = response.choices[0].message.content if response.choices else "I'm sorry, I couldn't generate a response."
+        assistant_message = record_turn(db, session, message, response_text, usage_from_response(response))
+
+        # Consume 1 token for this generation
+        consume_generation_token(db, current_user, amount=1, count_in_period=False)
+        db.commit()
+
+        return JSONResponse(
+            content={
+                "session_id": session.id,
+                "message_id": assistant_message.id,
+                "response": response_text,
+                "project_id": project_id,
+                "content_id": session.content_id,
+                "pdfs_used": [c.name for c in contents]
+            },
+            headers={"Content-Type": "application/json; charset=utf-8"}
+        )
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        logging.error(f"[STUDENT PROJECT] Error calling LLM for chat session {session_id}: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate response: {str(e)}"
+        )
@@ -237,6 +237,11 @@ class StudentProjectResponse(BaseModel):
     flashcard_references: List[int] = []  # List of flashcard topic IDs
     essay_references: List[int] = []  # List of essay topic IDs
     mind_map_references: List[int] = []  # List of mind map IDs
+    content_count: int = 0
+    quiz_count: int = 0
+    flashcard_count: int = 0
+    essay_count: int = 0
+    mind_map_count: int = 0
 
 
 class MindMapResponse(BaseModel):
@@ -259,6 +264,16 @@ class MindMapResponse(BaseModel):
 class StudentProjectListResponse(BaseModel):
     projects: List[StudentProjectResponse]
     total_count: int
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page
+
+
+class ChatSessionCreate(BaseModel):
+    content_id: Optional[int] = None  # Chat with one PDF, or all PDFs in the project if None
+    title: Optional[str] = None
+
+
+class ChatMessageCreate(BaseModel):
+    message: str
 
 
 class StudentProjectReferenceCreate(BaseModel):
@@ -1,76 +1,451 @@
 import json
 import logging
+import multiprocessing
 import os
-from typing import Dict, List
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import json_repair
 from haystack import component
 from pypdf import PdfReader
 
+from backend.config.settings import get_pdf_parallel_extraction_settings
+from backend.utils.pdf_text_cache import (
+    CachedTextWriter,
+    compute_file_sha256,
+    get_cached_text,
+    store_cached_text,
+)
+
+NO_EXTRACTABLE_TEXT_MESSAGE = (
+    "The PDF appears to contain no extractable text. It may be a scanned document or contain only images. "
+    "Please use a text-based PDF or convert the scanned PDF to text first."
+)
+
+
+class NoExtractableTextError(ValueError):
+    """A PDF has no text layer (scanned or image-only); `page_count` is how many pages it has."""
+
+    def __init__(self, page_count: Optional[int] = None) -> None:
+        super().__init__(NO_EXTRACTABLE_TEXT_MESSAGE)
+        self.page_count = page_count
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop). Runs inside worker processes."""
+    reader = PdfReader(file_path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+def _split_page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    size = -(-page_count // parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+_extraction_pool_lock = threading.Lock()
+
+
+def _get_extraction_pool(workers: int) -> ProcessPoolExecutor:
+    """The process pool for page-range extraction, created on first use and reused."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            # Spawned, not forked: extraction starts from threads of a multi-threaded
+            # server, and a forked child can inherit locks held by other threads
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _extraction_pool
+
+
+def shutdown_extraction_pool() -> None:
+    """Stop the extraction worker processes (on application shutdown)."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        pool, _extraction_pool = _extraction_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_text_with_pypdf(file_path: str) -> Tuple[str, int]:
+    """Return the text of the non-empty pages and the document's page count."""
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    workers, page_threshold = get_pdf_parallel_extraction_settings()
+
+    page_texts: List[str] = []
+    if workers > 1 and page_count >= page_threshold:
+        ranges = _split_page_ranges(page_count, workers)
+        try:
+            executor = _get_extraction_pool(workers)
+            futures = [executor.submit(_extract_page_range, file_path, start, stop) for start, stop in ranges]
+            # Collect in submission order so pages stay in document order
+            for future in futures:
+                page_texts.extend(future.result())
+            logging.info(
+                "[PDF EXTRACTOR] Extracted %d pages from %s across %d processes",
+                page_count,
+                os.path.basename(file_path),
+                len(ranges),
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.warning("[PDF EXTRACTOR] Parallel extraction failed, falling back to sequential: %s", exc)
+            if isinstance(exc, BrokenProcessPool):
+                # A worker died; start a fresh pool on the next extraction
+                shutdown_extraction_pool()
+            page_texts = []
+
+    if not page_texts:
+        page_texts = [page.extract_text() or "" for page in reader.pages]
+
+    # Only keep non-empty pages, joined once
+    return "".join(page_text + "\n\n" for page_text in page_texts if page_text), page_count
+
+
 @component
 class PDFTextExtractor:
-    @component.output_types(text=str, filename=str)
+    @component.output_types(text=str, filename=str, page_count=Optional[int], content_hash=str)
     def run(self, file_path: str):
         """
         Extract text from a PDF file.
+
+        Extracted text is cached on disk keyed by the SHA-256 of the PDF bytes,
+        so the same document is only parsed by pypdf once.
         
         Args:
             file_path: Path to the PDF file
             
         Returns:
-            dict: A dictionary containing the extracted text and the filename
+            dict: The extracted text, the filename, the PDF's content hash and
+            its page count (None when the text came from the cache)
+
+        Raises:
+            NoExtractableTextError: If the PDF has no extractable text.
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"PDF file not found: {file_path}")
-            
-        reader = PdfReader(file_path)
-        text = ""
-        
-        # Extract text from each page
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:  # Only add non-empty pages
-                text += page_text + "\n\n"
+
+        filename = os.path.basename(file_path)
+        content_hash = compute_file_sha256(file_path)
+        cached_text = get_cached_text(content_hash)
+        if cached_text is not None:
+            logging.debug("[PDF EXTRACTOR] Cache hit for %s (%s)", filename, content_hash)
+            return {"text": cached_text, "filename": filename, "page_count": None, "content_hash": content_hash}
+
+        text, page_count = _extract_text_with_pypdf(file_path)
             
         # If text is still empty, the PDF might be scanned or have image-based content
         if not text.strip():
-            print("Warning: Extracted text is empty. The PDF might be scanned or contain only images.")
-            raise ValueError("The PDF appears to contain no extractable text. It may be a scanned document or contain only images. Please use a text-based PDF or convert the scanned PDF to text first.")
-            
-        filename = os.path.basename(file_path)
-        print(f"Extracted {len(text)} characters from {filename}")
+            logging.warning("[PDF EXTRACTOR] No text extracted from %s; it may be scanned or contain only images", filename)
+            raise NoExtractableTextError(page_count)
+
+        store_cached_text(content_hash, text)
+        logging.info("[PDF EXTRACTOR] Extracted %d characters from %s", len(text), filename)
         
         # Return with the key 'text' to match the output_types declaration
-        return {"text": text, "filename": filename}
+        return {"text": text, "filename": filename, "page_count": page_count, "content_hash": content_hash}
 
-@component
-class QuizParser:
-    @component.output_types(quiz=Dict)
-    def run(self, replies: List[str]):
-        reply = replies[0]
+    def iter_pages(self, file_path: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        Lazily extract a PDF page by page.
 
-        # even if prompted to respond with JSON only, sometimes the model returns a mix of JSON and text
-        first_index = min(reply.find("{"), reply.find("["))
-        last_index = max(reply.rfind("}"), reply.rfind("]")) + 1
+        Yields (pages_read, page_count, text) tuples as soon as each page is
+        parsed, so callers can start working before the whole document has been
+        read. A cache hit yields the cached text as a single piece. A fully
+        consumed stream is written to the text cache.
 
-        json_portion = reply[first_index:last_index]
+        Raises:
+            ValueError: If no page contained extractable text.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"PDF file not found: {file_path}")
 
+        content_hash = compute_file_sha256(file_path)
+        cached_text = get_cached_text(content_hash)
+        if cached_text is not None:
+            logging.debug("[PDF EXTRACTOR] Cache hit for %s (%s)", os.path.basename(file_path), content_hash)
+            yield 1, 1, cached_text
+            return
+
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+        writer = CachedTextWriter(content_hash)
+        has_text = False
         try:
-            quiz = json.loads(json_portion)
+            for index, page in enumerate(reader.pages):
+                page_text = page.extract_text()
+                if not page_text:
+                    continue
+                has_text = has_text or bool(page_text.strip())
+                piece = page_text + "\n\n"
+                writer.write(piece)
+                yield index + 1, page_count, piece
+
+            if not has_text:
+                raise NoExtractableTextError(page_count)
+            writer.commit()
+        finally:
+            writer.discard()
+
+
+_JSON_TOKEN = re.compile(r'[\[\]{}",:\\]')
+
+
+class IncrementalJSONParser:
+    """
+    Parse a JSON reply incrementally while the model is still streaming it.
+
+    Text passed to `feed` is scanned once, jumping between structural
+    characters, so parsing a 10k+ token reply stays linear however the stream
+    is split. Objects inside an array stored under one of `item_keys` (e.g.
+    "questions", "cards" or "nodes"), or inside a top-level array when
+    `top_level_items` is set, are handed to `on_item` as soon as their closing
+    brace arrives. Prose or markdown fences around the JSON are ignored, as are
+    bracketed asides in the prose: a complete top-level value that holds no
+    object or array (e.g. "[1]" or "{see below}") is skipped and scanning
+    restarts at the next opening bracket.
+
+    `finish` returns the whole document. A reply cut off mid-stream (e.g. at
+    max_tokens) is closed after its last complete value and only the trailing
+    incomplete item goes through json_repair.
+    """
+
+    def __init__(
+        self,
+        item_keys: Iterable[str] = (),
+        on_item: Optional[Callable[[Dict], None]] = None,
+        top_level_items: bool = True,
+    ) -> None:
+        self.item_keys = set(item_keys)
+        self.on_item = on_item
+        self.top_level_items = top_level_items
+        self.items: List[Dict] = []
+        self._chunks: List[str] = []
+        self._offset = 0  # Length of the text fed before the current chunk
+        # One (closer, is_item_array, key in parent) entry per open container
+        self._stack: List[Tuple[str, bool, Optional[str]]] = []
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        # First skipped top-level value, returned if nothing better follows
+        self._skipped: Optional[Tuple[int, int]] = None
+        # (offset, closers): the text up to offset plus closers is valid JSON
+        self._safe_point: Optional[Tuple[int, str]] = None
+        self._in_string = False
+        self._escape = False
+        self._string_parts: Optional[List[str]] = None
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._item_parts: Optional[List[str]] = None
+        self._item_depth = 0
+        self._item_path: List[Optional[str]] = []
+
+    def feed(self, text: str) -> None:
+        if not text:
+            return
+        self._chunks.append(text)
+        if self._end is None:
+            self._scan(text)
+        self._offset += len(text)
+
+    def finish(self) -> Any:
+        """Return the parsed document, or None if the reply contained no JSON."""
+        text = "".join(self._chunks)
+        if self._start is None:
+            if self._skipped is None:
+                return None
+            return json_repair.loads(text[self._skipped[0]:self._skipped[1]])
+
+        if self._end is not None:
+            json_portion = text[self._start:self._end]
+            try:
+                return json.loads(json_portion)
+            except json.JSONDecodeError as exc:
+                logging.warning("[JSON PARSER] Reply is not valid JSON, attempting repair: %s", exc)
+                return json_repair.loads(json_portion)
+
+        end, closers = self._safe_point
+        try:
+            document = json.loads(text[self._start:end] + closers)
+        except json.JSONDecodeError as exc:
+            logging.warning("[JSON PARSER] Truncated reply is not valid JSON, attempting repair: %s", exc)
+            return json_repair.loads(text[self._start:])
+
+        if self._item_parts is not None:
+            item = json_repair.loads("".join(self._item_parts))
+            container = self._find_container(document, self._item_path)
+            if isinstance(item, dict) and item and isinstance(container, list):
+                container.append(item)
+                self.items.append(item)
+        logging.info("[JSON PARSER] Reply was truncated; kept %d items", len(self.items))
+        return document
+
+    def _scan(self, text: str) -> None:
+        # Where the current item / string started within this chunk
+        capture_from = 0
+        string_from = 0
+        skip = 0 if self._escape else -1
+        self._escape = False
+
+        for match in _JSON_TOKEN.finditer(text):
+            index = match.start()
+            if index == skip:
+                continue
+            char = text[index]
+
+            if self._in_string:
+                if char == "\\":
+                    skip = index + 1
+                    self._escape = skip == len(text)
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_parts is not None:
+                        self._string_parts.append(text[string_from:index])
+                        self._last_string = "".join(self._string_parts)
+                        self._string_parts = None
+                continue
+
+            if not self._stack:
+                # Skip any prose before the JSON value
+                if char not in "{[":
+                    continue
+                self._start = self._offset + index
+
+            if char == '"':
+                self._in_string = True
+                if self._item_parts is None:
+                    self._string_parts = []
+                    string_from = index + 1
+            elif self._item_parts is not None:
+                if char in "{[":
+                    self._stack.append(("}" if char == "{" else "]", False, None))
+                elif char in "}]":
+                    self._stack.pop()
+                    if len(self._stack) == self._item_depth:
+                        self._item_parts.append(text[capture_from:index + 1])
+                        self._emit("".join(self._item_parts))
+                        self._item_parts = None
+                        self._mark_safe(index + 1)
+            elif char == ":":
+                self._current_key = self._last_string
+            elif char == ",":
+                self._current_key = None
+                self._mark_safe(index)
+            elif char in "{[":
+                in_object = bool(self._stack) and self._stack[-1][0] == "}"
+                key = self._current_key if in_object else None
+                self._current_key = None
+                if char == "{" and self._stack and self._stack[-1][1]:
+                    self._item_parts = []
+                    capture_from = index
+                    self._item_depth = len(self._stack)
+                    self._item_path = [entry_key for _, _, entry_key in self._stack]
+                    self._stack.append(("}", False, key))
+                    continue
+                if char == "{":
+                    self._stack.append(("}", False, key))
+                else:
+                    is_items = key in self.item_keys if self._stack else self.top_level_items
+                    self._stack.append(("]", is_items, key))
+                self._mark_safe(index + 1)
+            else:
+                self._stack.pop()
+                if not self._stack:
+                    end = self._offset + index + 1
+                    if self._is_document("".join(self._chunks)[self._start:end]):
+                        self._end = end
+                        return
+                    # Brackets in prose; keep looking for the JSON value
+                    if self._skipped is None:
+                        self._skipped = (self._start, end)
+                    self._start = None
+                    self._safe_point = None
+                    self._current_key = None
+                    continue
+                self._mark_safe(index + 1)
+
+        if self._item_parts is not None:
+            self._item_parts.append(text[capture_from:])
+        if self._string_parts is not None:
+            self._string_parts.append(text[string_from:])
+
+    @staticmethod
+    def _is_document(raw: str) -> bool:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = json_repair.loads(raw)
+        if isinstance(value, dict):
+            return bool(value) and any(isinstance(child, (dict, list)) for child in value.values())
+        return isinstance(value, list) and any(isinstance(child, (dict, list)) for child in value)
+
+    def _mark_safe(self, index: int) -> None:
+        closers = "".join(closer for closer, _, _ in reversed(self._stack))
+        self._safe_point = (self._offset + index, closers)
+
+    def _emit(self, raw: str) -> None:
+        try:
+            item = json.loads(raw)
         except json.JSONDecodeError:
-            # if the JSON is not well-formed, try to repair it
-            quiz = json_repair.loads(json_portion)
+            item = json_repair.loads(raw)
+        if not isinstance(item, dict):
+            logging.warning("[JSON PARSER] Skipping malformed item (%d chars)", len(raw))
+            return
+        self.items.append(item)
+        if self.on_item is not None:
+            self.on_item(item)
+
+    @staticmethod
+    def _find_container(document: Any, path: List[Optional[str]]) -> Any:
+        # path holds each open container's key in its parent; list children are the last element
+        node = document
+        for key in path[1:]:
+            if isinstance(node, dict):
+                node = node.get(key)
+            elif isinstance(node, list) and node:
+                node = node[-1]
+            else:
+                return None
+        return node
+
+
+def parse_json_reply(reply: str, item_keys: Iterable[str] = (), top_level_items: bool = True) -> Any:
+    """Parse a complete model reply with IncrementalJSONParser."""
+    parser = IncrementalJSONParser(item_keys, top_level_items=top_level_items)
+    parser.feed(reply)
+    return parser.finish()
+
+
+@component
+class QuizParser:
+    # Used by IncrementalJSONParser to find the streamed items
+    ITEM_KEYS = ("questions",)
+    TOP_LEVEL_ITEMS = False
+
+    @component.output_types(quiz=Dict)
+    def run(self, replies: List[str]):
+        # even if prompted to respond with JSON only, sometimes the model returns a mix of JSON and text;
+        # the parser skips anything around the JSON value
+        return self.build(parse_json_reply(replies[0], self.ITEM_KEYS, self.TOP_LEVEL_ITEMS))
+
+    def build(self, quiz: Any) -> Dict:
+        if quiz is None:
+            raise ValueError("Quiz response did not contain JSON content")
 
         # sometimes the JSON contains a list instead of a dictionary
         if isinstance(quiz, list):
-            quiz = quiz[0]
-
-        print(quiz)
+            quiz = quiz[0] if quiz else {}
 
         return {"quiz": quiz}
 
 @component
 class FlashcardParser:
+    ITEM_KEYS = ("cards", "flashcards")
+    TOP_LEVEL_ITEMS = True
+
     @component.output_types(flashcards=Dict)
     def run(self, replies: List[str]):
         """
@@ -82,19 +457,11 @@ class FlashcardParser:
         Returns:
             dict: A dictionary containing the parsed flashcards
         """
-        reply = replies[0]
+        return self.build(parse_json_reply(replies[0], self.ITEM_KEYS, self.TOP_LEVEL_ITEMS))
 
-        # Extract the JSON portion from the response
-        first_index = min(reply.find("{"), reply.find("["))
-        last_index = max(reply.rfind("}"), reply.rfind("]")) + 1
-
-        json_portion = reply[first_index:last_index]
-
-        try:
-            flashcards = json.loads(json_portion)
-        except json.JSONDecodeError:
-            # If the JSON is not well-formed, try to repair it
-            flashcards = json_repair.loads(json_portion)
+    def build(self, flashcards: Any) -> Dict:
+        if flashcards is None:
+            raise ValueError("Flashcard response did not contain JSON content")
 
         # Handle if the response is a list instead of a dictionary
         if isinstance(flashcards, list):
@@ -111,12 +478,13 @@ class FlashcardParser:
             else:
                 flashcards["cards"] = []
 
-        print(flashcards)
-        
         return {"flashcards": flashcards}
 
 @component
 class EssayQAParser:
+    ITEM_KEYS = ("questions",)
+    TOP_LEVEL_ITEMS = True
+
     @component.output_types(essay_qa=Dict)
     def run(self, replies: List[str]):
         """
@@ -128,19 +496,11 @@ class EssayQAParser:
         Returns:
             dict: A dictionary containing the parsed Essay QA questions
         """
-        reply = replies[0]
+        return self.build(parse_json_reply(replies[0], self.ITEM_KEYS, self.TOP_LEVEL_ITEMS))
 
-        # Extract the JSON portion from the response
-        first_index = min(reply.find("{"), reply.find("[")) if reply.find("{") != -1 and reply.find("[") != -1 else max(reply.find("{"), reply.find("["))
-        last_index = max(reply.rfind("}"), reply.rfind("]")) + 1
-
-        json_portion = reply[first_index:last_index]
-
-        try:
-            essay_qa = json.loads(json_portion)
-        except json.JSONDecodeError:
-            # If the JSON is not well-formed, try to repair it
-            essay_qa = json_repair.loads(json_portion)
+    def build(self, essay_qa: Any) -> Dict:
+        if essay_qa is None:
+            raise ValueError("Essay QA response did not contain JSON content")
 
         # Handle if the response is a list instead of a dictionary
         if isinstance(essay_qa, list):
@@ -161,13 +521,14 @@ class EssayQAParser:
             if "full_answer" not in question:
                 question["full_answer"] = ""
 
-        print(essay_qa)
-        
         return {"essay_qa": essay_qa}
 
 
 @component
 class MindMapParser:
+    ITEM_KEYS = ("nodes",)
+    TOP_LEVEL_ITEMS = False
+
     @component.output_types(mind_map=Dict)
     def run(self, replies: List[str]):
         """
@@ -175,25 +536,12 @@ class MindMapParser:
         Ensures nodes/edges arrays are present even if missing from the payload.
         """
         logging.info("[MIND MAP PARSER] Starting to parse LLM response (length: %d chars)", len(replies[0]) if replies else 0)
-        reply = replies[0]
+        return self.build(parse_json_reply(replies[0], self.ITEM_KEYS, self.TOP_LEVEL_ITEMS))
 
-        first_index_candidates = [idx for idx in (reply.find("{"), reply.find("[")) if idx != -1]
-        if not first_index_candidates:
+    def build(self, mind_map: Any) -> Dict:
+        if mind_map is None:
             logging.error("[MIND MAP PARSER] Response did not contain JSON content")
             raise ValueError("Mind map response did not contain JSON content")
-        first_index = min(first_index_candidates)
-        last_index = max(reply.rfind("}"), reply.rfind("]")) + 1
-
-        json_portion = reply[first_index:last_index]
-        logging.debug("[MIND MAP PARSER] Extracted JSON portion (length: %d chars)", len(json_portion))
-
-        try:
-            mind_map = json.loads(json_portion)
-            logging.debug("[MIND MAP PARSER] Successfully parsed JSON using standard parser")
-        except json.JSONDecodeError as e:
-            logging.warning("[MIND MAP PARSER] Standard JSON parsing failed, attempting repair: %s", str(e))
-            mind_map = json_repair.loads(json_portion)
-            logging.info("[MIND MAP PARSER] Successfully repaired and parsed JSON")
 
         if isinstance(mind_map, list):
             logging.debug("[MIND MAP PARSER] Response was a list, extracting first element")
@@ -217,4 +565,4 @@ class MindMapParser:
             key_concept_count,
         )
 
-        return {"mind_map": mind_map}
\ No newline at end of file
+        return {"mind_map": mind_map}
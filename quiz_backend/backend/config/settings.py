@@ -18,14 +18,49 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "limits": {
         "free_tier": {
             "max_projects": 3,
+            "concurrent_generations": 1,
+            "queue_weight": 1,
         },
         "pro_tier": {
             "max_projects": -1,
             # monthly_generations should be configured in app_config.yaml
             # This default is only used if the config file doesn't specify it
             "monthly_generations": PRO_MONTHLY_GENERATIONS_DEFAULT,
+            "concurrent_generations": 3,
+            "queue_weight": 3,
         },
     },
+    "generation_queue": {
+        "global_concurrency": 8,
+    },
+    "generation_cache": {
+        "enabled": True,
+        "ttl_seconds": 7 * 24 * 3600,
+        "max_entries": 5000,
+        "policy": "exact",
+        "variant_pool_size": 3,
+    },
+    "project_chat": {
+        "top_k": 8,
+        "chunk_max_tokens": 500,
+        "chunk_overlap_tokens": 50,
+        "embeddings_enabled": False,
+        "embedding_model": "text-embedding-3-small",
+        "history_token_budget": 3000,
+        "summary_max_tokens": 500,
+    },
+    "auth": {
+        "principal_cache_ttl_seconds": 30,
+        "principal_cache_max_entries": 10000,
+    },
+    "rate_limit": {
+        "backend": "memory",
+        "redis_url": "redis://localhost:6379/0",
+        "key_prefix": "ratelimit:",
+        "sqlite_path": None,
+        "max_buckets": 10000,
+        "sweep_interval_seconds": 60,
+    },
     "pricing": {
         "hero": {
             "title": "Simple, transparent pricing",
@@ -190,6 +225,202 @@ def get_pro_generation_limit() -> int:
         return PRO_MONTHLY_GENERATIONS_DEFAULT
 
 
+def get_generation_queue_limits() -> Dict[str, Any]:
+    """
+    Concurrency limits for the generation job scheduler.
+
+    Returns a dict with `global_concurrency` and, per tier, the number of jobs a
+    user may run at once (`concurrent_generations`) and the fair-share weight
+    (`queue_weight`) used to order contended jobs.
+    """
+    config = get_app_config()
+    limits = config.get("limits") or {}
+    queue_config = config.get("generation_queue") or {}
+
+    def _positive_int(value: Any, default: int) -> int:
+        if value is None:
+            return default
+        try:
+            return max(1, int(value))
+        except (TypeError, ValueError):
+            logging.warning("[CONFIG] Invalid generation queue value %r, using %d", value, default)
+            return default
+
+    tiers: Dict[str, Dict[str, int]] = {}
+    for tier in ("free_tier", "pro_tier"):
+        tier_limits = limits.get(tier) or {}
+        tier_defaults = DEFAULT_CONFIG["limits"][tier]
+        tiers[tier] = {
+            "concurrent_generations": _positive_int(
+                tier_limits.get("concurrent_generations"), tier_defaults["concurrent_generations"]
+            ),
+            "queue_weight": _positive_int(tier_limits.get("queue_weight"), tier_defaults["queue_weight"]),
+        }
+
+    return {
+        "global_concurrency": _positive_int(
+            queue_config.get("global_concurrency"),
+            DEFAULT_CONFIG["generation_queue"]["global_concurrency"],
+        ),
+        "tiers": tiers,
+    }
+
+
+GENERATION_CACHE_POLICIES = ("exact", "variant")
+
+
+def get_generation_cache_settings() -> Dict[str, Any]:
+    """
+    Settings for the shared generation result cache.
+
+    `policy` is `exact` (always serve the cached result) or `variant` (keep up to
+    `variant_pool_size` results per key and serve a random one once the pool is
+    full, so students sharing a document do not all get identical questions).
+    """
+    config = get_app_config()
+    cache_config = config.get("generation_cache") or {}
+    defaults = DEFAULT_CONFIG["generation_cache"]
+
+    def _int_setting(key: str, minimum: int) -> int:
+        value = cache_config.get(key)
+        if value is None:
+            return defaults[key]
+        try:
+            return max(minimum, int(value))
+        except (TypeError, ValueError):
+            logging.warning("[CONFIG] Invalid generation_cache.%s value %r, using %d", key, value, defaults[key])
+            return defaults[key]
+
+    policy = str(cache_config.get("policy", defaults["policy"])).lower()
+    if policy not in GENERATION_CACHE_POLICIES:
+        logging.warning("[CONFIG] Unknown generation_cache.policy %r, using %s", policy, defaults["policy"])
+        policy = defaults["policy"]
+
+    return {
+        "enabled": bool(cache_config.get("enabled", defaults["enabled"])),
+        "ttl_seconds": _int_setting("ttl_seconds", 0),
+        "max_entries": _int_setting("max_entries", 1),
+        "policy": policy,
+        "variant_pool_size": _int_setting("variant_pool_size", 1),
+    }
+
+
+def get_project_chat_settings() -> Dict[str, Any]:
+    """
+    Settings for project chat retrieval.
+
+    Project PDFs are split into passages of about `chunk_max_tokens` tokens and
+    chat sends the `top_k` most relevant ones. With `embeddings_enabled`,
+    passages are also embedded with `embedding_model` and ranked by both BM25
+    and embedding similarity.
+
+    Chat sessions send their recent turns verbatim up to `history_token_budget`
+    tokens; older turns are folded into a summary of at most
+    `summary_max_tokens` tokens.
+    """
+    config = get_app_config()
+    chat_config = config.get("project_chat") or {}
+    defaults = DEFAULT_CONFIG["project_chat"]
+
+    def _int_setting(key: str, minimum: int) -> int:
+        value = chat_config.get(key)
+        if value is None:
+            return defaults[key]
+        try:
+            return max(minimum, int(value))
+        except (TypeError, ValueError):
+            logging.warning("[CONFIG] Invalid project_chat.%s value %r, using %d", key, value, defaults[key])
+            return defaults[key]
+
+    return {
+        "top_k": _int_setting("top_k", 1),
+        "chunk_max_tokens": _int_setting("chunk_max_tokens", 50),
+        "chunk_overlap_tokens": _int_setting("chunk_overlap_tokens", 0),
+        "embeddings_enabled": bool(chat_config.get("embeddings_enabled", defaults["embeddings_enabled"])),
+        "embedding_model": str(chat_config.get("embedding_model") or defaults["embedding_model"]),
+        "history_token_budget": _int_setting("history_token_budget", 200),
+        "summary_max_tokens": _int_setting("summary_max_tokens", 50),
+    }
+
+
+def get_principal_cache_settings() -> Dict[str, int]:
+    """
+    Settings for the per-worker cache of authenticated users.
+
+    Entries live for `principal_cache_ttl_seconds` (0 disables the cache);
+    beyond `principal_cache_max_entries` the least recently used are evicted.
+    """
+    config = get_app_config()
+    auth_config = config.get("auth") or {}
+    defaults = DEFAULT_CONFIG["auth"]
+
+    def _int_setting(key: str, minimum: int) -> int:
+        value = auth_config.get(key)
+        if value is None:
+            return defaults[key]
+        try:
+            return max(minimum, int(value))
+        except (TypeError, ValueError):
+            logging.warning("[CONFIG] Invalid auth.%s value %r, using %d", key, value, defaults[key])
+            return defaults[key]
+
+    return {
+        "ttl_seconds": _int_setting("principal_cache_ttl_seconds", 0),
+        "max_entries": _int_setting("principal_cache_max_entries", 1),
+    }
+
+
+RATE_LIMIT_BACKENDS = ("memory", "sqlite", "redis")
+
+
+def get_rate_limit_settings() -> Dict[str, Any]:
+    """
+    Settings for the API rate limiter's token bucket store.
+
+    `backend` is `memory` (buckets live in each worker process, so the effective
+    limit is multiplied by the number of workers), `sqlite` (one database file
+    shared by the workers of a single host) or `redis` (shared by every worker
+    and replica). `RATE_LIMIT_REDIS_URL` and `RATE_LIMIT_SQLITE_PATH` override
+    the configured location. The SQLite file defaults to the Railway volume
+    under `/app/data` when mounted, else the working directory.
+
+    The memory backend keeps at most `max_buckets` buckets per worker and drops
+    idle ones every `sweep_interval_seconds` (0 disables the sweeper).
+    """
+    config = get_app_config()
+    limit_config = config.get("rate_limit") or {}
+    defaults = DEFAULT_CONFIG["rate_limit"]
+
+    backend = str(limit_config.get("backend", defaults["backend"])).lower()
+    if backend not in RATE_LIMIT_BACKENDS:
+        logging.warning("[CONFIG] Unknown rate_limit.backend %r, using %s", backend, defaults["backend"])
+        backend = defaults["backend"]
+
+    def _int_setting(key: str, minimum: int) -> int:
+        value = limit_config.get(key)
+        if value is None:
+            return defaults[key]
+        try:
+            return max(minimum, int(value))
+        except (TypeError, ValueError):
+            logging.warning("[CONFIG] Invalid rate_limit.%s value %r, using %d", key, value, defaults[key])
+            return defaults[key]
+
+    sqlite_path = os.getenv("RATE_LIMIT_SQLITE_PATH") or limit_config.get("sqlite_path")
+    if not sqlite_path:
+        base_dir = "/app/data" if os.path.isdir("/app/data") else os.getcwd()
+        sqlite_path = os.path.join(base_dir, "rate_limits.db")
+
+    return {
+        "backend": backend,
+        "redis_url": os.getenv("RATE_LIMIT_REDIS_URL") or str(limit_config.get("redis_url") or defaults["redis_url"]),
+        "key_prefix": str(limit_config.get("key_prefix") or defaults["key_prefix"]),
+        "sqlite_path": str(sqlite_path),
+        "max_buckets": _int_setting("max_buckets", 1),
+        "sweep_interval_seconds": _int_setting("sweep_interval_seconds", 0),
+    }
+
+
 def get_subscription_plans_config() -> Dict[str, Dict[str, Any]]:
     config = get_app_config()
     subscriptions = config.get("subscriptions") or {}
@@ -283,3 +514,58 @@ def get_pdf_storage_dir() -> str:
         "Unable to locate a writable directory for PDF storage. "
         "Set PDF_STORAGE_DIR environment variable to a writable path."
     )
+
+
+def get_pdf_text_cache_dir() -> str:
+    """
+    Directory holding extracted PDF text keyed by the SHA-256 of the PDF bytes.
+
+    Defaults to a `.text_cache` folder inside the PDF storage directory so the
+    cache lives on the same volume as the PDFs. Override with `PDF_TEXT_CACHE_DIR`.
+    """
+    cache_dir = os.getenv("PDF_TEXT_CACHE_DIR") or os.path.join(get_pdf_storage_dir(), ".text_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_pdf_text_cache_limits() -> Tuple[int, int]:
+    """
+    Size and age limits of the PDF text cache, as (max_bytes, max_age_seconds).
+
+    `PDF_TEXT_CACHE_MAX_MB` (default 2048) caps the total size of the cache and
+    `PDF_TEXT_CACHE_MAX_AGE_DAYS` (default 90) drops entries not read for that
+    long. 0 disables a limit.
+    """
+    try:
+        max_mb = int(os.getenv("PDF_TEXT_CACHE_MAX_MB", 2048))
+    except ValueError:
+        logging.warning("[CONFIG] Invalid PDF_TEXT_CACHE_MAX_MB value, using 2048")
+        max_mb = 2048
+    try:
+        max_age_days = int(os.getenv("PDF_TEXT_CACHE_MAX_AGE_DAYS", 90))
+    except ValueError:
+        logging.warning("[CONFIG] Invalid PDF_TEXT_CACHE_MAX_AGE_DAYS value, using 90")
+        max_age_days = 90
+    return max(0, max_mb) * 1024 * 1024, max(0, max_age_days) * 86400
+
+
+def get_pdf_parallel_extraction_settings() -> Tuple[int, int]:
+    """
+    Worker count and page threshold for process-parallel PDF text extraction.
+
+    PDFs with at least `PDF_PARALLEL_PAGE_THRESHOLD` pages (default 50) are split
+    into page ranges across `PDF_EXTRACTION_PROCESSES` worker processes (default:
+    CPU count, capped at 4). A worker count of 1 disables the process pool.
+    """
+    default_workers = min(4, os.cpu_count() or 1)
+    try:
+        workers = int(os.getenv("PDF_EXTRACTION_PROCESSES", default_workers))
+    except ValueError:
+        logging.warning("[CONFIG] Invalid PDF_EXTRACTION_PROCESSES value, using %d", default_workers)
+        workers = default_workers
+    try:
+        threshold = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", 50))
+    except ValueError:
+        logging.warning("[CONFIG] Invalid PDF_PARALLEL_PAGE_THRESHOLD value, using 50")
+        threshold = 50
+    return max(1, workers), max(1, threshold)
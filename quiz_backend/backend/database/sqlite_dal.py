@@ -1,7 +1,7 @@
 import datetime
 
-from sqlalchemy import JSON, Column, Date, DateTime, ForeignKey, Integer, String, Boolean, Float, Text
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import JSON, Column, Date, DateTime, ForeignKey, Index, Integer, String, Boolean, Float, Text
+from sqlalchemy.orm import declarative_base, deferred, relationship
 
 from backend.config import get_free_generation_quota
 
@@ -155,6 +155,56 @@ class QuizAttempt(Base):
     user = relationship("User", back_populates="quiz_attempts")
     topic = relationship("QuizTopic", back_populates="attempts")
 
+    __table_args__ = (
+        # Recent history on the analytics dashboard
+        Index("ix_quiz_attempts_user_id_timestamp", "user_id", "timestamp"),
+    )
+
+
+class UserAnalytics(Base):
+    """Per-user rollup of quiz attempts, updated with every recorded attempt."""
+
+    __tablename__ = "user_analytics"
+
+    user_id = Column(String(255), ForeignKey("users.id"), primary_key=True)
+    total_quizzes = Column(Integer, nullable=False, default=0)
+    total_time_spent = Column(Integer, nullable=False, default=0)  # Seconds
+    score_sum = Column(Float, nullable=False, default=0.0)  # Sum of percentage scores
+    best_score = Column(Float, nullable=False, default=0.0)
+    scores = Column(JSON, nullable=False, default=list)  # Percentage scores, oldest first
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+
+
+class UserCategoryAnalytics(Base):
+    __tablename__ = "user_category_analytics"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(255), ForeignKey("users.id"), nullable=False)
+    category = Column(String, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    total_questions = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_user_category_analytics_user_id_category", "user_id", "category", unique=True),
+    )
+
+
+class GenerationUsage(Base):
+    """Generations a subscribed user made in one billing period, incremented as each is consumed."""
+
+    __tablename__ = "generation_usage"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(255), ForeignKey("users.id"), nullable=False)
+    period_start = Column(DateTime, nullable=False)  # Subscription.current_period_start of the period
+    generations = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+
+    __table_args__ = (
+        Index("ix_generation_usage_user_id_period_start", "user_id", "period_start", unique=True),
+    )
+
 
 class FlashcardTopic(Base):
     __tablename__ = "flashcard_topics"
@@ -264,6 +314,8 @@ class StudentProject(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.now)
     updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    # Bumped whenever the project's generated content changes; validates cached listings
+    content_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     user = relationship("User", back_populates="student_projects")
@@ -274,6 +326,11 @@ class StudentProject(Base):
     mind_map_references = relationship("StudentProjectMindMapReference", back_populates="project")
     mind_maps = relationship("MindMap", back_populates="project")
 
+    __table_args__ = (
+        # Serves the keyset-paginated project listing
+        Index("ix_student_projects_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
 
 class StudentProjectContent(Base):
     __tablename__ = "student_project_contents"
@@ -285,11 +342,77 @@ class StudentProjectContent(Base):
     content_url = Column(String, nullable=True)  # For PDFs and URLs
     content_text = Column(Text, nullable=True)  # For text content
     file_size = Column(Integer, nullable=True)  # For PDFs
+    extracted_text = deferred(Column(Text, nullable=True))  # Text extracted from the PDF after upload; loaded on access
+    page_count = Column(Integer, nullable=True)
+    char_count = Column(Integer, nullable=True)
+    extraction_status = Column(String(50), nullable=True)  # pending, completed, no_text, failed
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the PDF bytes, the key of its text cache entry
     uploaded_at = Column(DateTime, default=datetime.datetime.now)
     
     # Relationships
     project = relationship("StudentProject", back_populates="contents")
 
+    __table_args__ = (
+        Index("ix_student_project_contents_project_id", "project_id"),
+        Index("ix_student_project_contents_content_hash", "content_hash"),
+    )
+
+
+class ProjectContentChunk(Base):
+    """A passage of a project PDF, indexed for project chat retrieval."""
+
+    __tablename__ = "project_content_chunks"
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("student_projects.id"), nullable=False)
+    content_id = Column(Integer, ForeignKey("student_project_contents.id"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)  # Position of the passage within its document
+    text = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False, default=0)
+    term_counts = Column(JSON, nullable=False)  # Term -> frequency, the lexical (BM25) index entry
+    embedding = deferred(Column(JSON, nullable=True))  # Only filled when embeddings are enabled
+    created_at = Column(DateTime, default=datetime.datetime.now)
+
+    __table_args__ = (
+        Index("ix_project_content_chunks_project_id", "project_id"),
+        Index("ix_project_content_chunks_content_id", "content_id"),
+    )
+
+
+class ChatSession(Base):
+    """A project chat conversation whose history is kept server-side."""
+
+    __tablename__ = "chat_sessions"
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("student_projects.id"), nullable=False)
+    user_id = Column(String(255), ForeignKey("users.id"), nullable=False)
+    content_id = Column(Integer, ForeignKey("student_project_contents.id"), nullable=True)  # None: all project PDFs
+    title = Column(String(255), nullable=True)
+    summary = Column(Text, nullable=True)  # Compacted summary of the older turns
+    summarized_through_id = Column(Integer, nullable=True)  # Last message folded into the summary
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+
+    __table_args__ = (
+        Index("ix_chat_sessions_project_id_user_id", "project_id", "user_id"),
+    )
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
+    role = Column(String(20), nullable=False)  # user, assistant
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+
+    __table_args__ = (
+        Index("ix_chat_messages_session_id", "session_id"),
+    )
+
 
 class StudentProjectQuizReference(Base):
     __tablename__ = "student_project_quiz_references"
@@ -305,6 +428,10 @@ class StudentProjectQuizReference(Base):
     content = relationship("StudentProjectContent")  # Added relationship
     quiz_topic = relationship("QuizTopic")
 
+    __table_args__ = (
+        Index("ix_student_project_quiz_refs_project_id", "project_id"),
+    )
+
 
 class StudentProjectFlashcardReference(Base):
     __tablename__ = "student_project_flashcard_references"
@@ -320,6 +447,10 @@ class StudentProjectFlashcardReference(Base):
     content = relationship("StudentProjectContent")  # Added relationship
     flashcard_topic = relationship("FlashcardTopic")
 
+    __table_args__ = (
+        Index("ix_student_project_flashcard_refs_project_id", "project_id"),
+    )
+
 
 class StudentProjectEssayReference(Base):
     __tablename__ = "student_project_essay_references"
@@ -335,6 +466,10 @@ class StudentProjectEssayReference(Base):
     content = relationship("StudentProjectContent")  # Added relationship
     essay_topic = relationship("EssayQATopic")
 
+    __table_args__ = (
+        Index("ix_student_project_essay_refs_project_id", "project_id"),
+    )
+
 
 class StudentProjectMindMapReference(Base):
     __tablename__ = "student_project_mindmap_references"
@@ -365,10 +500,23 @@ class GenerationJob(Base):
     input_tokens = Column(Integer, nullable=True)
     output_tokens = Column(Integer, nullable=True)
     total_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
+    # Queue bookkeeping: workers claim pending jobs and hold them under a renewable lease
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer, nullable=False, default=3, server_default="3")
+    available_at = Column(DateTime, nullable=True)  # Earliest time a pending job may be claimed (retry backoff)
+    locked_by = Column(String(255), nullable=True)  # Worker id holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)  # When a worker last claimed the job
     created_at = Column(DateTime, default=datetime.datetime.now)
     updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     completed_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_generation_jobs_status_available_at", "status", "available_at"),
+    )
+
     user = relationship("User")
     project = relationship("StudentProject")
     content = relationship("StudentProjectContent")
@@ -379,16 +527,38 @@ class TokenUsage(Base):
 
     id = Column(Integer, primary_key=True)
     user_id = Column(String(255), ForeignKey("users.id"), nullable=False)
-    generation_type = Column(String(50), nullable=False)  # quiz, flashcard, essay_qa, mind_map
-    topic_id = Column(Integer, nullable=True)  # ID of the generated content
+    generation_type = Column(String(50), nullable=False)  # quiz, flashcard, essay_qa, mind_map, chat, chat_summary
+    topic_id = Column(Integer, nullable=True)  # ID of the generated content (the chat session for chat usage)
     input_tokens = Column(Integer, nullable=False)
     output_tokens = Column(Integer, nullable=False)
     total_tokens = Column(Integer, nullable=False)
+    cached_tokens = Column(Integer, nullable=False, default=0, server_default="0")  # Input tokens served from the provider's prompt cache
     created_at = Column(DateTime, default=datetime.datetime.now)
 
     user = relationship("User")
 
 
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache_entries"
+
+    id = Column(Integer, primary_key=True)
+    # SHA-256 over source hash, content type, generation parameters, prompt version and model
+    cache_key = Column(String(64), nullable=False)
+    content_type = Column(String(50), nullable=False)  # quiz, flashcard, essay_qa, mind_map
+    source_hash = Column(String(64), nullable=False)
+    result = Column(JSON, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    last_used_at = Column(DateTime, default=datetime.datetime.now)  # Drives LRU eviction
+    expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_generation_cache_entries_cache_key", "cache_key"),
+        Index("ix_generation_cache_entries_last_used_at", "last_used_at"),
+        Index("ix_generation_cache_entries_source_hash", "source_hash"),
+    )
+
+
 class Referral(Base):
     __tablename__ = "referrals"
 
@@ -1,10 +1,5 @@
-Essay_QA_PROMPT = """Given the following text, create {{ num_questions }} essay-type questions with detailed answers in JSON format. In the same language as the text.
-
-{% if feedback %}
-LEARNER PERFORMANCE CONTEXT:
-{{ feedback }}
-Emphasize questions and answers that shore up these weak areas while staying faithful to the provided text.
-{% endif %}
+Essay_QA_PROMPT = """You create essay-type questions with detailed answers in JSON format from a source text, in the same language as the text.
+The number of questions, the difficulty level and any learner focus are given in the task after the text.
 
 Each question should:
 1. Challenge understanding of key concepts from the text
@@ -22,14 +17,6 @@ For each question, provide:
 2. A complete, detailed answer that thoroughly addresses the question
 3. Key information points that summarize the essential elements of the answer
 
-{% if difficulty == "easy" %}
-Create straightforward questions that test basic understanding and recall of the main concepts from the text.
-{% elif difficulty == "medium" %}
-Create moderately challenging questions that require understanding relationships between concepts and some analysis.
-{% elif difficulty == "hard" %}
-Create challenging questions that require deep understanding, critical thinking, and the ability to make connections between different parts of the text.
-{% endif %}
-
 Categorize the questions by selecting the most appropriate category and subcategory from this list: (always in english)
 
 1. General Knowledge
@@ -96,4 +83,20 @@ Example JSON format you should follow:
 
 text:
 {{ documents|truncate(20000) }}
-""" 
\ No newline at end of file
+
+Task: create {{ num_questions }} essay-type questions with detailed answers from the text above.
+
+{% if difficulty == "easy" %}
+Create straightforward questions that test basic understanding and recall of the main concepts from the text.
+{% elif difficulty == "medium" %}
+Create moderately challenging questions that require understanding relationships between concepts and some analysis.
+{% elif difficulty == "hard" %}
+Create challenging questions that require deep understanding, critical thinking, and the ability to make connections between different parts of the text.
+{% endif %}
+
+{% if feedback %}
+LEARNER PERFORMANCE CONTEXT:
+{{ feedback }}
+Emphasize questions and answers that shore up these weak areas while staying faithful to the provided text.
+{% endif %}
+"""
@@ -1,10 +1,5 @@
-FLASHCARD_GENERATION_PROMPT = """Given the following text, create {{ num_cards }} flashcards with key concepts, terms, definitions, and important information. In the same language as the text.
-
-{% if feedback %}
-Learner performance feedback indicates that the following areas need reinforcement:
-{{ feedback }}
-Prioritize creating flashcards that focus on clarifying, reinforcing, and drilling these weaker topics while still covering the essential content in the provided text.
-{% endif %}
+FLASHCARD_GENERATION_PROMPT = """You create flashcards with key concepts, terms, definitions, and important information from a source text, in the same language as the text.
+The number of flashcards and any learner focus are given in the task after the text.
 
 For each flashcard:
 1. The front should contain a clear, concise question or term
@@ -92,4 +87,12 @@ Example JSON format you should follow:
 
 text:
 {{ documents|truncate(20000) }}
-""" 
\ No newline at end of file
+
+Task: create {{ num_cards }} flashcards from the text above.
+
+{% if feedback %}
+Learner performance feedback indicates that the following areas need reinforcement:
+{{ feedback }}
+Prioritize creating flashcards that focus on clarifying, reinforcing, and drilling these weaker topics while still covering the essential content in the provided text.
+{% endif %}
+"""
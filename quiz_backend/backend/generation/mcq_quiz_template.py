@@ -1,14 +1,5 @@
-QUIZ_GENERATION_PROMPT = """{% if auto_question_mode %}
-Given the following text, create a well-balanced set of multiple choice quizzes in JSON format with {{ difficulty }} difficulty level in the same language as the text. Choose an appropriate number of high-quality questions (typically 6-10) that cover the breadth of the material and avoid redundancy.
-{% else %}
-Given the following text, create {{ num_questions }} multiple choice quizzes in JSON format with {{ difficulty }} difficulty level in the same language as the text.
-{% endif %}
-
-{% if feedback %}
-LEARNER WEAKNESSES TO TARGET:
-{{ feedback }}
-Prioritize generating questions that revisit these weak areas while still covering the breadth of the provided text.
-{% endif %}
+QUIZ_GENERATION_PROMPT = """You create multiple choice quizzes in JSON format from a source text, in the same language as the text.
+The number of questions, the difficulty level and any learner focus are given in the TASK section after the text.
 
 CRITICAL: ANSWER POSITION RANDOMIZATION
 To ensure quiz quality and prevent patterns, you MUST randomize the position of correct answers:
@@ -17,39 +8,6 @@ To ensure quiz quality and prevent patterns, you MUST randomize the position of
 - Before finalizing, verify that correct answers are well-distributed across all four positions
 - The correct answer position should feel unpredictable and natural
 
-DIFFICULTY GUIDELINES:
-{% if difficulty == "easy" %}
-Create straightforward questions that test basic understanding and recall of the main concepts from the text. Focus on:
-- Direct facts and definitions explicitly stated in the text
-- Simple cause-and-effect relationships clearly described
-- Basic identification of key terms, people, or events
-- Main ideas and obvious details from the text
-- Chronological sequences or basic processes
-
-Keep distractors plausible but clearly incorrect for someone who read the text carefully.
-{% elif difficulty == "medium" %}
-Create moderately challenging questions that require understanding relationships between concepts and some analysis. Focus on:
-- Connecting ideas across different parts of the text
-- Understanding implications, consequences, and significance
-- Comparing and contrasting concepts or approaches
-- Identifying patterns or trends described in the text
-- Applying knowledge to slightly different contexts
-- Understanding the "why" behind the "what"
-
-Distractors should be plausible and may include common misconceptions or partial truths.
-{% elif difficulty == "hard" %}
-Create challenging questions that require deep understanding, critical thinking, and synthesis. Focus on:
-- Complex analytical reasoning across multiple concepts
-- Synthesis of ideas from different sections of the text
-- Evaluation of arguments, evidence, or methodologies
-- Drawing sophisticated inferences from stated information
-- Understanding broader implications, limitations, or contexts
-- Identifying underlying assumptions or principles
-- Analyzing cause-and-effect chains with multiple steps
-
-Distractors should be sophisticated and potentially correct-sounding, requiring careful analysis to eliminate.
-{% endif %}
-
 QUESTION QUALITY REQUIREMENTS:
 1. **Content Coverage**: Distribute questions across the entire text, not just the beginning or end
 2. **Independence**: Each question must stand alone without providing clues to other answers
@@ -192,4 +150,52 @@ Required structure:
 
 TEXT TO ANALYZE:
 {{ documents|truncate(20000) }}
-"""
\ No newline at end of file
+
+TASK:
+{% if auto_question_mode %}
+Create a well-balanced set of multiple choice quizzes in JSON format with {{ difficulty }} difficulty level in the same language as the text. Choose an appropriate number of high-quality questions (typically 6-10) that cover the breadth of the material and avoid redundancy.
+{% else %}
+Create {{ num_questions }} multiple choice quizzes in JSON format with {{ difficulty }} difficulty level in the same language as the text.
+{% endif %}
+
+DIFFICULTY GUIDELINES:
+{% if difficulty == "easy" %}
+Create straightforward questions that test basic understanding and recall of the main concepts from the text. Focus on:
+- Direct facts and definitions explicitly stated in the text
+- Simple cause-and-effect relationships clearly described
+- Basic identification of key terms, people, or events
+- Main ideas and obvious details from the text
+- Chronological sequences or basic processes
+
+Keep distractors plausible but clearly incorrect for someone who read the text carefully.
+{% elif difficulty == "medium" %}
+Create moderately challenging questions that require understanding relationships between concepts and some analysis. Focus on:
+- Connecting ideas across different parts of the text
+- Understanding implications, consequences, and significance
+- Comparing and contrasting concepts or approaches
+- Identifying patterns or trends described in the text
+- Applying knowledge to slightly different contexts
+- Understanding the "why" behind the "what"
+
+Distractors should be plausible and may include common misconceptions or partial truths.
+{% elif difficulty == "hard" %}
+Create challenging questions that require deep understanding, critical thinking, and synthesis. Focus on:
+- Complex analytical reasoning across multiple concepts
+- Synthesis of ideas from different sections of the text
+- Evaluation of arguments, evidence, or methodologies
+- Drawing sophisticated inferences from stated information
+- Understanding broader implications, limitations, or contexts
+- Identifying underlying assumptions or principles
+- Analyzing cause-and-effect chains with multiple steps
+
+Distractors should be sophisticated and potentially correct-sounding, requiring careful analysis to eliminate.
+{% endif %}
+
+{% if feedback %}
+LEARNER WEAKNESSES TO TARGET:
+{{ feedback }}
+Prioritize generating questions that revisit these weak areas while still covering the breadth of the provided text.
+{% endif %}
+
+Respond with the JSON object only.
+"""
@@ -2,11 +2,6 @@ MIND_MAP_PROMPT = """You are an expert study coach that turns dense readings int
 Use the source text to identify the central idea, 3-6 major branches, and the most important supporting details.
 Always respond with pure JSON and keep every string concise but vivid. Never include markdown.
 
-{% if focus %}
-Learner focus: {{ focus }}
-Prioritize connections and subtopics related to this focus, but still cover the whole topic.
-{% endif %}
-
 The JSON MUST follow this shape:
 {
   "topic": "Compelling title for the mind map",
@@ -84,4 +79,9 @@ Constraints:
 
 Source text (truncated to 60k characters max):
 {{ documents|truncate(60000) }}
+
+{% if focus %}
+Learner focus: {{ focus }}
+Prioritize connections and subtopics related to this focus, but still cover the whole topic.
+{% endif %}
 """
@@ -5,18 +5,33 @@ This middleware implements token bucket rate limiting to protect API endpoints
 from abuse and ensure fair resource usage. It supports:
 - Per-user rate limiting (authenticated users)
 - Per-IP rate limiting (anonymous users)
-- Configurable limits per endpoint
-- Redis-backed storage for distributed systems
+- Configurable limits per endpoint, keyed on the route template
+- Shared bucket stores (SQLite for one host, Redis for several replicas)
+  so the limit holds across worker processes; see `rate_limit_stores`
 """
 
+import threading
 import time
-import json
-from typing import Optional, Callable
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
 from starlette.responses import Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 
+from backend.config.settings import get_rate_limit_settings
+from backend.middleware.rate_limit_stores import (
+    BucketStore,
+    InMemoryBucketStore,
+    RedisBucketStore,
+    SQLiteBucketStore,
+    TokenBucket,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,60 +55,11 @@ class RateLimitConfig:
     HEALTH_WINDOW = 60  # seconds
 
 
-class TokenBucket:
-    """Token bucket implementation for rate limiting"""
+class RateLimiter:
+    """Token bucket rate limiter over a pluggable bucket store"""
     
-    def __init__(self, capacity: int, refill_rate: float):
-        """
-        Args:
-            capacity: Maximum number of tokens
-            refill_rate: Tokens added per second
-        """
-        self.capacity = capacity
-        self.refill_rate = refill_rate
-        self.tokens = capacity
-        self.last_refill = time.time()
-    
-    def consume(self, tokens: int = 1) -> bool:
-        """
-        Try to consume tokens from the bucket.
-        
-        Returns:
-            True if tokens were consumed, False otherwise
-        """
-        now = time.time()
-        elapsed = now - self.last_refill
-        
-        # Refill tokens based on elapsed time
-        self.tokens = min(
-            self.capacity,
-            self.tokens + elapsed * self.refill_rate
-        )
-        self.last_refill = now
-        
-        # Check if we have enough tokens
-        if self.tokens >= tokens:
-            self.tokens -= tokens
-            return True
-        return False
-    
-    def remaining(self) -> int:
-        """Get remaining tokens"""
-        now = time.time()
-        elapsed = now - self.last_refill
-        self.tokens = min(
-            self.capacity,
-            self.tokens + elapsed * self.refill_rate
-        )
-        self.last_refill = now
-        return int(self.tokens)
-
-
-class InMemoryRateLimiter:
-    """In-memory rate limiter (for single-instance deployments)"""
-    
-    def __init__(self):
-        self.buckets: dict[str, TokenBucket] = {}
+    def __init__(self, store: BucketStore):
+        self.store = store
     
     def _get_key(self, identifier: str, endpoint: str) -> str:
         """Generate a unique key for rate limiting"""
@@ -128,78 +94,178 @@ class InMemoryRateLimiter:
         if limit is None or window is None:
             limit, window = self._get_limit_config(endpoint)
         
-        # Create or get bucket
-        if key not in self.buckets:
-            refill_rate = limit / window  # tokens per second
-            self.buckets[key] = TokenBucket(limit, refill_rate)
-        
-        bucket = self.buckets[key]
-        
-        # Update bucket capacity if limit changed
-        if bucket.capacity != limit:
-            refill_rate = limit / window
-            self.buckets[key] = TokenBucket(limit, refill_rate)
-        
-        # Try to consume token
-        allowed = bucket.consume(1)
-        remaining = bucket.remaining()
+        # A bucket refills completely within one window, so it can expire after that
+        allowed, remaining = self.store.take(key, limit, limit / window, window)
         reset_after = window  # Approximate reset time
         
         return (allowed, remaining, reset_after)
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """In-memory rate limiter (for single-instance deployments)"""
+    
+    def __init__(self, max_buckets: int = 10000, sweep_interval: int = 60):
+        super().__init__(InMemoryBucketStore(max_buckets, sweep_interval))
+    
+    @property
+    def buckets(self) -> dict[str, TokenBucket]:
+        return self.store.buckets
     
-    def cleanup_old_buckets(self, max_age: int = 3600):
-        """Clean up old buckets (optional maintenance)"""
-        # In production, you might want to implement this
-        pass
+    def cleanup_old_buckets(self, max_age: int = 3600) -> int:
+        """Drop buckets idle for more than `max_age` seconds. Returns how many were dropped."""
+        return self.store.purge_expired(max_age)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """FastAPI middleware for rate limiting"""
+def create_rate_limiter() -> RateLimiter:
+    """
+    Build the rate limiter for the configured `rate_limit.backend`.
     
-    def __init__(self, app, limiter: Optional[InMemoryRateLimiter] = None):
-        super().__init__(app)
-        self.limiter = limiter or InMemoryRateLimiter()
+    Falls back to the in-memory limiter when the shared store cannot be set
+    up, so a missing Redis does not keep the API from starting.
+    """
+    settings = get_rate_limit_settings()
+    backend = settings["backend"]
+    try:
+        if backend == "redis":
+            store = RedisBucketStore(settings["redis_url"], settings["key_prefix"])
+            logger.info("[RATE LIMIT] Using Redis bucket store")
+            return RateLimiter(store)
+        if backend == "sqlite":
+            store = SQLiteBucketStore(settings["sqlite_path"])
+            logger.info("[RATE LIMIT] Using SQLite bucket store at %s", settings["sqlite_path"])
+            return RateLimiter(store)
+    except Exception as exc:
+        logger.error(
+            "[RATE LIMIT] Could not set up the %s bucket store, falling back to in-memory: %s", backend, exc
+        )
+    return InMemoryRateLimiter(settings["max_buckets"], settings["sweep_interval_seconds"])
+
+
+_ROUTE_TEMPLATE_CACHE_SIZE = 4096
+_route_templates: "OrderedDict[tuple[str, str], str]" = OrderedDict()
+_route_templates_lock = threading.Lock()
+
+# Bucket key of requests that match no route (404s), so scanning random paths
+# cannot create buckets without bound
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(request: Request) -> str:
+    """
+    Path template of the route a request is for, e.g. `/quiz/{topic_id}`.
+    
+    Buckets are keyed on it rather than on the raw path so every id of a
+    parametrised route shares one bucket.
+    """
+    key = (request.method, request.url.path)
+    with _route_templates_lock:
+        template = _route_templates.get(key)
+        if template is not None:
+            _route_templates.move_to_end(key)
+            return template
+    
+    template = UNMATCHED_ROUTE
+    router = getattr(request.scope.get("app"), "router", None)
+    for route in getattr(router, "routes", []):
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            template = route.path
+            break
+        if match == Match.PARTIAL and template == UNMATCHED_ROUTE:
+            # Right path, wrong method: keep looking for a full match
+            template = route.path
+    
+    with _route_templates_lock:
+        _route_templates[key] = template
+        while len(_route_templates) > _ROUTE_TEMPLATE_CACHE_SIZE:
+            _route_templates.popitem(last=False)
+    return template
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware for rate limiting.
+    
+    Written against raw ASGI rather than `BaseHTTPMiddleware`: over-limit
+    requests are answered with 429 before reaching the app, and allowed
+    requests only get their rate limit headers added to the response start
+    message, so response bodies (including streamed `FileResponse`s) pass
+    through without being wrapped or buffered.
+    """
+    
+    def __init__(self, app: ASGIApp, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or create_rate_limiter()
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        decision = await self._check(Request(scope))
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+        
+        allowed, remaining, reset_after, limit = decision
+        rate_limit_headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(time.time()) + reset_after),
+        }
+        
+        if not allowed:
+            response = self._rate_limit_response(reset_after)
+            response.headers.update(rate_limit_headers)
+            await response(scope, receive, send)
+            return
+        
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in rate_limit_headers.items():
+                    headers[name] = value
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process request and apply rate limiting"""
+    async def _check(self, request: Request) -> Optional[tuple[bool, int, int, int]]:
+        """
+        Apply the rate limit to a request.
         
+        Returns:
+            (allowed, remaining, reset_after, limit), or None if the request is not limited
+        """
         # Skip rate limiting for certain paths
         if request.url.path.startswith("/docs") or request.url.path.startswith("/redoc"):
-            return await call_next(request)
+            return None
         
         # Get identifier (user ID if authenticated, IP otherwise)
         identifier = self._get_identifier(request)
-        endpoint = request.url.path
+        endpoint = route_template(request)
+        limit, window = self.limiter._get_limit_config(endpoint)
         
         # Check rate limit
-        allowed, remaining, reset_after = self.limiter.check_rate_limit(
-            identifier, endpoint
-        )
-        
-        # Add rate limit headers
-        response = await call_next(request) if allowed else self._rate_limit_response()
-        
-        response.headers["X-RateLimit-Limit"] = str(RateLimitConfig.DEFAULT_LIMIT)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + reset_after)
+        try:
+            if self.limiter.store.blocking:
+                allowed, remaining, reset_after = await run_in_threadpool(
+                    self.limiter.check_rate_limit, identifier, endpoint, limit, window
+                )
+            else:
+                allowed, remaining, reset_after = self.limiter.check_rate_limit(
+                    identifier, endpoint, limit, window
+                )
+        except Exception as exc:
+            # An unreachable shared store must not take the API down with it
+            logger.warning(f"Rate limit store unavailable, allowing request: {exc}")
+            return None
         
         if not allowed:
             logger.warning(
                 f"Rate limit exceeded for {identifier} on {endpoint}. "
                 f"Remaining: {remaining}, Reset in: {reset_after}s"
             )
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Rate limit exceeded. Please try again in {reset_after} seconds.",
-                headers={
-                    "Retry-After": str(reset_after),
-                    "X-RateLimit-Limit": str(RateLimitConfig.DEFAULT_LIMIT),
-                    "X-RateLimit-Remaining": str(remaining),
-                    "X-RateLimit-Reset": str(int(time.time()) + reset_after),
-                }
-            )
-        
-        return response
+        return (allowed, remaining, reset_after, limit)
     
     def _get_identifier(self, request: Request) -> str:
         """Get unique identifier for rate limiting"""
@@ -207,9 +273,10 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             try:
-                from backend.utils.auth import verify_token
+                from backend.utils.auth import verify_request_token
                 token = auth_header.split(" ")[1]
-                payload = verify_token(token)
+                # Cached on the request so the auth dependency does not decode it again
+                payload = verify_request_token(request, token)
                 if payload and "sub" in payload:
                     return f"user:{payload['sub']}"
             except Exception:
@@ -224,14 +291,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         
         return f"ip:{client_ip}"
     
-    def _rate_limit_response(self) -> Response:
+    def _rate_limit_response(self, reset_after: int) -> Response:
         """Create rate limit response"""
-        from fastapi.responses import JSONResponse
         return JSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             content={
-                "detail": "Rate limit exceeded. Please try again later.",
+                "detail": f"Rate limit exceeded. Please try again in {reset_after} seconds.",
                 "error_code": "RATE_LIMIT_EXCEEDED"
-            }
+            },
+            headers={"Retry-After": str(reset_after)},
         )
-
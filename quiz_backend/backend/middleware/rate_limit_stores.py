@@ -0,0 +1,279 @@
+"""
+Token bucket stores for the rate limiter.
+
+A store applies one token bucket step atomically: refill the bucket for the
+time elapsed since its last update, then take the requested tokens if
+enough are left. The stores differ in where the buckets live:
+
+- `InMemoryBucketStore`: a dict in the current process. It is correct for a
+  single worker and is the fake store to use in tests.
+- `SQLiteBucketStore`: a SQLite file shared by every worker on one host. Each
+  step runs in its own write transaction.
+- `RedisBucketStore`: a Redis server shared by every worker and replica. Each
+  step is one Lua script, so concurrent requests cannot interleave.
+
+`RateLimiter` in `backend.middleware.rate_limit` picks the limits and calls
+`take`.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket implementation for rate limiting"""
+
+    def __init__(self, capacity: int, refill_rate: float):
+        """
+        Args:
+            capacity: Maximum number of tokens
+            refill_rate: Tokens added per second
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.last_refill = time.time()
+
+    def consume(self, tokens: int = 1) -> bool:
+        """
+        Try to consume tokens from the bucket.
+
+        Returns:
+            True if tokens were consumed, False otherwise
+        """
+        now = time.time()
+        elapsed = now - self.last_refill
+
+        # Refill tokens based on elapsed time
+        self.tokens = min(
+            self.capacity,
+            self.tokens + elapsed * self.refill_rate
+        )
+        self.last_refill = now
+
+        # Check if we have enough tokens
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def remaining(self) -> int:
+        """Get remaining tokens"""
+        now = time.time()
+        elapsed = now - self.last_refill
+        self.tokens = min(
+            self.capacity,
+            self.tokens + elapsed * self.refill_rate
+        )
+        self.last_refill = now
+        return int(self.tokens)
+
+
+class BucketStore(ABC):
+    """Interface of the token bucket stores"""
+
+    # Whether `take` does I/O and should run off the event loop
+    blocking = False
+
+    @abstractmethod
+    def take(self, key: str, capacity: int, refill_rate: float, ttl: int, tokens: int = 1) -> Tuple[bool, int]:
+        """
+        Refill the bucket at `key` and try to take `tokens` from it.
+
+        A missing bucket starts full. Buckets untouched for `ttl` seconds may
+        be dropped, since they would be full again by then.
+
+        Returns:
+            (allowed, remaining)
+        """
+
+
+class InMemoryBucketStore(BucketStore):
+    """
+    Buckets in a per-process dict (single worker deployments and tests).
+
+    The dict is bounded: it holds at most `max_buckets` buckets, evicting the
+    least recently used, and a daemon thread started on first use drops buckets
+    idle for longer than their ttl every `sweep_interval` seconds. An evicted
+    bucket simply starts full again.
+    """
+
+    def __init__(self, max_buckets: int = 10000, sweep_interval: int = 60):
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.max_buckets = max_buckets
+        self.sweep_interval = sweep_interval
+        self._ttls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def take(self, key: str, capacity: int, refill_rate: float, ttl: int, tokens: int = 1) -> Tuple[bool, int]:
+        self._ensure_sweeper()
+        with self._lock:
+            bucket = self.buckets.get(key)
+            # Recreate the bucket if its limit changed
+            if bucket is None or bucket.capacity != capacity:
+                bucket = self.buckets[key] = TokenBucket(capacity, refill_rate)
+            self.buckets.move_to_end(key)
+            self._ttls[key] = ttl
+            while len(self.buckets) > self.max_buckets:
+                evicted, _ = self.buckets.popitem(last=False)
+                self._ttls.pop(evicted, None)
+            allowed = bucket.consume(tokens)
+            return allowed, bucket.remaining()
+
+    def purge_expired(self, max_age: Optional[int] = None) -> int:
+        """
+        Drop buckets idle for longer than their ttl, or than `max_age` seconds if given.
+
+        Returns how many were dropped.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                key
+                for key, bucket in self.buckets.items()
+                if now - bucket.last_refill > (max_age if max_age is not None else self._ttls.get(key, 0))
+            ]
+            for key in expired:
+                del self.buckets[key]
+                self._ttls.pop(key, None)
+        return len(expired)
+
+    def _ensure_sweeper(self) -> None:
+        # Started lazily so it runs in the worker process, not a pre-fork parent
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, name="rate-limit-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                purged = self.purge_expired()
+                if purged:
+                    logger.debug("[RATE LIMIT] Purged %d idle buckets", purged)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning("[RATE LIMIT] Bucket sweep failed: %s", exc)
+
+
+class SQLiteBucketStore(BucketStore):
+    """Buckets in a SQLite file shared by the worker processes of one host"""
+
+    blocking = True
+
+    # Expired buckets are purged once every this many calls per process
+    _PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_updated_at ON rate_limit_buckets (updated_at)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode; transactions are opened explicitly in take()
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, capacity: int, refill_rate: float, ttl: int, tokens: int = 1) -> Tuple[bool, int]:
+        connection = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so the read and the
+        # update below cannot interleave with another worker's
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            available = float(capacity)
+            if row is not None:
+                available = min(capacity, row[0] + max(0.0, now - row[1]) * refill_rate)
+            allowed = available >= tokens
+            if allowed:
+                available -= tokens
+            connection.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, available, now),
+            )
+            self._calls += 1
+            if self._calls % self._PURGE_EVERY == 0:
+                connection.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - ttl,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return allowed, int(available)
+
+
+# KEYS[1] = bucket key; ARGV = capacity, refill rate (tokens/s), ttl (s), tokens requested.
+# Uses the server clock so replicas with skewed clocks share one timeline.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - tonumber(bucket[2])) * refill_rate)
+end
+local allowed = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, math.floor(tokens)}
+"""
+
+
+class RedisBucketStore(BucketStore):
+    """Buckets in Redis, shared by every worker and replica"""
+
+    blocking = True
+
+    def __init__(self, url: str, key_prefix: str = "ratelimit:"):
+        # Optional dependency, only needed when the redis backend is configured
+        import redis
+
+        self.key_prefix = key_prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self._script = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key: str, capacity: int, refill_rate: float, ttl: int, tokens: int = 1) -> Tuple[bool, int]:
+        allowed, remaining = self._script(
+            keys=[f"{self.key_prefix}{key}"],
+            args=[capacity, refill_rate, max(1, int(ttl)), tokens],
+        )
+        return bool(allowed), int(remaining)
@@ -0,0 +1,52 @@
+"""
+Reconcile the per-period generation counters with the content tables.
+
+Quota checks for subscribed users read `generation_usage` instead of
+counting quizzes, flashcards, essays and mind maps. This job recounts the
+current period of every active subscription and reports counters that
+disagree, raising any that fell behind. Run it periodically (e.g. daily):
+
+    python -m backend.reconcile_usage [--dry-run]
+"""
+
+import argparse
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from backend.database.db import SessionLocal  # noqa: E402
+from backend.utils.credits import reconcile_generation_usage  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile generation usage counters")
+    parser.add_argument("--dry-run", action="store_true", help="Report mismatches without fixing counters")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    db = SessionLocal()
+    try:
+        mismatches = reconcile_generation_usage(db, fix=not args.dry_run)
+        if args.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    fixed = sum(1 for mismatch in mismatches if mismatch["fixed"])
+    logging.info("[RECONCILE] %d counters disagree with the content tables, %d raised", len(mismatches), fixed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Server-side history for project chat sessions.
+
+Every turn is stored in `chat_messages`. A turn's prompt carries the
+session summary plus the turns that have not been summarized yet. Once those
+turns pass `project_chat.history_token_budget`, the oldest are folded into
+the summary, so prompt size stays bounded however long the conversation
+runs. Chat replies and summary calls are both recorded in `TokenUsage`
+against the session (`generation_type` "chat" / "chat_summary",
+`topic_id` = session id).
+"""
+
+import datetime
+import logging
+import os
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from backend.config.settings import get_project_chat_settings
+from backend.database.sqlite_dal import ChatMessage, ChatSession, TokenUsage
+from backend.utils.openai_client import get_async_openai_client
+from backend.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_SUMMARY_PROMPT = """You maintain the running summary of a tutoring conversation between a student and an assistant about the student's course PDFs.
+Merge the previous summary and the new turns into one updated summary. Keep the facts and definitions that were explained, the student's goals, open questions and misconceptions, and anything the assistant promised to follow up on. Drop small talk. Write in the language of the conversation, as compact prose or bullet points."""
+
+
+def chat_model() -> str:
+    return os.environ.get("OPENAI_MODEL", "gpt-4.1-2025-04-14")
+
+
+def pending_messages(db: Session, session: ChatSession) -> List[ChatMessage]:
+    """Messages not yet folded into the session summary, oldest first."""
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session.id)
+    if session.summarized_through_id:
+        query = query.filter(ChatMessage.id > session.summarized_through_id)
+    return query.order_by(ChatMessage.id).all()
+
+
+def usage_from_response(response: Any) -> Dict[str, int]:
+    """Token usage of a chat completion response, including prompt-cache hits."""
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens or 0,
+        "output_tokens": usage.completion_tokens or 0,
+        "total_tokens": usage.total_tokens or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+    }
+
+
+async def compact_if_needed(
+    db: Session,
+    session: ChatSession,
+    messages: List[ChatMessage],
+    incoming_tokens: int,
+) -> List[ChatMessage]:
+    """
+    Fold the oldest pending turns into the summary when the history would exceed its budget.
+
+    Keeps the newest turns within half the budget so compaction does not run
+    again on the next message. Returns the messages still pending. The caller
+    commits.
+    """
+    settings = get_project_chat_settings()
+    budget = settings["history_token_budget"]
+    pending_tokens = sum(message.token_count for message in messages)
+    if pending_tokens + incoming_tokens <= budget or len(messages) < 2:
+        return messages
+
+    kept_tokens = 0
+    split = len(messages)
+    while split > 1 and kept_tokens + messages[split - 1].token_count <= budget // 2:
+        split -= 1
+        kept_tokens += messages[split].token_count
+    split = min(split, len(messages) - 1)  # The latest message always stays verbatim
+    to_summarize, remaining = messages[:split], messages[split:]
+
+    transcript = "\n\n".join(f"{message.role.upper()}: {message.content}" for message in to_summarize)
+    try:
+        response = await get_async_openai_client().chat.completions.create(
+            model=chat_model(),
+            messages=[
+                {"role": "system", "content": _SUMMARY_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Previous summary:\n{session.summary or '(none)'}\n\nNew turns:\n{transcript}",
+                },
+            ],
+            temperature=0.3,
+            max_tokens=settings["summary_max_tokens"],
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        # Sending a longer prompt once is better than failing the turn
+        logger.warning("[CHAT SESSION] Compaction failed for session %s: %s", session.id, exc)
+        return messages
+
+    summary = response.choices[0].message.content if response.choices else None
+    if not summary:
+        return messages
+
+    session.summary = summary.strip()
+    session.summarized_through_id = to_summarize[-1].id
+    _record_usage(db, session, "chat_summary", usage_from_response(response))
+    logger.info(
+        "[CHAT SESSION] Folded %d messages (%d tokens) of session %s into its summary",
+        len(to_summarize),
+        sum(message.token_count for message in to_summarize),
+        session.id,
+    )
+    return remaining
+
+
+def history_prompt(session: ChatSession, messages: List[ChatMessage]) -> List[Dict[str, str]]:
+    """The session summary and pending turns as chat completion messages."""
+    prompt: List[Dict[str, str]] = []
+    if session.summary:
+        prompt.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session.summary}"})
+    prompt.extend({"role": message.role, "content": message.content} for message in messages)
+    return prompt
+
+
+def record_turn(
+    db: Session,
+    session: ChatSession,
+    user_message: str,
+    reply: str,
+    token_usage: Dict[str, int],
+) -> ChatMessage:
+    """Store a question/answer pair and its token usage. Returns the assistant message. The caller commits."""
+    db.add(
+        ChatMessage(
+            session_id=session.id,
+            role="user",
+            content=user_message,
+            token_count=count_tokens(user_message),
+        )
+    )
+    assistant_message = ChatMessage(
+        session_id=session.id,
+        role="assistant",
+        content=reply,
+        token_count=token_usage.get("output_tokens") or count_tokens(reply),
+    )
+    db.add(assistant_message)
+    _record_usage(db, session, "chat", token_usage)
+    session.updated_at = datetime.datetime.now()
+    if not session.title:
+        session.title = user_message[:80]
+    db.flush()
+    return assistant_message
+
+
+def delete_sessions(db: Session, session_ids: List[int]) -> None:
+    """Delete chat sessions and their messages. The caller commits."""
+    if not session_ids:
+        return
+    db.query(ChatMessage).filter(ChatMessage.session_id.in_(session_ids)).delete(synchronize_session=False)
+    db.query(ChatSession).filter(ChatSession.id.in_(session_ids)).delete(synchronize_session=False)
+
+
+def _record_usage(db: Session, session: ChatSession, generation_type: str, token_usage: Dict[str, int]) -> None:
+    db.add(
+        TokenUsage(
+            user_id=session.user_id,
+            generation_type=generation_type,
+            topic_id=session.id,
+            input_tokens=token_usage.get("input_tokens", 0),
+            output_tokens=token_usage.get("output_tokens", 0),
+            total_tokens=token_usage.get("total_tokens", 0),
+            cached_tokens=token_usage.get("cached_tokens", 0),
+        )
+    )
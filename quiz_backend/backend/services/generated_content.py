@@ -0,0 +1,106 @@
+"""
+Persistence for generated quizzes, flashcard decks and essay question sets.
+
+A generated topic is written with one INSERT and its questions/cards with a
+single executemany, instead of one ORM object (and one statement at flush)
+per child. All routers and generation jobs store generated content through
+these helpers. The caller commits.
+"""
+
+import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.database.sqlite_dal import (
+    EssayQAQuestion,
+    EssayQATopic,
+    FlashcardCard,
+    FlashcardTopic,
+    QuizQuestion,
+    QuizTopic,
+)
+
+
+def save_quiz(db: Session, quiz_data: Dict[str, Any], user_id: Optional[str], difficulty: str) -> int:
+    """Insert a generated quiz and its questions. Returns the new topic id."""
+    return _insert_topic(
+        db,
+        QuizTopic,
+        QuizQuestion,
+        _topic_values(quiz_data, user_id, difficulty),
+        [
+            {
+                "question": q["question"],
+                "options": q["options"],
+                "right_option": q["right_option"],
+            }
+            for q in quiz_data["questions"]
+        ],
+    )
+
+
+def save_flashcards(
+    db: Session,
+    flashcard_data: Dict[str, Any],
+    user_id: Optional[str],
+    difficulty: str = "medium",  # Default difficulty for flashcards
+) -> int:
+    """Insert a generated flashcard deck and its cards. Returns the new topic id."""
+    return _insert_topic(
+        db,
+        FlashcardTopic,
+        FlashcardCard,
+        _topic_values(flashcard_data, user_id, difficulty),
+        [
+            {
+                "front": card["front"],
+                "back": card["back"],
+                "importance": card.get("importance", "medium"),
+            }
+            for card in flashcard_data["cards"]
+        ],
+    )
+
+
+def save_essay_qa(db: Session, essay_data: Dict[str, Any], user_id: Optional[str], difficulty: str) -> int:
+    """Insert a generated essay question set and its questions. Returns the new topic id."""
+    return _insert_topic(
+        db,
+        EssayQATopic,
+        EssayQAQuestion,
+        _topic_values(essay_data, user_id, difficulty),
+        [
+            {
+                "question": q["question"],
+                "full_answer": q["full_answer"],
+                "key_info": q["key_info"],
+            }
+            for q in essay_data["questions"]
+        ],
+    )
+
+
+def _topic_values(data: Dict[str, Any], user_id: Optional[str], difficulty: str) -> Dict[str, Any]:
+    return {
+        "topic": data["topic"],
+        "category": data["category"],
+        "subcategory": data["subcategory"],
+        "difficulty": difficulty,
+        "creation_timestamp": datetime.datetime.now(),
+        "created_by_user_id": user_id,
+    }
+
+
+def _insert_topic(
+    db: Session,
+    topic_model: Any,
+    child_model: Any,
+    topic_values: Dict[str, Any],
+    child_rows: List[Dict[str, Any]],
+) -> int:
+    topic_id = db.execute(insert(topic_model.__table__).values(**topic_values)).inserted_primary_key[0]
+    if child_rows:
+        db.execute(insert(child_model.__table__), [{**row, "topic_id": topic_id} for row in child_rows])
+    return topic_id
@@ -0,0 +1,202 @@
+"""
+Shared cache of generated content, stored in `generation_cache_entries`.
+
+Students in the same class upload the same material and ask for the same
+settings, so generation results are reused across users. Entries are keyed by
+the source document hash, the content type, the generation parameters, the
+prompt template version and the model, so changing any of them (including
+editing a prompt) never serves a stale result. Entries expire after a TTL and
+the least recently used ones are evicted beyond `max_entries`. Both are
+enforced by a sweep that runs once every `_SWEEP_EVERY` stores, so the table
+can briefly exceed `max_entries`.
+
+Under the `variant` policy a key holds a pool of results; requests keep
+generating (and adding to the pool) until it is full, after which a random
+pool member is served.
+
+Like the PDF text cache this is an optimisation only: storage errors are
+logged and generation proceeds uncached.
+"""
+
+import datetime
+import hashlib
+import itertools
+import json
+import logging
+import random
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from backend.config.settings import get_generation_cache_settings
+from backend.database.db import SessionLocal
+from backend.database.sqlite_dal import GenerationCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_NO_TOKENS = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+
+# Expired and least recently used entries are swept on the first store of a
+# process and then once every this many stores
+_SWEEP_EVERY = 100
+_store_counter = itertools.count()
+
+
+def hash_source_text(text: str) -> str:
+    """Hex SHA-256 of a source text, used as the source hash for text inputs."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def prompt_version(template: str) -> str:
+    """Short fingerprint of a prompt template, so prompt edits invalidate old entries."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(
+    content_type: str,
+    source_hash: str,
+    params: Dict[str, Any],
+    template_version: str,
+    model: str,
+) -> str:
+    payload = {
+        "content_type": content_type,
+        "source_hash": source_hash,
+        "params": params,
+        "template_version": template_version,
+        "model": model,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _lookup(cache_key: str, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    session = SessionLocal()
+    try:
+        now = datetime.datetime.now()
+        entries = (
+            session.query(GenerationCacheEntry)
+            .filter(
+                GenerationCacheEntry.cache_key == cache_key,
+                or_(GenerationCacheEntry.expires_at.is_(None), GenerationCacheEntry.expires_at > now),
+            )
+            .order_by(GenerationCacheEntry.created_at.desc())
+            .all()
+        )
+        if not entries:
+            return None
+        if settings["policy"] == "variant":
+            if len(entries) < settings["variant_pool_size"]:
+                return None  # Keep generating until the pool is full
+            entry = random.choice(entries)
+        else:
+            entry = entries[0]
+
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_used_at = now
+        result = entry.result
+        session.commit()
+        return result
+    except Exception as exc:  # pylint: disable=broad-except
+        session.rollback()
+        logger.warning("[GEN CACHE] Lookup failed for %s: %s", cache_key[:12], exc)
+        return None
+    finally:
+        session.close()
+
+
+def _store(
+    cache_key: str,
+    content_type: str,
+    source_hash: str,
+    result: Dict[str, Any],
+    settings: Dict[str, Any],
+) -> None:
+    session = SessionLocal()
+    try:
+        now = datetime.datetime.now()
+        ttl_seconds = settings["ttl_seconds"]
+        session.add(
+            GenerationCacheEntry(
+                cache_key=cache_key,
+                content_type=content_type,
+                source_hash=source_hash,
+                result=result,
+                hit_count=0,
+                created_at=now,
+                last_used_at=now,
+                expires_at=now + datetime.timedelta(seconds=ttl_seconds) if ttl_seconds else None,
+            )
+        )
+        if next(_store_counter) % _SWEEP_EVERY == 0:
+            session.flush()
+            _sweep(session, now, settings["max_entries"])
+        session.commit()
+    except Exception as exc:  # pylint: disable=broad-except
+        session.rollback()
+        logger.warning("[GEN CACHE] Failed to store entry %s: %s", cache_key[:12], exc)
+    finally:
+        session.close()
+
+
+def _sweep(session: Session, now: datetime.datetime, max_entries: int) -> None:
+    session.query(GenerationCacheEntry).filter(
+        GenerationCacheEntry.expires_at.isnot(None),
+        GenerationCacheEntry.expires_at <= now,
+    ).delete(synchronize_session=False)
+
+    overflow = session.query(GenerationCacheEntry.id).count() - max_entries
+    if overflow > 0:
+        lru_ids = [
+            row.id
+            for row in session.query(GenerationCacheEntry.id)
+            .order_by(GenerationCacheEntry.last_used_at, GenerationCacheEntry.id)
+            .limit(overflow)
+        ]
+        session.query(GenerationCacheEntry).filter(GenerationCacheEntry.id.in_(lru_ids)).delete(
+            synchronize_session=False
+        )
+        logger.info("[GEN CACHE] Evicted %d least recently used entries", len(lru_ids))
+
+
+def purge_sources(db: Session, source_hashes: Iterable[Optional[str]]) -> int:
+    """Delete the entries generated from these source hashes. The caller commits."""
+    source_hashes = {source_hash for source_hash in source_hashes if source_hash}
+    if not source_hashes:
+        return 0
+    return (
+        db.query(GenerationCacheEntry)
+        .filter(GenerationCacheEntry.source_hash.in_(source_hashes))
+        .delete(synchronize_session=False)
+    )
+
+
+def cached_generation(
+    content_type: str,
+    source_hash: str,
+    params: Dict[str, Any],
+    template: str,
+    model: str,
+    generate: Callable[[], Tuple[Dict[str, Any], Dict[str, int]]],
+    personalized: bool = False,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Return a cached (result, token_usage) pair for these inputs, or call `generate` and cache it.
+
+    Cache hits report zero token usage since no model call was made.
+    Personalized requests (learner feedback in the prompt) always generate and
+    are never stored.
+    """
+    settings = get_generation_cache_settings()
+    if personalized or not settings["enabled"]:
+        return generate()
+
+    cache_key = make_cache_key(content_type, source_hash, params, prompt_version(template), model)
+    cached = _lookup(cache_key, settings)
+    if cached is not None:
+        logger.info("[GEN CACHE] Hit for %s %s", content_type, cache_key[:12])
+        return cached, dict(_NO_TOKENS)
+
+    result, token_usage = generate()
+    _store(cache_key, content_type, source_hash, result, settings)
+    return result, token_usage
@@ -0,0 +1,433 @@
+"""
+Durable generation job queue backed by the `generation_jobs` table.
+
+Jobs are created as `pending` rows. Workers claim the oldest claimable job
+atomically, hold it under a lease that a heartbeat thread keeps renewing, and
+either complete it or put it back as `pending` with an exponential backoff.
+A job whose lease runs out (worker crashed or was killed) becomes claimable
+again, so nothing is lost on restart.
+
+Every write that ends an attempt is conditional on the worker still holding
+the lease. A worker whose lease lapsed and was reclaimed by another worker
+rolls back its result, including the generation token it charged, instead of
+saving a duplicate.
+"""
+
+import datetime
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import Session
+
+from backend.database.db import SessionLocal
+from backend.database.sqlite_dal import GenerationJob
+from backend.services.job_scheduler import estimate_queue_position, select_claim_candidates, under_claim_caps
+
+logger = logging.getLogger(__name__)
+
+JOB_LEASE_SECONDS = int(os.getenv("GENERATION_JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("GENERATION_JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("GENERATION_JOB_RETRY_BASE_SECONDS", "15"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("GENERATION_JOB_RETRY_MAX_SECONDS", "600"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("GENERATION_JOB_POLL_INTERVAL_SECONDS", "2"))
+
+# Arbitrary constant identifying the claim advisory lock on PostgreSQL
+_CLAIM_LOCK_KEY = 0x67656E6A
+
+# Wakes idle in-process workers as soon as a job is enqueued instead of waiting for the next poll
+_new_job_event = threading.Event()
+
+
+class LeaseLostError(Exception):
+    """The worker no longer holds the job's lease; another worker may be running it."""
+
+
+class JobLease:
+    """A claimed job as seen by the worker running it."""
+
+    def __init__(self, job_id: int, worker_id: str) -> None:
+        self.job_id = job_id
+        self.worker_id = worker_id
+        # Set by the heartbeat once the lease can no longer be renewed
+        self.lost = threading.Event()
+
+    def check(self) -> None:
+        """Raise LeaseLostError if the heartbeat lost the lease."""
+        if self.lost.is_set():
+            raise LeaseLostError(f"Lease on job {self.job_id} was lost")
+
+    def held_filter(self):
+        return and_(
+            GenerationJob.id == self.job_id,
+            GenerationJob.locked_by == self.worker_id,
+            GenerationJob.status == "in_progress",
+        )
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enqueue_job(db: Session, job: GenerationJob) -> GenerationJob:
+    """Persist a new pending job and wake any in-process workers."""
+    job.status = "pending"
+    job.attempts = 0
+    job.max_attempts = JOB_MAX_ATTEMPTS
+    job.available_at = datetime.datetime.now()
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _new_job_event.set()
+    return job
+
+
+def _claimable_filter(now: datetime.datetime):
+    return or_(
+        and_(
+            GenerationJob.status == "pending",
+            or_(GenerationJob.available_at.is_(None), GenerationJob.available_at <= now),
+        ),
+        # Lease ran out without a heartbeat: the worker holding it is gone
+        and_(
+            GenerationJob.status == "in_progress",
+            GenerationJob.lease_expires_at.isnot(None),
+            GenerationJob.lease_expires_at < now,
+        ),
+    )
+
+
+def claim_next_job(db: Session, worker_id: str, job_types: Optional[Iterable[str]] = None) -> Optional[int]:
+    """
+    Atomically claim the next job chosen by the fair-share scheduler.
+
+    On PostgreSQL claims are serialised with a transaction-scoped advisory lock,
+    so the global and per-user concurrency caps are checked and applied
+    atomically, and the chosen row is locked with FOR UPDATE SKIP LOCKED. SQLite
+    has no row locks, so the claim is a compare-and-set UPDATE that only
+    succeeds if the row is still claimable and both caps still have room,
+    counted by the UPDATE itself. SQLite serialises writers, so exactly one
+    worker wins a row and concurrent claims cannot overshoot a cap.
+
+    Returns:
+        The claimed job id, or None if no job may start right now.
+    """
+    now = datetime.datetime.now()
+    claimable = _claimable_filter(now)
+    claim_values = {
+        GenerationJob.status: "in_progress",
+        GenerationJob.locked_by: worker_id,
+        GenerationJob.lease_expires_at: now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+        GenerationJob.heartbeat_at: now,
+        GenerationJob.started_at: now,
+        GenerationJob.attempts: GenerationJob.attempts + 1,
+        GenerationJob.updated_at: now,
+    }
+
+    try:
+        is_postgres = db.bind.dialect.name == "postgresql"
+        if is_postgres:
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CLAIM_LOCK_KEY})
+
+        for candidate in select_claim_candidates(db, claimable, now, job_types):
+            job_id = candidate.job_id
+            if is_postgres:
+                locked = (
+                    db.query(GenerationJob.id)
+                    .filter(GenerationJob.id == job_id, claimable)
+                    .with_for_update(skip_locked=True)
+                    .first()
+                )
+                if not locked:
+                    continue
+                db.query(GenerationJob).filter(GenerationJob.id == job_id).update(
+                    claim_values, synchronize_session=False
+                )
+                db.commit()
+                return job_id
+
+            claimed = db.query(GenerationJob).filter(
+                GenerationJob.id == job_id,
+                claimable,
+                under_claim_caps(now, candidate.user_id, candidate.user_cap, candidate.global_cap),
+            ).update(claim_values, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return job_id
+
+        db.rollback()
+        return None
+    except Exception:
+        db.rollback()
+        raise
+
+
+def get_queue_position(db: Session, job: GenerationJob) -> Optional[Dict[str, object]]:
+    """Queue position and estimated start time for a pending job (None otherwise)."""
+    return estimate_queue_position(db, job, _claimable_filter(datetime.datetime.now()))
+
+
+def renew_lease(job_id: int, worker_id: str) -> bool:
+    """
+    Extend the lease on a job this worker still holds. Returns False if the lease was lost.
+
+    Database errors are raised; the lease may still be valid until it expires.
+    """
+    session = SessionLocal()
+    try:
+        now = datetime.datetime.now()
+        renewed = session.query(GenerationJob).filter(
+            GenerationJob.id == job_id,
+            GenerationJob.locked_by == worker_id,
+            GenerationJob.status == "in_progress",
+        ).update(
+            {
+                GenerationJob.lease_expires_at: now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+                GenerationJob.heartbeat_at: now,
+            },
+            synchronize_session=False,
+        )
+        session.commit()
+        return bool(renewed)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff, jittered within the upper half of the window."""
+    ceiling = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """Content problems (no extractable text, bad input) and HTTP errors such as an exhausted quota are final."""
+    return not isinstance(exc, (ValueError, HTTPException))
+
+
+def finish_job(session: Session, lease: JobLease, status: str, **values: Any) -> None:
+    """
+    Move a job this worker holds to its final `status` and commit everything
+    written in `session` with it (generated content, token charge).
+
+    Raises:
+        LeaseLostError: The job was reclaimed by another worker. The session is
+            rolled back, so none of this attempt's writes are kept.
+    """
+    now = datetime.datetime.now()
+    updated = session.query(GenerationJob).filter(lease.held_filter()).update(
+        {
+            **{getattr(GenerationJob, column): value for column, value in values.items()},
+            GenerationJob.status: status,
+            GenerationJob.locked_by: None,
+            GenerationJob.lease_expires_at: None,
+            GenerationJob.completed_at: now,
+            GenerationJob.updated_at: now,
+        },
+        synchronize_session=False,
+    )
+    if not updated:
+        session.rollback()
+        raise LeaseLostError(f"Lease on job {lease.job_id} was lost before it finished")
+    session.commit()
+
+
+def mark_job_failed_or_retry(session: Session, lease: JobLease, exc: Exception) -> None:
+    """
+    Record a failed attempt. The job goes back to `pending` with a backoff delay
+    while it has attempts left and the error is transient, and is marked
+    `failed` otherwise. Nothing is recorded if another worker has reclaimed the
+    job since. The caller rolls back its own writes first.
+    """
+    job = session.query(GenerationJob).filter(GenerationJob.id == lease.job_id).first()
+    if not job:
+        return
+    now = datetime.datetime.now()
+    values = {
+        GenerationJob.error_message: str(exc),
+        GenerationJob.locked_by: None,
+        GenerationJob.lease_expires_at: None,
+        GenerationJob.updated_at: now,
+    }
+
+    attempts = job.attempts or 0
+    max_attempts = job.max_attempts or JOB_MAX_ATTEMPTS
+    retry = is_retryable_error(exc) and attempts and attempts < max_attempts
+    if retry:
+        delay = retry_delay_seconds(attempts)
+        values[GenerationJob.status] = "pending"
+        values[GenerationJob.available_at] = now + datetime.timedelta(seconds=delay)
+    else:
+        values[GenerationJob.status] = "failed"
+        values[GenerationJob.completed_at] = now
+
+    updated = session.query(GenerationJob).filter(lease.held_filter()).update(values, synchronize_session=False)
+    session.commit()
+    if not updated:
+        logger.warning("[JOB QUEUE] Job %s was reclaimed by another worker; not recording this failure", lease.job_id)
+    elif retry:
+        logger.warning(
+            "[JOB QUEUE] Job %s attempt %d/%d failed, retrying in %.0fs: %s",
+            lease.job_id,
+            attempts,
+            max_attempts,
+            delay,
+            exc,
+        )
+
+
+def _fail_exhausted_job(lease: JobLease) -> bool:
+    """Fail a reclaimed job that already used all its attempts (its workers kept dying)."""
+    session = SessionLocal()
+    try:
+        job = session.query(GenerationJob).filter(GenerationJob.id == lease.job_id).first()
+        if not job or (job.attempts or 0) <= (job.max_attempts or JOB_MAX_ATTEMPTS):
+            return False
+        finish_job(
+            session,
+            lease,
+            "failed",
+            error_message=job.error_message or "Job exceeded its maximum number of attempts",
+        )
+        return True
+    except LeaseLostError:
+        return True
+    finally:
+        session.close()
+
+
+class _LeaseHeartbeat:
+    """
+    Renews a job's lease in the background and sets `lease.lost` once it is gone.
+
+    A renewal that fails with a database error (e.g. SQLite "database is
+    locked") is retried on the next beat; the lease counts as lost once the
+    last successful renewal has expired.
+    """
+
+    def __init__(self, lease: JobLease, lease_expires_at: Optional[datetime.datetime]) -> None:
+        self._lease = lease
+        self._lease_expires_at = lease_expires_at or datetime.datetime.now()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"job-heartbeat-{lease.job_id}",
+            daemon=True,
+        )
+
+    def __enter__(self) -> "_LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        interval = max(JOB_LEASE_SECONDS / 3, 1)
+        while not self._stop.wait(interval):
+            attempted_at = datetime.datetime.now()
+            try:
+                renewed = renew_lease(self._lease.job_id, self._lease.worker_id)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning("[JOB QUEUE] Failed to renew lease for job %s: %s", self._lease.job_id, exc)
+                renewed = None
+            if renewed:
+                self._lease_expires_at = attempted_at + datetime.timedelta(seconds=JOB_LEASE_SECONDS)
+                continue
+            if renewed is None and datetime.datetime.now() < self._lease_expires_at:
+                continue
+            logger.warning("[JOB QUEUE] Lost lease on job %s; abandoning it", self._lease.job_id)
+            self._lease.lost.set()
+            return
+
+
+class JobWorker:
+    """
+    Polls the queue and runs claimed jobs through the registered processors.
+
+    Processors take the job's `JobLease`, open their own session and are
+    responsible for moving the job to `completed` or `failed` through
+    `finish_job`, or back to `pending` through `mark_job_failed_or_retry`.
+    They should call `lease.check()` before saving results, and stop without
+    recording anything on `LeaseLostError`.
+    """
+
+    def __init__(
+        self,
+        processors: Dict[str, Callable[[JobLease], None]],
+        worker_id: Optional[str] = None,
+        poll_interval: float = JOB_POLL_INTERVAL_SECONDS,
+    ) -> None:
+        self.processors = processors
+        self.worker_id = worker_id or make_worker_id()
+        self.poll_interval = poll_interval
+        self.thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+        _new_job_event.set()
+
+    def run_once(self) -> bool:
+        """Claim and run a single job. Returns True if a job was processed."""
+        session = SessionLocal()
+        try:
+            job_id = claim_next_job(session, self.worker_id, job_types=self.processors.keys())
+            job_type = lease_expires_at = None
+            if job_id is not None:
+                job_type, lease_expires_at = (
+                    session.query(GenerationJob.job_type, GenerationJob.lease_expires_at)
+                    .filter(GenerationJob.id == job_id)
+                    .one()
+                )
+        finally:
+            session.close()
+
+        if job_id is None:
+            return False
+
+        lease = JobLease(job_id, self.worker_id)
+        if _fail_exhausted_job(lease):
+            logger.error("[JOB QUEUE] Job %s exceeded its maximum attempts", job_id)
+            return True
+
+        logger.info("[JOB QUEUE] Worker %s claimed %s job %s", self.worker_id, job_type, job_id)
+        with _LeaseHeartbeat(lease, lease_expires_at):
+            self.processors[job_type](lease)
+        return True
+
+    def run_forever(self) -> None:
+        logger.info(
+            "[JOB QUEUE] Worker %s started for job types: %s",
+            self.worker_id,
+            ", ".join(sorted(self.processors)),
+        )
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception("[JOB QUEUE] Worker %s loop error: %s", self.worker_id, exc)
+            _new_job_event.wait(self.poll_interval)
+            _new_job_event.clear()
+        logger.info("[JOB QUEUE] Worker %s stopped", self.worker_id)
+
+
+def start_worker_threads(processors: Dict[str, Callable[[JobLease], None]], count: int) -> List[JobWorker]:
+    """Run `count` queue workers as daemon threads inside the current process."""
+    workers = []
+    for index in range(count):
+        worker = JobWorker(processors)
+        worker.thread = threading.Thread(target=worker.run_forever, name=f"job-worker-{index}", daemon=True)
+        worker.thread.start()
+        workers.append(worker)
+    return workers
@@ -0,0 +1,208 @@
+"""
+Fair-share scheduling for the generation job queue.
+
+Pending jobs are ordered so that no single user can monopolise the workers:
+
+* at most `global_concurrency` jobs run at once across all workers,
+* each user runs at most their tier's `concurrent_generations` jobs at once,
+* contended jobs are ordered by `(running + queued_ahead) / queue_weight`, so
+  a pro user (higher weight) gets proportionally more slots than a free user
+  with the same backlog, and ties go to the heavier tier, then the oldest job.
+
+The caps are checked twice: when picking candidates, and again by the claim
+UPDATE itself (`under_claim_caps`), so workers that picked candidates from the
+same snapshot cannot together exceed a cap.
+"""
+
+import datetime
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, aliased
+
+from backend.config.settings import get_generation_queue_limits
+from backend.database.sqlite_dal import GenerationJob, Subscription
+
+# Bound the scheduling window; anything beyond it is far from being claimed anyway
+_CANDIDATE_WINDOW = 500
+_DEFAULT_JOB_SECONDS = 60.0
+_DURATION_SAMPLE_SIZE = 50
+
+
+@dataclass
+class _Candidate:
+    job_id: int
+    user_id: str
+    created_at: Optional[datetime.datetime]
+    tier: str
+    score: float
+    weight: int
+
+
+@dataclass
+class ClaimCandidate:
+    """A job that may be claimed, with the caps its claim must still respect."""
+
+    job_id: int
+    user_id: str
+    user_cap: int
+    global_cap: int
+
+
+def _user_tiers(db: Session, user_ids: Iterable[str]) -> Dict[str, str]:
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+    pro_users = {
+        row.user_id
+        for row in db.query(Subscription.user_id).filter(
+            Subscription.user_id.in_(user_ids),
+            Subscription.status == "active",
+        )
+    }
+    return {user_id: ("pro_tier" if user_id in pro_users else "free_tier") for user_id in user_ids}
+
+
+def _running_filter(model, now: datetime.datetime):
+    return and_(
+        model.status == "in_progress",
+        model.lease_expires_at.isnot(None),
+        model.lease_expires_at >= now,
+    )
+
+
+def _running_counts(db: Session, now: datetime.datetime) -> Dict[str, int]:
+    rows = (
+        db.query(GenerationJob.user_id, func.count(GenerationJob.id))
+        .filter(_running_filter(GenerationJob, now))
+        .group_by(GenerationJob.user_id)
+        .all()
+    )
+    return {user_id: count for user_id, count in rows}
+
+
+def _ordered_candidates(
+    db: Session,
+    claimable_filter,
+    running: Dict[str, int],
+    limits: Dict[str, object],
+    job_types: Optional[Iterable[str]] = None,
+) -> List[_Candidate]:
+    query = db.query(GenerationJob.id, GenerationJob.user_id, GenerationJob.created_at).filter(claimable_filter)
+    if job_types:
+        query = query.filter(GenerationJob.job_type.in_(list(job_types)))
+    rows = query.order_by(GenerationJob.created_at, GenerationJob.id).limit(_CANDIDATE_WINDOW).all()
+
+    tiers = _user_tiers(db, (row.user_id for row in rows))
+    queued_ahead: Dict[str, int] = defaultdict(int)
+    candidates: List[_Candidate] = []
+    for row in rows:
+        tier = tiers.get(row.user_id, "free_tier")
+        weight = limits["tiers"][tier]["queue_weight"]
+        score = (running.get(row.user_id, 0) + queued_ahead[row.user_id]) / weight
+        queued_ahead[row.user_id] += 1
+        candidates.append(_Candidate(row.id, row.user_id, row.created_at, tier, score, weight))
+
+    candidates.sort(key=lambda c: (c.score, -c.weight, c.created_at or datetime.datetime.min, c.job_id))
+    return candidates
+
+
+def select_claim_candidates(
+    db: Session,
+    claimable_filter,
+    now: datetime.datetime,
+    job_types: Optional[Iterable[str]] = None,
+) -> List[ClaimCandidate]:
+    """
+    Jobs that may be claimed right now, best candidate first.
+
+    Returns an empty list when the global concurrency cap is reached. Jobs of
+    users already at their per-user cap are skipped.
+    """
+    limits = get_generation_queue_limits()
+    global_cap = limits["global_concurrency"]
+    running = _running_counts(db, now)
+    if sum(running.values()) >= global_cap:
+        return []
+
+    eligible: List[ClaimCandidate] = []
+    seen_users = set()
+    for candidate in _ordered_candidates(db, claimable_filter, running, limits, job_types):
+        if candidate.user_id in seen_users:
+            continue  # only a user's best-placed job can be claimed next
+        seen_users.add(candidate.user_id)
+        user_cap = limits["tiers"][candidate.tier]["concurrent_generations"]
+        if running.get(candidate.user_id, 0) < user_cap:
+            eligible.append(ClaimCandidate(candidate.job_id, candidate.user_id, user_cap, global_cap))
+    return eligible
+
+
+def under_claim_caps(now: datetime.datetime, user_id: str, user_cap: int, global_cap: int):
+    """
+    SQL condition for a claim UPDATE that holds while both caps have room.
+
+    The running jobs are counted by the UPDATE statement itself, so on SQLite,
+    which serialises writers, the count cannot change between the check and the
+    claim.
+    """
+    running = aliased(GenerationJob)
+
+    def running_count(*conditions):
+        return select(func.count(running.id)).where(_running_filter(running, now), *conditions).scalar_subquery()
+
+    return and_(
+        running_count() < global_cap,
+        running_count(running.user_id == user_id) < user_cap,
+    )
+
+
+def _average_job_seconds(db: Session) -> float:
+    rows = (
+        db.query(GenerationJob.started_at, GenerationJob.completed_at)
+        .filter(
+            GenerationJob.status == "completed",
+            GenerationJob.started_at.isnot(None),
+            GenerationJob.completed_at.isnot(None),
+        )
+        .order_by(GenerationJob.completed_at.desc())
+        .limit(_DURATION_SAMPLE_SIZE)
+        .all()
+    )
+    durations = [
+        (row.completed_at - row.started_at).total_seconds()
+        for row in rows
+        if row.completed_at >= row.started_at
+    ]
+    return sum(durations) / len(durations) if durations else _DEFAULT_JOB_SECONDS
+
+
+def estimate_queue_position(db: Session, job: GenerationJob, claimable_filter) -> Optional[Dict[str, object]]:
+    """
+    Estimate where a pending job sits in the fair-share order and when it will start.
+
+    Returns None for jobs that are not waiting. The estimate assumes the current
+    running set drains at the recent average job duration.
+    """
+    if job.status != "pending":
+        return None
+
+    now = datetime.datetime.now()
+    limits = get_generation_queue_limits()
+    running = _running_counts(db, now)
+    candidates = _ordered_candidates(db, claimable_filter, running, limits)
+    position = next((index + 1 for index, c in enumerate(candidates) if c.job_id == job.id), None)
+    if position is None:
+        # Retry backoff not elapsed yet, or beyond the scheduling window
+        position = len(candidates) + 1
+
+    global_cap = limits["global_concurrency"]
+    free_slots = max(global_cap - sum(running.values()), 0)
+    waves = 0 if position <= free_slots else math.ceil((position - free_slots) / global_cap)
+    start_at = now + datetime.timedelta(seconds=waves * _average_job_seconds(db))
+    if job.available_at and job.available_at > start_at:
+        start_at = job.available_at
+
+    return {"queue_position": position, "estimated_start_at": start_at}
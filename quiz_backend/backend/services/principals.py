@@ -0,0 +1,113 @@
+"""
+Short-lived cache of authenticated principals.
+
+Resolving the current user cost a `users` query on every authenticated
+request, and tier checks then queried `subscriptions` again. A principal is
+a detached snapshot of the user row plus the user's active subscription. It
+is cached in process for `auth.principal_cache_ttl_seconds`. On a hit, the
+snapshot is merged into the request's session without loading, so handlers
+still receive an attached `User` and the request issues no SQL for it.
+
+Writes that change a user's row or subscriptions must call
+`invalidate_principal` once they are committed. Other workers keep their
+entry until it expires, which is what bounds staleness across processes.
+Balances such as `free_tokens` are not authoritative in a snapshot. The
+credit checks lock and refresh the user row before reading them.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from backend.config.settings import get_principal_cache_settings
+from backend.database.sqlite_dal import Subscription, User
+
+
+@dataclass(frozen=True)
+class Principal:
+    # Detached snapshots shared between requests; never modify or add them to a session
+    user: User
+    subscription: Optional[Subscription]
+
+    @property
+    def tier(self) -> str:
+        return "pro_tier" if self.subscription else "free_tier"
+
+    @property
+    def has_active_subscription(self) -> bool:
+        return self.subscription is not None
+
+
+_principals: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+_principals_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _settings() -> Dict[str, int]:
+    return get_principal_cache_settings()
+
+
+def resolve_principal(db: Session, user_id: str) -> Optional[Principal]:
+    """The cached principal of a user, loading it on a miss. None if the user does not exist."""
+    settings = _settings()
+    now = time.monotonic()
+    with _principals_lock:
+        cached = _principals.get(user_id)
+        if cached and cached[0] > now:
+            _principals.move_to_end(user_id)
+            return cached[1]
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    subscription = (
+        db.query(Subscription)
+        .filter(Subscription.user_id == user_id, Subscription.status == "active")
+        .first()
+    )
+    principal = Principal(_snapshot(user), _snapshot(subscription) if subscription else None)
+
+    if settings["ttl_seconds"] > 0:
+        with _principals_lock:
+            _principals[user_id] = (now + settings["ttl_seconds"], principal)
+            _principals.move_to_end(user_id)
+            while len(_principals) > settings["max_entries"]:
+                _principals.popitem(last=False)
+    return principal
+
+
+def load_current_user(db: Session, user_id: str) -> Optional[User]:
+    """The user attached to `db`, from the principal cache when possible."""
+    principal = resolve_principal(db, user_id)
+    if principal is None:
+        return None
+    # load=False copies the snapshot into the session without a SELECT
+    return db.merge(principal.user, load=False)
+
+
+def get_principal_tier(db: Session, user_id: str) -> str:
+    """`pro_tier` if the user has an active subscription, else `free_tier`."""
+    principal = resolve_principal(db, user_id)
+    return principal.tier if principal else "free_tier"
+
+
+def invalidate_principal(user_ids: Iterable[Optional[str]]) -> None:
+    """Drop cached principals after their user or subscription rows changed."""
+    with _principals_lock:
+        for user_id in user_ids:
+            if user_id:
+                _principals.pop(user_id, None)
+
+
+def _snapshot(instance: Any) -> Any:
+    # A copy of the loaded columns, detached with the row's identity so merge(load=False) accepts it
+    mapper = inspect(type(instance))
+    snapshot = mapper.class_(**{attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(snapshot)
+    return snapshot
@@ -0,0 +1,220 @@
+"""
+Retrieval index for project chat, stored in `project_content_chunks`.
+
+The extracted text of every project PDF is split into passages. Each passage
+is stored with its term counts, which form the lexical BM25 index, and, when
+`project_chat.embeddings_enabled` is set, an embedding. Chat ranks a
+project's passages against the user's message and sends only the top-k to
+the model, so prompt size no longer grows with the project.
+
+The index is maintained incrementally: a document's passages are written
+when its text is extracted and removed when the document is deleted.
+Documents uploaded before the index existed are indexed on first chat.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session, undefer
+
+from backend.config.settings import get_project_chat_settings
+from backend.database.sqlite_dal import ProjectContentChunk, StudentProjectContent
+from backend.utils.openai_client import get_async_openai_client, get_openai_client
+from backend.utils.utils import _chunk_text
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+# Reciprocal rank fusion constant used to combine the BM25 and embedding rankings
+_RRF_K = 60
+_EMBEDDING_BATCH_SIZE = 100
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word terms used by the BM25 index."""
+    return [term for term in _TOKEN_PATTERN.findall(text.lower()) if len(term) > 1]
+
+
+def index_content(db: Session, content: StudentProjectContent, text: str) -> int:
+    """
+    Replace the indexed passages of one project document. The caller commits.
+
+    Returns the number of passages written.
+    """
+    settings = get_project_chat_settings()
+    remove_content(db, content.id)
+
+    chunks = _chunk_text(
+        text,
+        max_tokens=settings["chunk_max_tokens"],
+        overlap_tokens=settings["chunk_overlap_tokens"],
+        # Roughly 4 characters per token, with headroom
+        max_chars=settings["chunk_max_tokens"] * 8,
+    )
+    embeddings = _embed_passages([chunk for chunk, _ in chunks], settings) if settings["embeddings_enabled"] else None
+
+    for index, (chunk, token_count) in enumerate(chunks):
+        db.add(
+            ProjectContentChunk(
+                project_id=content.project_id,
+                content_id=content.id,
+                chunk_index=index,
+                text=chunk,
+                token_count=token_count,
+                term_counts=dict(Counter(tokenize(chunk))),
+                embedding=embeddings[index] if embeddings else None,
+            )
+        )
+    logger.info("[PROJECT RETRIEVAL] Indexed %d passages for content %s", len(chunks), content.id)
+    return len(chunks)
+
+
+def remove_content(db: Session, content_id: int) -> None:
+    """Drop the indexed passages of a deleted document. The caller commits."""
+    db.query(ProjectContentChunk).filter(ProjectContentChunk.content_id == content_id).delete(
+        synchronize_session=False
+    )
+
+
+def remove_project(db: Session, project_id: int) -> None:
+    """Drop every indexed passage of a deleted project. The caller commits."""
+    db.query(ProjectContentChunk).filter(ProjectContentChunk.project_id == project_id).delete(
+        synchronize_session=False
+    )
+
+
+def indexed_content_ids(db: Session, content_ids: Iterable[int]) -> set:
+    content_ids = list(content_ids)
+    if not content_ids:
+        return set()
+    rows = (
+        db.query(ProjectContentChunk.content_id)
+        .filter(ProjectContentChunk.content_id.in_(content_ids))
+        .distinct()
+        .all()
+    )
+    return {row.content_id for row in rows}
+
+
+async def embed_query(query: str) -> Optional[List[float]]:
+    """Embedding of a chat message, or None when embeddings are disabled or unavailable."""
+    settings = get_project_chat_settings()
+    if not settings["embeddings_enabled"]:
+        return None
+    try:
+        response = await get_async_openai_client().embeddings.create(
+            model=settings["embedding_model"], input=[query]
+        )
+        return list(response.data[0].embedding)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[PROJECT RETRIEVAL] Query embedding failed, using BM25 only: %s", exc)
+        return None
+
+
+def retrieve_passages(
+    db: Session,
+    content_ids: List[int],
+    query: str,
+    top_k: Optional[int] = None,
+    query_embedding: Optional[List[float]] = None,
+) -> List[ProjectContentChunk]:
+    """
+    Return the passages of the given documents most relevant to `query`, best first.
+
+    Passages are ranked with BM25 and, when a query embedding is given, fused
+    with cosine similarity by reciprocal rank. A message sharing no terms with
+    any passage (e.g. "summarize this") gets the opening passages instead.
+    """
+    top_k = top_k or get_project_chat_settings()["top_k"]
+    query_options = [undefer(ProjectContentChunk.embedding)] if query_embedding else []
+    passages = (
+        db.query(ProjectContentChunk)
+        .options(*query_options)
+        .filter(ProjectContentChunk.content_id.in_(content_ids))
+        .all()
+    )
+    if not passages:
+        return []
+
+    bm25_scores = _bm25_scores(passages, tokenize(query))
+    rankings = []
+    if any(score > 0 for score in bm25_scores):
+        rankings.append(_rank([index for index, score in enumerate(bm25_scores) if score > 0], bm25_scores))
+    if query_embedding:
+        similarities = [_cosine(query_embedding, passage.embedding) for passage in passages]
+        rankings.append(_rank([index for index, passage in enumerate(passages) if passage.embedding], similarities))
+    rankings = [ranking for ranking in rankings if ranking]
+
+    if not rankings:
+        # Nothing matched: take the beginning of each document, interleaved
+        ordered = sorted(passages, key=lambda passage: (passage.chunk_index, passage.content_id))
+        return ordered[:top_k]
+
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, index in enumerate(ranking):
+            fused[index] = fused.get(index, 0.0) + 1.0 / (_RRF_K + rank + 1)
+    best = sorted(fused, key=lambda index: fused[index], reverse=True)[:top_k]
+    return [passages[index] for index in best]
+
+
+def _bm25_scores(passages: List[ProjectContentChunk], query_terms: List[str]) -> List[float]:
+    if not query_terms:
+        return [0.0] * len(passages)
+
+    lengths = [sum((passage.term_counts or {}).values()) for passage in passages]
+    average_length = (sum(lengths) / len(lengths)) or 1.0
+    unique_terms = set(query_terms)
+    document_frequency = {
+        term: sum(1 for passage in passages if term in (passage.term_counts or {})) for term in unique_terms
+    }
+    passage_count = len(passages)
+
+    scores = []
+    for passage, length in zip(passages, lengths):
+        term_counts = passage.term_counts or {}
+        score = 0.0
+        for term in unique_terms:
+            frequency = term_counts.get(term)
+            if not frequency:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (passage_count - df + 0.5) / (df + 0.5))
+            score += idf * frequency * (_BM25_K1 + 1) / (
+                frequency + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / average_length)
+            )
+        scores.append(score)
+    return scores
+
+
+def _rank(indexes: List[int], scores: List[float]) -> List[int]:
+    return sorted(indexes, key=lambda index: scores[index], reverse=True)
+
+
+def _cosine(left: List[float], right: Optional[List[float]]) -> float:
+    if not right or len(left) != len(right):
+        return 0.0
+    dot = sum(a * b for a, b in zip(left, right))
+    norm = math.sqrt(sum(a * a for a in left)) * math.sqrt(sum(b * b for b in right))
+    return dot / norm if norm else 0.0
+
+
+def _embed_passages(texts: List[str], settings: Dict) -> Optional[List[List[float]]]:
+    # Embeddings only sharpen the ranking, so failures fall back to BM25 alone
+    try:
+        client = get_openai_client()
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), _EMBEDDING_BATCH_SIZE):
+            response = client.embeddings.create(
+                model=settings["embedding_model"], input=texts[start:start + _EMBEDDING_BATCH_SIZE]
+            )
+            embeddings.extend(list(item.embedding) for item in response.data)
+        return embeddings
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[PROJECT RETRIEVAL] Passage embedding failed, indexing for BM25 only: %s", exc)
+        return None
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from backend.config import get_subscription_plan_by_price_id, get_subscription_plans_config
 from backend.database.sqlite_dal import Subscription, Transaction, User
+from backend.services.principals import invalidate_principal
 
 logger = logging.getLogger(__name__)
 
@@ -398,6 +399,7 @@ class StripeService:
                 existing_subscription.cancel_at_period_end = getattr(subscription, 'cancel_at_period_end', False)
                 existing_subscription.updated_at = datetime.now()
                 db.commit()
+                invalidate_principal([user.id])
                 logger.info(f"Updated subscription {subscription_id} for user {user.id} - status: {subscription.status}, plan: {plan_type}")
             else:
                 # Create new subscription record
@@ -413,6 +415,7 @@ class StripeService:
                 )
                 db.add(db_subscription)
                 db.commit()
+                invalidate_principal([user.id])
                 logger.info(f"Created subscription {subscription_id} for user {user.id} with plan {plan_type} - status: {subscription.status}")
             
             return True
@@ -482,6 +485,7 @@ class StripeService:
             existing_subscription.cancel_at_period_end = getattr(subscription, 'cancel_at_period_end', False)
             existing_subscription.updated_at = datetime.now()
             db.commit()
+            invalidate_principal([user.id])
             logger.info(f"Updated existing subscription {subscription.id} for user {user.id} - status: {subscription.status}, plan: {plan_type}")
         else:
             # Create subscription record
@@ -496,6 +500,7 @@ class StripeService:
             )
             db.add(db_subscription)
             db.commit()
+            invalidate_principal([user.id])
             logger.info(f"Created subscription {subscription.id} for user {user.id} with plan {plan_type} - status: {subscription.status}")
         
         return True
@@ -523,6 +528,7 @@ class StripeService:
             db_subscription.cancel_at_period_end = getattr(subscription, 'cancel_at_period_end', False)
             db_subscription.updated_at = datetime.now()
             db.commit()
+            invalidate_principal([db_subscription.user_id])
             logger.info(f"Updated subscription {subscription.id} - status: {subscription.status}")
         
         return True
@@ -538,6 +544,7 @@ class StripeService:
             db_subscription.status = "canceled"
             db_subscription.updated_at = datetime.now()
             db.commit()
+            invalidate_principal([db_subscription.user_id])
         
         return True
     
@@ -560,6 +567,7 @@ class StripeService:
                 db_subscription.status = "past_due"
                 db_subscription.updated_at = datetime.now()
                 db.commit()
+                invalidate_principal([db_subscription.user_id])
         
         return True 
 
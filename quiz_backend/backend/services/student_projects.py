@@ -0,0 +1,272 @@
+"""
+Read paths for a user's student projects.
+
+`list_user_projects` loads one page of projects with their contents,
+reference ids and per-project counts in a fixed number of statements. The
+count of statements does not grow with the number of projects. Pages are
+keyset-paginated on (created_at, id), newest first. The cursor is opaque
+to clients and stays stable while projects are added or deleted.
+
+`load_generated_content` lists the quizzes, flashcard sets, essay sets and
+mind maps of a project (or of one of its PDFs) with one joined query per
+kind. Results are cached in process and stamped with the project's
+`content_version`. Every write that changes a project's generated content
+must call `bump_content_version` (or `bump_content_version_for_quiz`) in
+the same transaction. A stale entry then no longer matches the version
+read with the project row, so the cache stays correct across workers.
+"""
+
+import base64
+import binascii
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from backend.database.sqlite_dal import (
+    EssayQAQuestion,
+    EssayQATopic,
+    FlashcardCard,
+    FlashcardTopic,
+    MindMap,
+    QuizQuestion,
+    QuizTopic,
+    StudentProject,
+    StudentProjectContent,
+    StudentProjectEssayReference,
+    StudentProjectFlashcardReference,
+    StudentProjectMindMapReference,
+    StudentProjectQuizReference,
+)
+
+_COUNTED_MODELS = {
+    "content_count": StudentProjectContent,
+    "quiz_count": StudentProjectQuizReference,
+    "flashcard_count": StudentProjectFlashcardReference,
+    "essay_count": StudentProjectEssayReference,
+    "mind_map_count": StudentProjectMindMapReference,
+}
+
+
+def encode_cursor(project: StudentProject) -> str:
+    raw = f"{project.created_at.isoformat()}|{project.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """Parse a listing cursor. Raises ValueError if it is malformed."""
+    try:
+        created_at, project_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(created_at), int(project_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
+
+
+def count_user_projects(db: Session, user_id: str) -> int:
+    return db.query(func.count(StudentProject.id)).filter(StudentProject.user_id == user_id).scalar() or 0
+
+
+def list_user_projects(
+    db: Session,
+    user_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Tuple[StudentProject, Dict[str, int]]], Optional[str]]:
+    """
+    Return one page of the user's projects, newest first, and the cursor of the next page.
+
+    Each project comes with its counts (content_count, quiz_count, ...), computed
+    by correlated subqueries in the page query. Contents and reference rows are
+    loaded with one IN query per relationship for the whole page. Without
+    `limit` every project is returned and the next cursor is None.
+    """
+    counts = [
+        select(func.count(model.id))
+        .where(model.project_id == StudentProject.id)
+        .correlate(StudentProject)
+        .scalar_subquery()
+        .label(name)
+        for name, model in _COUNTED_MODELS.items()
+    ]
+    query = (
+        db.query(StudentProject, *counts)
+        .options(
+            selectinload(StudentProject.contents),
+            selectinload(StudentProject.quiz_references),
+            selectinload(StudentProject.flashcard_references),
+            selectinload(StudentProject.essay_references),
+            selectinload(StudentProject.mind_map_references),
+        )
+        .filter(StudentProject.user_id == user_id)
+    )
+    if cursor:
+        created_at, project_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                StudentProject.created_at < created_at,
+                and_(StudentProject.created_at == created_at, StudentProject.id < project_id),
+            )
+        )
+    query = query.order_by(StudentProject.created_at.desc(), StudentProject.id.desc())
+    if limit:
+        # One extra row tells whether there is a next page
+        query = query.limit(limit + 1)
+
+    rows = query.all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0])
+
+    projects = [
+        (row[0], {name: row[index + 1] or 0 for index, name in enumerate(_COUNTED_MODELS)})
+        for row in rows
+    ]
+    return projects, next_cursor
+
+
+_GENERATED_CONTENT_CACHE_SIZE = 512
+_generated_content_cache: "OrderedDict[tuple, Tuple[int, Dict[str, List[Dict[str, Any]]]]]" = OrderedDict()
+_generated_content_lock = threading.Lock()
+
+
+def bump_content_version(db: Session, project_ids: Iterable[int]) -> None:
+    """Invalidate cached generated-content listings of the given projects. The caller commits."""
+    project_ids = [project_id for project_id in project_ids if project_id is not None]
+    if project_ids:
+        _bump(db, StudentProject.id.in_(project_ids))
+
+
+def bump_content_version_for_quiz(db: Session, quiz_topic_id: int) -> None:
+    """Invalidate the listings of every project referencing a quiz whose questions changed."""
+    project_ids = select(StudentProjectQuizReference.project_id).where(
+        StudentProjectQuizReference.quiz_topic_id == quiz_topic_id
+    )
+    _bump(db, StudentProject.id.in_(project_ids))
+
+
+def _bump(db: Session, condition: Any) -> None:
+    db.query(StudentProject).filter(condition).update(
+        {
+            StudentProject.content_version: StudentProject.content_version + 1,
+            # Generating content does not count as editing the project
+            StudentProject.updated_at: StudentProject.updated_at,
+        },
+        synchronize_session=False,
+    )
+
+
+def load_generated_content(
+    db: Session,
+    project: StudentProject,
+    content_id: Optional[int] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Quizzes, flashcards, essays and mind maps of a project, or of one of its contents.
+
+    Project-wide quiz, flashcard and essay items include their `content_id`. The result is
+    shared with the cache and must not be modified.
+    """
+    # created_at guards against a deleted project's id being reused
+    key = (project.id, project.created_at, content_id)
+    version = project.content_version or 0
+    with _generated_content_lock:
+        cached = _generated_content_cache.get(key)
+        if cached and cached[0] == version:
+            _generated_content_cache.move_to_end(key)
+            return cached[1]
+
+    include_content_id = content_id is None
+    generated = {
+        "quizzes": _topic_items(
+            db, project.id, content_id, StudentProjectQuizReference, StudentProjectQuizReference.quiz_topic_id,
+            QuizTopic, QuizQuestion, "question_count", include_content_id,
+        ),
+        "flashcards": _topic_items(
+            db, project.id, content_id, StudentProjectFlashcardReference,
+            StudentProjectFlashcardReference.flashcard_topic_id, FlashcardTopic, FlashcardCard, "card_count",
+            include_content_id,
+        ),
+        "essays": _topic_items(
+            db, project.id, content_id, StudentProjectEssayReference, StudentProjectEssayReference.essay_topic_id,
+            EssayQATopic, EssayQAQuestion, "question_count", include_content_id,
+        ),
+        "mind_maps": _mind_map_items(db, project.id, content_id),
+    }
+
+    with _generated_content_lock:
+        _generated_content_cache[key] = (version, generated)
+        _generated_content_cache.move_to_end(key)
+        while len(_generated_content_cache) > _GENERATED_CONTENT_CACHE_SIZE:
+            _generated_content_cache.popitem(last=False)
+    return generated
+
+
+def _isoformat(value: Optional[datetime.datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _topic_items(
+    db: Session,
+    project_id: int,
+    content_id: Optional[int],
+    reference_model: Any,
+    reference_topic_id: Any,
+    topic_model: Any,
+    child_model: Any,
+    count_key: str,
+    include_content_id: bool,
+) -> List[Dict[str, Any]]:
+    query = (
+        db.query(reference_model, topic_model, func.count(child_model.id))
+        .join(topic_model, topic_model.id == reference_topic_id)
+        .outerjoin(child_model, child_model.topic_id == topic_model.id)
+        .filter(reference_model.project_id == project_id)
+    )
+    if content_id is not None:
+        query = query.filter(reference_model.content_id == content_id)
+    rows = query.group_by(reference_model.id, topic_model.id).order_by(reference_model.id).all()
+
+    items = []
+    for reference, topic, child_count in rows:
+        item = {
+            "id": topic.id,
+            "topic": topic.topic,
+            "category": topic.category,
+            "subcategory": topic.subcategory,
+            "difficulty": topic.difficulty,
+            count_key: child_count,
+            "creation_timestamp": _isoformat(topic.creation_timestamp),
+            "reference_created_at": _isoformat(reference.created_at),
+        }
+        if include_content_id:
+            item["content_id"] = reference.content_id
+        items.append(item)
+    return items
+
+
+def _mind_map_items(db: Session, project_id: int, content_id: Optional[int]) -> List[Dict[str, Any]]:
+    query = (
+        db.query(StudentProjectMindMapReference, MindMap)
+        .join(MindMap, MindMap.id == StudentProjectMindMapReference.mind_map_id)
+        .filter(StudentProjectMindMapReference.project_id == project_id)
+    )
+    if content_id is not None:
+        query = query.filter(StudentProjectMindMapReference.content_id == content_id)
+
+    return [
+        {
+            "id": mind_map.id,
+            "title": mind_map.title,
+            "central_idea": mind_map.central_idea,
+            "category": mind_map.category,
+            "subcategory": mind_map.subcategory,
+            "node_count": len(mind_map.nodes or []),
+            "created_at": _isoformat(mind_map.created_at),
+            "reference_created_at": _isoformat(reference.created_at),
+        }
+        for reference, mind_map in query.order_by(StudentProjectMindMapReference.id).all()
+    ]
@@ -0,0 +1,184 @@
+"""
+Per-user quiz analytics rollups (`user_analytics`, `user_category_analytics`).
+
+Every recorded attempt is added to its user's rollup in the same transaction
+that stores the attempt, so the analytics dashboard reads a few small rows
+instead of rescanning the user's whole attempt history. A user without a
+rollup row (attempts recorded before the rollups existed, or a rollup that
+was invalidated) gets one rebuilt from history on first use. Two requests
+may rebuild the same user's rollup at once; the one that inserts second
+keeps the other's row instead of failing.
+"""
+
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.database.sqlite_dal import QuizAttempt, QuizTopic, UserAnalytics, UserCategoryAnalytics
+
+logger = logging.getLogger(__name__)
+
+# Attempts on quizzes generated from a URL or PDF are recorded against this placeholder topic
+GENERATED_QUIZ_TOPIC_ID = 999
+
+
+def attempt_category(topic_id: int, topic: Optional[QuizTopic]) -> str:
+    if topic_id == GENERATED_QUIZ_TOPIC_ID:
+        return "Generated Content"
+    return topic.category if topic else "Unknown Category"
+
+
+def record_attempt(db: Session, attempt: QuizAttempt, category: str) -> None:
+    """
+    Add a new attempt to its user's rollup. The caller commits.
+
+    Attempts without a user (shared quizzes taken by participants) have no
+    dashboard and are not tracked.
+    """
+    if not attempt.user_id:
+        return
+
+    rollup = _lock_rollup(db, attempt.user_id)
+    if rollup is None:
+        # The rebuild reads the attempt back from the database
+        db.flush()
+        if _rebuild(db, attempt.user_id) is not None:
+            return
+        # A concurrent rebuild inserted the rollup first. It cannot have seen
+        # this uncommitted attempt, so add the attempt to it instead.
+        rollup = _lock_rollup(db, attempt.user_id)
+
+    _add_attempt(
+        rollup,
+        _category_row(db, attempt.user_id, category),
+        attempt.score,
+        attempt.total_questions,
+        attempt.percentage_score,
+        attempt.time_taken_seconds,
+    )
+
+
+def rebuild_user_analytics(db: Session, user_id: str) -> UserAnalytics:
+    """Recompute a user's rollup from their attempt history. The caller commits."""
+    rollup = _rebuild(db, user_id)
+    if rollup is None:
+        rollup = db.query(UserAnalytics).filter(UserAnalytics.user_id == user_id).one()
+    return rollup
+
+
+def _rebuild(db: Session, user_id: str) -> Optional[UserAnalytics]:
+    # None if another transaction inserted the user's rollup first
+    invalidate_user_analytics(db, [user_id])
+
+    attempts = (
+        db.query(
+            QuizAttempt.topic_id,
+            QuizAttempt.score,
+            QuizAttempt.total_questions,
+            QuizAttempt.percentage_score,
+            QuizAttempt.time_taken_seconds,
+            QuizTopic,
+        )
+        .outerjoin(QuizTopic, QuizTopic.id == QuizAttempt.topic_id)
+        .filter(QuizAttempt.user_id == user_id)
+        .order_by(QuizAttempt.timestamp, QuizAttempt.id)
+        .all()
+    )
+
+    rollup = UserAnalytics(
+        user_id=user_id, total_quizzes=0, total_time_spent=0, score_sum=0.0, best_score=0.0, scores=[]
+    )
+    categories = {}
+    for topic_id, score, total_questions, percentage_score, time_taken_seconds, topic in attempts:
+        category = attempt_category(topic_id, topic)
+        if category not in categories:
+            categories[category] = UserCategoryAnalytics(
+                user_id=user_id, category=category, attempts=0, correct_answers=0, total_questions=0
+            )
+        _add_attempt(rollup, categories[category], score, total_questions, percentage_score, time_taken_seconds)
+
+    try:
+        # A savepoint, so losing the race leaves the caller's transaction usable
+        with db.begin_nested():
+            db.add(rollup)
+            db.add_all(categories.values())
+    except IntegrityError:
+        logger.info("[ANALYTICS] Rollup for user %s was rebuilt concurrently; keeping the other one", user_id)
+        return None
+    logger.info("[ANALYTICS] Rebuilt rollup for user %s from %d attempts", user_id, len(attempts))
+    return rollup
+
+
+def load_user_analytics(db: Session, user_id: str) -> Tuple[UserAnalytics, List[UserCategoryAnalytics]]:
+    """The user's rollup and per-category rows, rebuilding them first if missing. The caller commits."""
+    rollup = db.query(UserAnalytics).filter(UserAnalytics.user_id == user_id).first()
+    if rollup is None:
+        rollup = rebuild_user_analytics(db, user_id)
+    categories = (
+        db.query(UserCategoryAnalytics)
+        .filter(UserCategoryAnalytics.user_id == user_id)
+        .order_by(UserCategoryAnalytics.id)
+        .all()
+    )
+    return rollup, categories
+
+
+def recent_attempts(db: Session, user_id: str, limit: int = 5) -> List[Tuple[QuizAttempt, Optional[QuizTopic]]]:
+    """The user's latest attempts, newest first, with their quiz topics."""
+    return (
+        db.query(QuizAttempt, QuizTopic)
+        .outerjoin(QuizTopic, QuizTopic.id == QuizAttempt.topic_id)
+        .filter(QuizAttempt.user_id == user_id)
+        .order_by(QuizAttempt.timestamp.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def invalidate_user_analytics(db: Session, user_ids: Iterable[str]) -> None:
+    """Drop rollups whose attempts were deleted; they are rebuilt on next use. The caller commits."""
+    user_ids = [user_id for user_id in user_ids if user_id]
+    if not user_ids:
+        return
+    db.query(UserCategoryAnalytics).filter(UserCategoryAnalytics.user_id.in_(user_ids)).delete(
+        synchronize_session=False
+    )
+    db.query(UserAnalytics).filter(UserAnalytics.user_id.in_(user_ids)).delete(synchronize_session=False)
+
+
+def _lock_rollup(db: Session, user_id: str) -> Optional[UserAnalytics]:
+    return db.query(UserAnalytics).filter(UserAnalytics.user_id == user_id).with_for_update().first()
+
+
+def _category_row(db: Session, user_id: str, category: str) -> UserCategoryAnalytics:
+    row = (
+        db.query(UserCategoryAnalytics)
+        .filter(UserCategoryAnalytics.user_id == user_id, UserCategoryAnalytics.category == category)
+        .first()
+    )
+    if row is None:
+        row = UserCategoryAnalytics(user_id=user_id, category=category, attempts=0, correct_answers=0, total_questions=0)
+        db.add(row)
+    return row
+
+
+def _add_attempt(
+    rollup: UserAnalytics,
+    category_row: UserCategoryAnalytics,
+    score: int,
+    total_questions: int,
+    percentage_score: float,
+    time_taken_seconds: int,
+) -> None:
+    rollup.total_quizzes += 1
+    rollup.total_time_spent += time_taken_seconds or 0
+    rollup.score_sum += percentage_score
+    rollup.best_score = max(rollup.best_score, percentage_score) if rollup.total_quizzes > 1 else percentage_score
+    # Reassigned rather than appended so the JSON column is flagged as changed
+    rollup.scores = [*(rollup.scores or []), percentage_score]
+
+    category_row.attempts += 1
+    category_row.correct_answers += score
+    category_row.total_questions += total_questions
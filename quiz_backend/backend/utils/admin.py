@@ -78,13 +78,14 @@ def get_user_mind_map_count(db: Session, user_id: str) -> int:
 def get_user_token_usage(db: Session, user_id: str) -> dict:
     """
     Get token usage statistics for a user.
-    Returns a dictionary with input_tokens, output_tokens, and total_tokens.
+    Returns a dictionary with input_tokens, output_tokens, total_tokens and cached_tokens.
     """
     # Get token usage from TokenUsage table (direct generations)
     token_usage_stats = db.query(
         func.sum(TokenUsage.input_tokens).label("input_tokens"),
         func.sum(TokenUsage.output_tokens).label("output_tokens"),
         func.sum(TokenUsage.total_tokens).label("total_tokens"),
+        func.sum(TokenUsage.cached_tokens).label("cached_tokens"),
     ).filter(
         TokenUsage.user_id == user_id
     ).first()
@@ -94,6 +95,7 @@ def get_user_token_usage(db: Session, user_id: str) -> dict:
         func.sum(GenerationJob.input_tokens).label("input_tokens"),
         func.sum(GenerationJob.output_tokens).label("output_tokens"),
         func.sum(GenerationJob.total_tokens).label("total_tokens"),
+        func.sum(GenerationJob.cached_tokens).label("cached_tokens"),
     ).filter(
         GenerationJob.user_id == user_id,
         GenerationJob.input_tokens.isnot(None)
@@ -103,11 +105,13 @@ def get_user_token_usage(db: Session, user_id: str) -> dict:
     input_tokens = (token_usage_stats.input_tokens or 0) + (job_token_stats.input_tokens or 0)
     output_tokens = (token_usage_stats.output_tokens or 0) + (job_token_stats.output_tokens or 0)
     total_tokens = (token_usage_stats.total_tokens or 0) + (job_token_stats.total_tokens or 0)
+    cached_tokens = (token_usage_stats.cached_tokens or 0) + (job_token_stats.cached_tokens or 0)
     
     return {
         "input_tokens": int(input_tokens),
         "output_tokens": int(output_tokens),
         "total_tokens": int(total_tokens),
+        "cached_tokens": int(cached_tokens),
     }
 
 
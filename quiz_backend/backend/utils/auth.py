@@ -2,6 +2,7 @@ import os
 import secrets
 from datetime import datetime, timedelta, date
 from typing import Optional
+from fastapi import Request
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
@@ -48,6 +49,22 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def verify_request_token(request: Request, token: str) -> Optional[dict]:
+    """
+    `verify_token` for a request's bearer token, decoded at most once per request.
+
+    The rate limiting middleware and the auth dependencies both need the
+    payload; the first caller stores it in `request.state`, which Starlette
+    shares between the middleware and the endpoint.
+    """
+    cached = getattr(request.state, "verified_token", None)
+    if cached is not None and cached[0] == token:
+        return cached[1]
+    payload = verify_token(token)
+    request.state.verified_token = (token, payload)
+    return payload
+
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """Authenticate a user by email and password"""
     user = db.query(User).filter(User.email == email).first()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from pypdf import PdfReader
+from sqlalchemy.orm import Session
+
+from backend.components.custom_components import NO_EXTRACTABLE_TEXT_MESSAGE, NoExtractableTextError, PDFTextExtractor
+from backend.database.db import SessionLocal
+from backend.database.sqlite_dal import StudentProjectContent
+from backend.services.project_retrieval import index_content
+from backend.utils.pdf_text_cache import remove_cached_text
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_PENDING = "pending"
+EXTRACTION_COMPLETED = "completed"
+EXTRACTION_NO_TEXT = "no_text"
+EXTRACTION_FAILED = "failed"
+
+NO_TEXT_MESSAGE = NO_EXTRACTABLE_TEXT_MESSAGE
+
+_EXTRACTION_WORKERS = max(1, int(os.getenv("PDF_EXTRACTION_WORKERS", "2")))
+_extraction_executor = ThreadPoolExecutor(
+    max_workers=_EXTRACTION_WORKERS,
+    thread_name_prefix="pdf-extract",
+)
+
+
+def schedule_content_extraction(content_id: int) -> None:
+    """Queue text extraction for an uploaded PDF on the extraction worker pool."""
+    _extraction_executor.submit(_extract_content_text, content_id)
+
+
+def _count_pages(file_path: str) -> Optional[int]:
+    try:
+        return len(PdfReader(file_path).pages)
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def _extract_content_text(content_id: int) -> None:
+    session = SessionLocal()
+    try:
+        content = session.query(StudentProjectContent).filter(
+            StudentProjectContent.id == content_id
+        ).first()
+        if not content or content.content_type != "pdf" or not content.content_url:
+            return
+
+        try:
+            extraction = PDFTextExtractor().run(file_path=content.content_url)
+        except NoExtractableTextError as exc:
+            logger.warning("[PDF EXTRACTION] Content %s has no extractable text: %s", content_id, exc)
+            content.page_count = exc.page_count
+            content.char_count = 0
+            content.extraction_status = EXTRACTION_NO_TEXT
+            session.commit()
+            return
+
+        text = extraction["text"]
+        page_count = extraction["page_count"]
+        if page_count is None:
+            # Served from the text cache, which keeps no page count; counting pages parses no text
+            page_count = _count_pages(content.content_url)
+        # Recorded so the text cache entry can be removed with the last content using it
+        content.content_hash = extraction["content_hash"]
+        content.extracted_text = text
+        content.page_count = page_count
+        content.char_count = len(text)
+        content.extraction_status = EXTRACTION_COMPLETED
+        session.commit()
+        logger.info(
+            "[PDF EXTRACTION] Stored %d characters from %s pages for content %s",
+            len(text),
+            page_count if page_count is not None else "?",
+            content_id,
+        )
+
+        # Chat retrieval is an optimisation; a failure here must not fail the extraction
+        try:
+            index_content(session, content, text)
+            session.commit()
+        except Exception as exc:  # pylint: disable=broad-except
+            session.rollback()
+            logger.warning("[PDF EXTRACTION] Failed to index content %s for chat: %s", content_id, exc)
+    except Exception as exc:  # pylint: disable=broad-except
+        session.rollback()
+        logger.error("[PDF EXTRACTION] Failed to extract content %s: %s", content_id, exc, exc_info=True)
+        try:
+            content = session.query(StudentProjectContent).filter(
+                StudentProjectContent.id == content_id
+            ).first()
+            if content:
+                content.extraction_status = EXTRACTION_FAILED
+                session.commit()
+        except Exception:  # pylint: disable=broad-except
+            session.rollback()
+    finally:
+        session.close()
+
+
+def release_text_cache(db: Session, content_hashes: Iterable[Optional[str]]) -> None:
+    """
+    Remove the text cache entries of deleted PDFs.
+
+    Call with the hashes of deleted content rows once the rows are gone;
+    entries still used by another content row are kept.
+    """
+    content_hashes = {content_hash for content_hash in content_hashes if content_hash}
+    if not content_hashes:
+        return
+    try:
+        still_used = {
+            row.content_hash
+            for row in db.query(StudentProjectContent.content_hash).filter(
+                StudentProjectContent.content_hash.in_(content_hashes)
+            )
+        }
+    except Exception as exc:  # pylint: disable=broad-except
+        # The cache is an optimisation; its size limit removes the entries later
+        logger.warning("[PDF EXTRACTION] Could not check text cache entries for removal: %s", exc)
+        return
+    for content_hash in content_hashes - still_used:
+        remove_cached_text(content_hash)
+
+
+def get_content_text(content: StudentProjectContent) -> str:
+    """
+    Return the text for a project content entry.
+
+    Uses the text stored at upload time when it is available and falls back to
+    extracting from the PDF on disk (legacy rows, or extraction still pending).
+
+    Raises:
+        ValueError: If the PDF contains no extractable text.
+    """
+    if content.extracted_text:
+        return content.extracted_text
+    if content.extraction_status == EXTRACTION_NO_TEXT:
+        raise ValueError(NO_TEXT_MESSAGE)
+    return PDFTextExtractor().run(file_path=content.content_url)["text"]
+
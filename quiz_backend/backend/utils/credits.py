@@ -1,14 +1,20 @@
+import logging
 from http import HTTPStatus
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
 
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
 from backend.config import get_free_generation_quota, get_pro_generation_limit
+from backend.services.principals import resolve_principal
+
+logger = logging.getLogger(__name__)
 from backend.database.sqlite_dal import (
     User,
     Subscription,
+    GenerationUsage,
     QuizTopic,
     FlashcardTopic,
     EssayQATopic,
@@ -34,12 +40,9 @@ def _pro_limit_message() -> str:
 
 
 def has_active_subscription(db: Session, user: User) -> bool:
-    """Check if user has an active subscription"""
-    active_subscription = db.query(Subscription).filter(
-        Subscription.user_id == user.id,
-        Subscription.status == "active"
-    ).first()
-    return active_subscription is not None
+    """Check if user has an active subscription (from the principal cache, may lag by its TTL)"""
+    principal = resolve_principal(db, user.id)
+    return principal is not None and principal.has_active_subscription
 
 
 def get_active_subscription(db: Session, user: User) -> Subscription | None:
@@ -112,6 +115,59 @@ def count_monthly_generations(db: Session, user: User, subscription: Subscriptio
     return quiz_count + flashcard_count + essay_count + mind_map_count
 
 
+def _usage_period_start(subscription: Subscription) -> Optional[datetime]:
+    period_start = subscription.current_period_start
+    # count_monthly_generations falls back to a sliding window for these; there is no stable period to key on
+    if period_start is None or period_start > datetime.now():
+        return None
+    return period_start
+
+
+def _find_period_usage(db: Session, user: User, subscription: Subscription) -> Optional[GenerationUsage]:
+    period_start = _usage_period_start(subscription)
+    if period_start is None:
+        return None
+    return db.query(GenerationUsage).filter(
+        GenerationUsage.user_id == user.id,
+        GenerationUsage.period_start == period_start,
+    ).first()
+
+
+def get_period_usage(
+    db: Session, user: User, subscription: Subscription
+) -> tuple[Optional[GenerationUsage], bool]:
+    """
+    The user's generation counter for the subscription's current billing period.
+
+    A new period (the subscription's `current_period_start` moved on) gets a new
+    counter, seeded from the content tables; the flag tells whether it was just
+    seeded. The counter is None when the period start is unusable and callers
+    must count instead. Call with the user row locked. The caller commits.
+    """
+    usage = _find_period_usage(db, user, subscription)
+    if usage is not None:
+        return usage, False
+    period_start = _usage_period_start(subscription)
+    if period_start is None:
+        return None, False
+    usage = GenerationUsage(
+        user_id=user.id,
+        period_start=period_start,
+        generations=count_monthly_generations(db, user, subscription),
+    )
+    db.add(usage)
+    db.flush()
+    return usage, True
+
+
+def monthly_generations_used(db: Session, user: User, subscription: Subscription) -> int:
+    """Generations used in the current billing period, for display. Does not write."""
+    usage = _find_period_usage(db, user, subscription)
+    if usage is not None:
+        return usage.generations
+    return count_monthly_generations(db, user, subscription)
+
+
 def check_generation_token_available(db: Session, user: User, amount: int = 1) -> None:
     """
     Check if generation tokens are available without consuming them.
@@ -137,8 +193,12 @@ def check_generation_token_available(db: Session, user: User, amount: int = 1) -
     subscription = get_active_subscription(db, locked_user)
     if subscription:
         # Pro users have a monthly generation limit defined in configuration
-        # Use database locking to get accurate count
-        monthly_generations = count_monthly_generations(db, locked_user, subscription)
+        # Read from the period counter while the user row is locked
+        usage, _ = get_period_usage(db, locked_user, subscription)
+        if usage is not None:
+            monthly_generations = usage.generations
+        else:
+            monthly_generations = count_monthly_generations(db, locked_user, subscription)
         pro_monthly_limit = get_pro_generation_limit()
         
         # Check if adding this generation would exceed the limit
@@ -160,7 +220,7 @@ def check_generation_token_available(db: Session, user: User, amount: int = 1) -
         )
 
 
-def consume_generation_token(db: Session, user: User, amount: int = 1) -> None:
+def consume_generation_token(db: Session, user: User, amount: int = 1, count_in_period: bool = True) -> None:
     """
     Consume generation tokens for a user.
     
@@ -175,6 +235,8 @@ def consume_generation_token(db: Session, user: User, amount: int = 1) -> None:
         db: Database session
         user: User object
         amount: Number of tokens to consume (default: 1). Each generation type consumes 1 token.
+        count_in_period: False for chat replies. They need a generation to be available but
+            do not count toward a pro user's monthly allowance, which counts created content.
     """
     if amount <= 0:
         return
@@ -195,9 +257,15 @@ def consume_generation_token(db: Session, user: User, amount: int = 1) -> None:
     subscription = get_active_subscription(db, locked_user)
     if subscription:
         # Pro users have a monthly generation limit defined in configuration
-        # Count generations with the locked user to ensure consistency
-        # Add the current amount being consumed to account for the generation being created
-        monthly_generations = count_monthly_generations(db, locked_user, subscription)
+        # Read the period counter with the locked user to ensure consistency
+        usage, seeded = get_period_usage(db, locked_user, subscription)
+        if usage is not None:
+            monthly_generations = usage.generations
+        else:
+            monthly_generations = count_monthly_generations(db, locked_user, subscription)
+        if count_in_period and (seeded or usage is None):
+            # Counted from the content tables, which already hold the content stored before this call
+            monthly_generations = max(0, monthly_generations - amount)
         pro_monthly_limit = get_pro_generation_limit()
         
         # Check if adding this generation would exceed the limit
@@ -207,6 +275,12 @@ def consume_generation_token(db: Session, user: User, amount: int = 1) -> None:
                 detail=_pro_limit_message(),
             )
         # Pro users don't consume free_tokens, but we track monthly generations
+        if usage is not None and count_in_period and not seeded:
+            # Incremented in SQL so concurrent writers cannot lose an update
+            db.query(GenerationUsage).filter(GenerationUsage.id == usage.id).update(
+                {GenerationUsage.generations: GenerationUsage.generations + amount},
+                synchronize_session=False,
+            )
         return
 
     # For free users, check and consume tokens
@@ -225,3 +299,48 @@ def consume_generation_token(db: Session, user: User, amount: int = 1) -> None:
 
     db.add(locked_user)
 
+
+def reconcile_generation_usage(db: Session, fix: bool = True) -> List[Dict[str, Any]]:
+    """
+    Compare the current period counters of active subscriptions with the content tables.
+
+    A counter below the count missed increments (content stored without consuming a
+    generation) and is raised to the count when `fix` is set. A counter above the
+    count is expected after users delete generated content, which does not give the
+    generation back, and is only reported. Returns the mismatches. The caller commits.
+    """
+    mismatches = []
+    rows = (
+        db.query(Subscription, User)
+        .join(User, User.id == Subscription.user_id)
+        .filter(Subscription.status == "active")
+        .all()
+    )
+    for subscription, user in rows:
+        usage = _find_period_usage(db, user, subscription)
+        if usage is None:
+            # Seeded from the content tables on the user's next generation
+            continue
+        counted = count_monthly_generations(db, user, subscription)
+        if counted == usage.generations:
+            continue
+        mismatch = {
+            "user_id": user.id,
+            "period_start": usage.period_start.isoformat(),
+            "counter": usage.generations,
+            "counted": counted,
+            "fixed": fix and counted > usage.generations,
+        }
+        mismatches.append(mismatch)
+        if mismatch["fixed"]:
+            logger.warning(
+                "[CREDITS] Generation counter of user %s behind content (%d < %d), raising it",
+                user.id, usage.generations, counted,
+            )
+            usage.generations = counted
+        else:
+            logger.info(
+                "[CREDITS] Generation counter of user %s is %d, content count is %d",
+                user.id, usage.generations, counted,
+            )
+    return mismatches
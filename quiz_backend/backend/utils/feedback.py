@@ -4,7 +4,7 @@ import re
 from collections import Counter, defaultdict
 from typing import Iterable, Optional
 
-from openai import OpenAI
+from backend.utils.openai_client import get_openai_client
 
 
 def _format_time(seconds: int) -> str:
@@ -67,7 +67,7 @@ def generate_quiz_feedback(
         logging.warning("[QUIZ FEEDBACK] OPENAI_API_KEY not configured; skipping AI feedback generation.")
         return None
 
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client()
     model = os.environ.get("OPENAI_MODEL", "gpt-4.1-mini-2025-04-14")
 
     # Prepare question summaries (focus on incorrect answers first)
@@ -267,7 +267,7 @@ def generate_essay_feedback(
         logging.warning("[ESSAY FEEDBACK] OPENAI_API_KEY not configured; skipping AI feedback generation.")
         return None, None
     
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client()
     model = os.environ.get("OPENAI_MODEL", "gpt-4.1-mini-2025-04-14")
     
     # Format key info points
@@ -393,7 +393,7 @@ def generate_combined_essay_feedback(
         logging.warning("[ESSAY FEEDBACK] OPENAI_API_KEY not configured; skipping AI feedback generation.")
         return None, None
     
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client()
     model = os.environ.get("OPENAI_MODEL", "gpt-4.1-mini-2025-04-14")
     
     # Build the prompt with all questions and answers
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class GenerationExecutor:
+    """
+    Bounded thread pool for blocking LLM generation calls made from async handlers.
+
+    Work submitted through `run` executes off the event loop, so a slow OpenAI
+    call no longer stalls unrelated requests on the same worker. The number of
+    waiting calls is capped; once the queue is full new calls are rejected with
+    a 503 instead of piling up behind the running ones.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-gen")
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait_seconds = 0.0
+        self._total_run_seconds = 0.0
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                logger.warning(
+                    "[GEN EXECUTOR] Rejecting %s: %d calls already queued",
+                    getattr(func, "__name__", func),
+                    self._queued,
+                )
+                raise HTTPException(
+                    status_code=503,
+                    detail="The generation service is busy. Please try again in a moment.",
+                )
+            self._queued += 1
+
+        submitted_at = time.monotonic()
+        future = self._executor.submit(functools.partial(self._execute, func, submitted_at, *args, **kwargs))
+        future.add_done_callback(self._release_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_if_cancelled(self, future: Future) -> None:
+        # A call cancelled before a worker picked it up never reaches _execute
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _execute(self, func: Callable[..., T], submitted_at: float, *args: Any, **kwargs: Any) -> T:
+        started_at = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._total_wait_seconds += started_at - submitted_at
+
+        succeeded = False
+        try:
+            result = func(*args, **kwargs)
+            succeeded = True
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._total_run_seconds += time.monotonic() - started_at
+                if succeeded:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "saturation": round(self._active / self.max_workers, 3),
+                "queue_utilization": round(self._queued / self.max_queue, 3) if self.max_queue else 0.0,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait_seconds * 1000 / finished, 1) if finished else 0.0,
+                "avg_run_ms": round(self._total_run_seconds * 1000 / finished, 1) if finished else 0.0,
+            }
+
+
+generation_executor = GenerationExecutor(
+    max_workers=max(1, int(os.getenv("GENERATION_MAX_WORKERS", "8"))),
+    max_queue=max(1, int(os.getenv("GENERATION_MAX_QUEUE", "64"))),
+)
+
+
+async def run_generation(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking generation call on the shared generation executor."""
+    return await generation_executor.run(func, *args, **kwargs)
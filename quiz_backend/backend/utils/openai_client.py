@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+logger = logging.getLogger(__name__)
+
+_client_lock = threading.Lock()
+_sync_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+
+
+def get_openai_api_key() -> Optional[str]:
+    """Support both OPENAI_API_KEY (standard) and OPEN_API_KEY (legacy typo)."""
+    return os.environ.get("OPENAI_API_KEY") or os.environ.get("OPEN_API_KEY")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("[OPENAI CLIENT] Invalid %s value, using %s", name, default)
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("[OPENAI CLIENT] Invalid %s value, using %s", name, default)
+        return default
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_env_int("OPENAI_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=_env_int("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20),
+        keepalive_expiry=_env_float("OPENAI_KEEPALIVE_EXPIRY", 60.0),
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        _env_float("OPENAI_TIMEOUT", 120.0),
+        connect=_env_float("OPENAI_CONNECT_TIMEOUT", 10.0),
+    )
+
+
+def _max_retries() -> int:
+    return _env_int("OPENAI_MAX_RETRIES", 2)
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Process-wide OpenAI client backed by a pooled, keep-alive HTTP transport.
+
+    Sharing one client lets every generation and feedback call reuse open TLS
+    connections instead of handshaking with the API on each request.
+    """
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                _sync_client = OpenAI(
+                    api_key=get_openai_api_key(),
+                    max_retries=_max_retries(),
+                    timeout=_http_timeout(),
+                    http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout()),
+                )
+                logger.info("[OPENAI CLIENT] Created pooled sync client")
+    return _sync_client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Async counterpart of `get_openai_client` for use directly from async handlers."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(
+                    api_key=get_openai_api_key(),
+                    max_retries=_max_retries(),
+                    timeout=_http_timeout(),
+                    http_client=httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout()),
+                )
+                logger.info("[OPENAI CLIENT] Created pooled async client")
+    return _async_client
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from backend.config.settings import get_pdf_text_cache_dir, get_pdf_text_cache_limits
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# The cache directory is pruned at most this often per process, after a store
+_PRUNE_INTERVAL_SECONDS = 600
+# Temporary files older than this were left behind by a crashed writer
+_STALE_TMP_SECONDS = 3600
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def compute_file_sha256(file_path: str) -> str:
+    """Return the hex SHA-256 digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as handle:
+        for block in iter(lambda: handle.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(content_hash: str) -> str:
+    return os.path.join(get_pdf_text_cache_dir(), f"{content_hash}.txt")
+
+
+def get_cached_text(content_hash: str) -> Optional[str]:
+    """
+    Look up previously extracted text for a PDF content hash.
+
+    Returns:
+        The cached text, or None on a miss or if the cache cannot be read.
+    """
+    try:
+        path = _cache_path(content_hash)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as handle:
+            text = handle.read()
+        # The modification time doubles as the last read time for pruning
+        os.utime(path)
+        return text
+    except OSError as exc:
+        logger.warning("[PDF TEXT CACHE] Failed to read cache entry %s: %s", content_hash, exc)
+        return None
+
+
+def store_cached_text(content_hash: str, text: str) -> None:
+    """
+    Persist extracted text for a PDF content hash.
+
+    The entry is written to a temporary file and atomically renamed so that
+    concurrent workers never observe a partially written cache file.
+    Failures are logged and swallowed; the cache is an optimisation only.
+    """
+    try:
+        path = _cache_path(content_hash)
+        cache_dir = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(text)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[PDF TEXT CACHE] Failed to store cache entry %s: %s", content_hash, exc)
+        return
+    _maybe_prune()
+
+
+def remove_cached_text(content_hash: str) -> None:
+    """Delete the cache entry for a PDF content hash, if there is one."""
+    try:
+        os.unlink(_cache_path(content_hash))
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        logger.warning("[PDF TEXT CACHE] Failed to remove cache entry %s: %s", content_hash, exc)
+
+
+def prune_text_cache(max_bytes: Optional[int] = None, max_age_seconds: Optional[int] = None) -> int:
+    """
+    Enforce the cache's age and size limits (`get_pdf_text_cache_limits` by default).
+
+    Entries not read for `max_age_seconds` are removed first, then the least
+    recently read entries until the cache fits in `max_bytes`. A limit of 0
+    is disabled. Returns how many entries were removed.
+    """
+    default_max_bytes, default_max_age = get_pdf_text_cache_limits()
+    max_bytes = default_max_bytes if max_bytes is None else max_bytes
+    max_age_seconds = default_max_age if max_age_seconds is None else max_age_seconds
+
+    cache_dir = get_pdf_text_cache_dir()
+    now = time.time()
+    entries = []
+    for entry in os.scandir(cache_dir):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if entry.name.endswith(".tmp"):
+            if now - stat.st_mtime > _STALE_TMP_SECONDS:
+                _unlink_quietly(entry.path)
+        elif entry.name.endswith(".txt"):
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        expired = max_age_seconds and now - mtime > max_age_seconds
+        if not expired and not (max_bytes and total_bytes > max_bytes):
+            break
+        if _unlink_quietly(path):
+            total_bytes -= size
+            removed += 1
+    if removed:
+        logger.info("[PDF TEXT CACHE] Pruned %d entries, %d bytes remain", removed, total_bytes)
+    return removed
+
+
+def _maybe_prune() -> None:
+    global _last_prune
+    now = time.monotonic()
+    with _prune_lock:
+        if _last_prune and now - _last_prune < _PRUNE_INTERVAL_SECONDS:
+            return
+        _last_prune = now
+    try:
+        prune_text_cache()
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[PDF TEXT CACHE] Failed to prune the cache: %s", exc)
+
+
+def _unlink_quietly(path: str) -> bool:
+    try:
+        os.unlink(path)
+        return True
+    except OSError:
+        return False
+
+
+class CachedTextWriter:
+    """
+    Incrementally write a cache entry for a PDF content hash.
+
+    Text is appended to a temporary file and only becomes visible under the
+    cache key once `commit()` is called. Entries that are never committed are
+    removed by `discard()`. Like `store_cached_text`, failures are logged and
+    the writer degrades to a no-op.
+    """
+
+    def __init__(self, content_hash: str) -> None:
+        self._content_hash = content_hash
+        self._handle = None
+        self._tmp_path: Optional[str] = None
+        try:
+            fd, self._tmp_path = tempfile.mkstemp(dir=get_pdf_text_cache_dir(), suffix=".tmp")
+            self._handle = os.fdopen(fd, "w", encoding="utf-8")
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("[PDF TEXT CACHE] Failed to open cache entry %s: %s", content_hash, exc)
+            self._discard_tmp()
+
+    def write(self, text: str) -> None:
+        if self._handle is None:
+            return
+        try:
+            self._handle.write(text)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("[PDF TEXT CACHE] Failed to write cache entry %s: %s", self._content_hash, exc)
+            self.discard()
+
+    def commit(self) -> None:
+        if self._handle is None:
+            return
+        try:
+            self._handle.close()
+            self._handle = None
+            os.replace(self._tmp_path, _cache_path(self._content_hash))
+            self._tmp_path = None
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("[PDF TEXT CACHE] Failed to store cache entry %s: %s", self._content_hash, exc)
+            self.discard()
+            return
+        _maybe_prune()
+
+    def discard(self) -> None:
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            except OSError:
+                pass
+            self._handle = None
+        self._discard_tmp()
+
+    def _discard_tmp(self) -> None:
+        if self._tmp_path and os.path.exists(self._tmp_path):
+            try:
+                os.unlink(self._tmp_path)
+            except OSError:
+                pass
+        self._tmp_path = None
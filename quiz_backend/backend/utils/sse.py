@@ -0,0 +1,152 @@
+"""
+Server-Sent Events helpers for the streaming generation and chat endpoints.
+
+A streamed generation emits:
+
+* ``item`` - one question/card as soon as the model has finished writing it.
+  Items are provisional: the merge step may still drop duplicates or trim the
+  list to the requested count.
+* ``done`` - the final, persisted result (the same payload the JSON endpoint
+  returns, including ids).
+* ``error`` - ``{"status_code": ..., "detail": ...}`` if generation or saving failed.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Set, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.database.db import SessionLocal
+from backend.database.sqlite_dal import User
+from backend.utils.generation_executor import run_generation
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+_FINISHED = object()
+# Generations whose client disconnected keep running until their result is saved;
+# the event loop only holds weak references to tasks
+_running_generations: Set[asyncio.Future] = set()
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one SSE message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def sse_error(exc: Exception) -> str:
+    if isinstance(exc, HTTPException):
+        return sse_event("error", {"status_code": exc.status_code, "detail": exc.detail})
+    return sse_event("error", {"status_code": 500, "detail": f"An unexpected error occurred: {str(exc)}"})
+
+
+def persist_for_user(
+    user_id: int,
+    save: Callable[[Session, User, Dict[str, Any], Dict[str, int]], Dict[str, Any]],
+) -> Callable[[Dict[str, Any], Dict[str, int]], Dict[str, Any]]:
+    """
+    Wrap `save(db, user, result, token_usage)` to run in its own session.
+
+    The request's session is closed once a streaming response starts, so
+    results are saved with a fresh session and a freshly loaded user.
+    """
+
+    def persist(result: Dict[str, Any], token_usage: Dict[str, int]) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == user_id).first()
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            payload = save(db, user, result, token_usage)
+            db.commit()
+            return payload
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return persist
+
+
+async def stream_generation(
+    func: Callable[..., Tuple[Dict[str, Any], Dict[str, int]]],
+    *args: Any,
+    item_key: str,
+    persist: Callable[[Dict[str, Any], Dict[str, int]], Dict[str, Any]],
+    **kwargs: Any,
+) -> AsyncIterator[str]:
+    """
+    Run a generation function on the generation executor and stream its items as SSE.
+
+    `func` must accept an `on_item` callback; it is called from the generation
+    threads, so items are handed to the event loop through a queue. Once the
+    generation returns, `persist(result, token_usage)` saves it on a worker
+    thread and its return value is sent as the `done` event. Results served from the generation cache
+    produce no streamed items, so their items are emitted before `done`.
+
+    Generating and saving run as one task that outlives the stream, so a client
+    that disconnects midway still finds the result saved, and its tokens are
+    not spent for nothing.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    name = getattr(func, "__name__", func)
+    listening = True
+
+    def on_item(item: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    async def generate_and_persist() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        result, token_usage = await run_generation(func, *args, on_item=on_item, **kwargs)
+        payload = await run_in_threadpool(persist, result, token_usage)
+        return result, payload
+
+    def finished(task: asyncio.Future) -> None:
+        _running_generations.discard(task)
+        # Items are scheduled on the loop before the result, so the marker always comes last
+        queue.put_nowait(_FINISHED)
+        if not listening and not task.cancelled() and task.exception() is not None:
+            logger.warning("[SSE] Generation %s failed after its client disconnected: %s", name, task.exception())
+
+    task = asyncio.ensure_future(generate_and_persist())
+    _running_generations.add(task)
+    task.add_done_callback(finished)
+
+    try:
+        streamed = 0
+        while True:
+            item = await queue.get()
+            if item is _FINISHED:
+                break
+            streamed += 1
+            yield sse_event("item", item)
+
+        try:
+            result, payload = task.result()
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("[SSE] Streaming generation %s failed: %s", name, exc)
+            yield sse_error(exc)
+            return
+        if not streamed:
+            for item in result.get(item_key) or []:
+                yield sse_event("item", item)
+        yield sse_event("done", payload)
+    finally:
+        if not task.done():
+            logger.info("[SSE] Client disconnected from generation %s; it will be saved when it finishes", name)
+        listening = False
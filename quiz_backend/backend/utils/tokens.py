@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import logging
+import math
+from functools import lru_cache
+from typing import List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when tiktoken is not installed
+_FALLBACK_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: Optional[str]):
+    if tiktoken is None:
+        logger.warning("[TOKENS] tiktoken is not installed; falling back to a character-based token estimate")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("o200k_base")
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as exc:  # pylint: disable=broad-except
+        # tiktoken downloads the BPE file on first use; offline hosts need TIKTOKEN_CACHE_DIR
+        logger.warning(
+            "[TOKENS] Could not load the tiktoken encoding (%s); falling back to a character-based token estimate",
+            exc,
+        )
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens `text` uses for `model`, or estimate them if tiktoken is unavailable."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / _FALLBACK_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> List[str]:
+    """Hard-split text that has no usable boundaries into pieces of at most max_tokens."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        step = max_tokens * _FALLBACK_CHARS_PER_TOKEN
+        return [text[start:start + step] for start in range(0, len(text), step)]
+    token_ids = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(token_ids[start:start + max_tokens]) for start in range(0, len(token_ids), max_tokens)]
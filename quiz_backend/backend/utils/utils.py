@@ -1,169 +1,51 @@
 from __future__ import annotations
 
+import functools
 import logging
 import math
+import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from jinja2 import Template
 from haystack.components.converters import HTMLToDocument
 from haystack.components.fetchers import LinkContentFetcher
 
-from backend.components.custom_components import PDFTextExtractor, QuizParser
-from backend.generation.mcq_quiz_template import QUIZ_GENERATION_PROMPT
-from backend.pipelines.content_pipelines import (
-    LLM_CONFIG,
-    create_generator,
-    pdf_flashcard_generation_pipeline,
-    pdf_essay_qa_generation_pipeline,
-    pdf_mind_map_generation_pipeline,
-    url_flashcard_generation_pipeline,
-    url_essay_qa_generation_pipeline,
+from backend.components.custom_components import (
+    EssayQAParser,
+    FlashcardParser,
+    IncrementalJSONParser,
+    MindMapParser,
+    PDFTextExtractor,
+    QuizParser,
 )
+from backend.generation.essay_qa_template import Essay_QA_PROMPT
+from backend.generation.flashcard_template import FLASHCARD_GENERATION_PROMPT
+from backend.generation.mcq_quiz_template import QUIZ_GENERATION_PROMPT
+from backend.generation.mind_map_template import MIND_MAP_PROMPT
+from backend.services.generation_cache import cached_generation, hash_source_text
+from backend.utils.pdf_text_cache import compute_file_sha256
+from backend.utils.tokens import count_tokens, split_by_tokens
+from backend.pipelines.content_pipelines import LLM_CONFIG, create_generator
 
 logger = logging.getLogger(__name__)
 
+# Receives each question, card or mind map node as soon as the streamed model reply completes it
+ItemCallback = Callable[[Dict[str, Any]], None]
 
-def _extract_token_usage_from_pipeline_result(result: Dict[str, Any], generator_component_name: str = "generator", pipeline_instance=None) -> Dict[str, int]:
-    """
-    Extract token usage from Haystack pipeline result.
-    
-    Haystack doesn't directly expose token usage, but we can try to access it from:
-    1. The generator component's internal state
-    2. Pipeline metadata if tracing is enabled
-    3. The raw OpenAI response if accessible
-    
-    Args:
-        result: The result dictionary from pipeline.run()
-        generator_component_name: Name of the generator component in the pipeline
-        
-    Returns:
-        Dictionary with input_tokens, output_tokens, and total_tokens (all 0 if not found)
-    """
-    try:
-        # Method 1: Try to access the generator component from the pipeline
-        # and get its last response
-        generator_result = result.get(generator_component_name, {})
-        
-        # Method 2: Check if there's metadata in the result
-        # Haystack may store this in different places depending on version
-        metadata = None
-        usage = {}
-        
-        # Try accessing metadata from generator result
-        if hasattr(generator_result, "meta"):
-            metadata = generator_result.meta
-        elif isinstance(generator_result, dict):
-            metadata = generator_result.get("meta")
-            # Also check for direct usage in the result
-            if not metadata and "usage" in generator_result:
-                usage = generator_result.get("usage", {})
-        
-        # Method 3: Check if metadata is in the main result
-        if not metadata and isinstance(result, dict):
-            metadata = result.get("meta")
-            if not usage and "usage" in result:
-                usage = result.get("usage", {})
-        
-        # Extract usage from metadata
-        # Haystack with tracing enabled returns meta as a list of response objects
-        if isinstance(metadata, list) and len(metadata) > 0:
-            # Get the first item (usually the main response)
-            first_meta = metadata[0]
-            if isinstance(first_meta, dict) and "usage" in first_meta:
-                usage = first_meta.get("usage", {})
-            elif hasattr(first_meta, "usage"):
-                usage_obj = first_meta.usage
-                if usage_obj:
-                    usage = {
-                        "prompt_tokens": getattr(usage_obj, "prompt_tokens", 0) or 0,
-                        "completion_tokens": getattr(usage_obj, "completion_tokens", 0) or 0,
-                        "total_tokens": getattr(usage_obj, "total_tokens", 0) or 0,
-                    }
-        elif isinstance(metadata, dict):
-            if not usage:
-                usage = metadata.get("usage", {})
-            # Also check for direct usage keys in metadata
-            if not usage:
-                usage = {k: v for k, v in metadata.items() if "token" in k.lower()}
-        
-        # Method 4: Try to access from generator's internal state via pipeline instance
-        if not usage and pipeline_instance:
-            try:
-                generator_component = pipeline_instance.get_component(generator_component_name)
-                if generator_component:
-                    # Try to access internal OpenAI response
-                    for attr in ["_last_response", "_response", "last_response"]:
-                        if hasattr(generator_component, attr):
-                            response = getattr(generator_component, attr)
-                            if response:
-                                if hasattr(response, "usage"):
-                                    usage_obj = response.usage
-                                    usage = {
-                                        "prompt_tokens": getattr(usage_obj, "prompt_tokens", 0) or 0,
-                                        "completion_tokens": getattr(usage_obj, "completion_tokens", 0) or 0,
-                                        "total_tokens": getattr(usage_obj, "total_tokens", 0) or 0,
-                                    }
-                                    break
-                                elif isinstance(response, dict) and "usage" in response:
-                                    usage = response["usage"]
-                                    break
-            except Exception as e:
-                logger.debug(f"Could not access generator from pipeline: {e}")
-        
-        # Method 5: Log the structure for debugging if still no usage found
-        if not usage:
-            logger.debug(f"Generator result type: {type(generator_result)}, keys: {list(generator_result.keys()) if isinstance(generator_result, dict) else 'N/A'}")
-            logger.debug(f"Result keys: {list(result.keys()) if isinstance(result, dict) else 'N/A'}")
-        
-        # Try to extract token counts from various possible field names
-        input_tokens = (
-            usage.get("prompt_tokens") or 
-            usage.get("input_tokens") or 
-            usage.get("prompt_tokens_used") or
-            0
-        )
-        output_tokens = (
-            usage.get("completion_tokens") or 
-            usage.get("output_tokens") or 
-            usage.get("completion_tokens_used") or
-            0
-        )
-        total_tokens = (
-            usage.get("total_tokens") or 
-            usage.get("total_tokens_used") or
-            (input_tokens + output_tokens)
-        )
-        
-        # Ensure we have integers
-        input_tokens = int(input_tokens) if input_tokens else 0
-        output_tokens = int(output_tokens) if output_tokens else 0
-        total_tokens = int(total_tokens) if total_tokens else (input_tokens + output_tokens)
-        
-        if total_tokens == 0:
-            # Log detailed structure for debugging
-            logger.warning(f"Token usage extraction returned 0. Result structure: {type(result)}")
-            if isinstance(result, dict):
-                logger.warning(f"Result keys: {list(result.keys())}")
-            logger.warning(f"Generator result type: {type(generator_result)}")
-            if isinstance(generator_result, dict):
-                logger.warning(f"Generator result keys: {list(generator_result.keys())}")
-                # Log first few characters of values for debugging
-                for key, value in list(generator_result.items())[:5]:
-                    logger.warning(f"  {key}: {type(value)} - {str(value)[:100] if value else 'None'}")
-        
-        return {
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": total_tokens,
-        }
-    except Exception as e:
-        logger.warning(f"Failed to extract token usage from pipeline result: {e}", exc_info=True)
-        return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
 
-_QUIZ_MAX_INPUT_CHARS = 15000
-_QUIZ_CHUNK_OVERLAP_CHARS = 1000
+_CHUNK_MAX_TOKENS = LLM_CONFIG["chunk_max_tokens"]
+_CHUNK_OVERLAP_TOKENS = LLM_CONFIG["chunk_overlap_tokens"]
+_MIND_MAP_CHUNK_MAX_TOKENS = LLM_CONFIG["mind_map_chunk_max_tokens"]
+# The prompt templates truncate documents at these many characters, so chunks never exceed them
+_CHUNK_MAX_CHARS = 20000
+_MIND_MAP_CHUNK_MAX_CHARS = 60000
+_CHUNK_MAX_WORKERS = 3
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
 _QUIZ_PROMPT_TEMPLATE = Template(QUIZ_GENERATION_PROMPT, trim_blocks=True, lstrip_blocks=True)
+_FLASHCARD_PROMPT_TEMPLATE = Template(FLASHCARD_GENERATION_PROMPT, trim_blocks=True, lstrip_blocks=True)
+_ESSAY_QA_PROMPT_TEMPLATE = Template(Essay_QA_PROMPT, trim_blocks=True, lstrip_blocks=True)
+_MIND_MAP_PROMPT_TEMPLATE = Template(MIND_MAP_PROMPT, trim_blocks=True, lstrip_blocks=True)
 
 
 def generate_quiz(
@@ -171,13 +53,22 @@ def generate_quiz(
     num_questions: Optional[int] = None,
     difficulty: str = "medium",
     feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
     extracted_text = _extract_text_from_url(url)
-    return _generate_quiz_from_text(
-        extracted_text,
-        num_questions=num_questions,
-        difficulty=difficulty,
-        feedback=feedback,
+    return _cached_generation(
+        "quiz",
+        hash_source_text(extracted_text),
+        {"num_questions": num_questions, "difficulty": difficulty},
+        QUIZ_GENERATION_PROMPT,
+        feedback,
+        lambda: _generate_quiz_from_text(
+            extracted_text,
+            num_questions=num_questions,
+            difficulty=difficulty,
+            feedback=feedback,
+            on_item=on_item,
+        ),
     )
 
 
@@ -186,6 +77,7 @@ def generate_quiz_from_pdf(
     num_questions: Optional[int] = None,
     difficulty: str = "medium",
     feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """
     Generate a quiz from a PDF file.
@@ -194,22 +86,58 @@ def generate_quiz_from_pdf(
         pdf_path: Path to the PDF file
         num_questions: Number of questions to generate. If None or <= 0, the model should pick an appropriate count automatically.
         difficulty: Difficulty level of the questions (easy, medium, hard)
+        on_item: Optional callback receiving each question as soon as it has been generated
         
     Returns:
         tuple: (quiz_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
     """
-    extractor = PDFTextExtractor()
-    extraction_result = extractor.run(file_path=pdf_path)
-    extracted_text = extraction_result.get("text", "")
+    # Stream pages into chunks so the first LLM call starts while later pages are still being parsed
+    auto_question_mode = num_questions is None or num_questions <= 0
+    return _cached_generation(
+        "quiz",
+        compute_file_sha256(pdf_path),
+        {"num_questions": num_questions, "difficulty": difficulty},
+        QUIZ_GENERATION_PROMPT,
+        feedback,
+        lambda: _generate_quiz_from_chunks(
+            _iter_pdf_quiz_chunks(pdf_path, None if auto_question_mode else num_questions),
+            num_questions=num_questions,
+            difficulty=difficulty,
+            feedback=feedback,
+            on_item=on_item,
+        ),
+    )
+
+
+def generate_quiz_from_text(
+    source_text: str,
+    num_questions: Optional[int] = None,
+    difficulty: str = "medium",
+    feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Generate a quiz from text that has already been extracted from a source document.
 
-    if not extracted_text.strip():
+    Returns:
+        tuple: (quiz_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
+    """
+    if not source_text or not source_text.strip():
         raise ValueError("No extractable text was found in the provided PDF.")
 
-    return _generate_quiz_from_text(
-        extracted_text,
-        num_questions=num_questions,
-        difficulty=difficulty,
-        feedback=feedback,
+    return _cached_generation(
+        "quiz",
+        hash_source_text(source_text),
+        {"num_questions": num_questions, "difficulty": difficulty},
+        QUIZ_GENERATION_PROMPT,
+        feedback,
+        lambda: _generate_quiz_from_text(
+            source_text,
+            num_questions=num_questions,
+            difficulty=difficulty,
+            feedback=feedback,
+            on_item=on_item,
+        ),
     )
 
 
@@ -217,6 +145,7 @@ def generate_flashcards(
     url: str,
     num_cards: int = 10,
     feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """
     Generate flashcards from a URL.
@@ -224,28 +153,20 @@ def generate_flashcards(
     Args:
         url: The URL to generate flashcards from
         num_cards: Number of flashcards to generate (default: 10)
+        on_item: Optional callback receiving each card as soon as it has been generated
         
     Returns:
         tuple: (flashcard_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
     """
-    result = url_flashcard_generation_pipeline.run(
-        {
-            "link_content_fetcher": {"urls": [url]},
-            "prompt_builder": {
-                "num_cards": num_cards,
-                "feedback": feedback or "",
-            },
-        }
-    )
-    flashcards = result["flashcard_parser"]["flashcards"]
-    token_usage = _extract_token_usage_from_pipeline_result(result, pipeline_instance=url_flashcard_generation_pipeline)
-    return flashcards, token_usage
+    extracted_text = _extract_text_from_url(url)
+    return _cached_flashcards(hash_source_text(extracted_text), extracted_text, num_cards, feedback, on_item)
 
 
 def generate_flashcards_from_pdf(
     pdf_path: str,
     num_cards: int = 10,
     feedback: str | None = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """
     Generate flashcards from a PDF file.
@@ -254,22 +175,31 @@ def generate_flashcards_from_pdf(
         pdf_path: Path to the PDF file
         num_cards: Number of flashcards to generate (default: 10)
         feedback: Optional string that highlights learner weaknesses to prioritize
+        on_item: Optional callback receiving each card as soon as it has been generated
         
     Returns:
         tuple: (flashcard_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
     """
-    result = pdf_flashcard_generation_pipeline.run(
-        {
-            "pdf_extractor": {"file_path": pdf_path},
-            "prompt_builder": {
-                "num_cards": num_cards,
-                "feedback": feedback or "",
-            },
-        }
-    )
-    flashcards = result["flashcard_parser"]["flashcards"]
-    token_usage = _extract_token_usage_from_pipeline_result(result, pipeline_instance=pdf_flashcard_generation_pipeline)
-    return flashcards, token_usage
+    extracted_text = PDFTextExtractor().run(file_path=pdf_path)["text"]
+    return _cached_flashcards(hash_source_text(extracted_text), extracted_text, num_cards, feedback, on_item)
+
+
+def generate_flashcards_from_text(
+    source_text: str,
+    num_cards: int = 10,
+    feedback: str | None = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Generate flashcards from text that has already been extracted from a source document.
+    
+    Returns:
+        tuple: (flashcard_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
+    """
+    if not source_text or not source_text.strip():
+        raise ValueError("No extractable text was found in the provided PDF.")
+
+    return _cached_flashcards(hash_source_text(source_text), source_text, num_cards, feedback, on_item)
 
 
 def generate_essay_qa(
@@ -277,6 +207,7 @@ def generate_essay_qa(
     num_questions: int = 3,
     difficulty: str = "medium",
     feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """
     Generate essay-type questions with detailed answers from a URL.
@@ -285,23 +216,13 @@ def generate_essay_qa(
         url: The URL to generate questions from
         num_questions: Number of questions to generate (default: 3)
         difficulty: Difficulty level of the questions (easy, medium, hard)
+        on_item: Optional callback receiving each question as soon as it has been generated
         
     Returns:
         tuple: (essay_qa_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
     """
-    result = url_essay_qa_generation_pipeline.run(
-        {
-            "link_content_fetcher": {"urls": [url]},
-            "prompt_builder": {
-                "num_questions": num_questions,
-                "difficulty": difficulty,
-                "feedback": feedback or "",
-            },
-        }
-    )
-    essay_qa = result["essay_qa_parser"]["essay_qa"]
-    token_usage = _extract_token_usage_from_pipeline_result(result, pipeline_instance=url_essay_qa_generation_pipeline)
-    return essay_qa, token_usage
+    extracted_text = _extract_text_from_url(url)
+    return _cached_essay_qa(hash_source_text(extracted_text), extracted_text, num_questions, difficulty, feedback, on_item)
 
 
 def generate_essay_qa_from_pdf(
@@ -309,6 +230,7 @@ def generate_essay_qa_from_pdf(
     num_questions: int = 3,
     difficulty: str = "medium",
     feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """
     Generate essay-type questions with detailed answers from a PDF file.
@@ -317,29 +239,39 @@ def generate_essay_qa_from_pdf(
         pdf_path: Path to the PDF file
         num_questions: Number of questions to generate (default: 3)
         difficulty: Difficulty level of the questions (easy, medium, hard)
+        on_item: Optional callback receiving each question as soon as it has been generated
         
     Returns:
         tuple: (essay_qa_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
     """
-    result = pdf_essay_qa_generation_pipeline.run(
-        {
-            "pdf_extractor": {"file_path": pdf_path},
-            "prompt_builder": {
-                "num_questions": num_questions,
-                "difficulty": difficulty,
-                "feedback": feedback or "",
-            },
-        }
-    )
-    essay_qa = result["essay_qa_parser"]["essay_qa"]
-    token_usage = _extract_token_usage_from_pipeline_result(result, pipeline_instance=pdf_essay_qa_generation_pipeline)
-    return essay_qa, token_usage
+    extracted_text = PDFTextExtractor().run(file_path=pdf_path)["text"]
+    return _cached_essay_qa(hash_source_text(extracted_text), extracted_text, num_questions, difficulty, feedback, on_item)
+
+
+def generate_essay_qa_from_text(
+    source_text: str,
+    num_questions: int = 3,
+    difficulty: str = "medium",
+    feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Generate essay-type questions from text that has already been extracted from a source document.
+    
+    Returns:
+        tuple: (essay_qa_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
+    """
+    if not source_text or not source_text.strip():
+        raise ValueError("No extractable text was found in the provided PDF.")
+
+    return _cached_essay_qa(hash_source_text(source_text), source_text, num_questions, difficulty, feedback, on_item)
 
 
 def generate_mind_map_from_pdf(
     pdf_path: str,
     focus: Optional[str] = None,
     feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """
     Generate a structured mind map JSON from a PDF file.
@@ -348,6 +280,7 @@ def generate_mind_map_from_pdf(
         pdf_path: Path to the PDF file.
         focus: Optional hint about what to emphasize.
         feedback: Optional learner feedback context.
+        on_item: Optional callback receiving each node as soon as it has been generated.
         
     Returns:
         tuple: (mind_map_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
@@ -358,36 +291,116 @@ def generate_mind_map_from_pdf(
     if feedback:
         logging.debug("[MIND MAP GEN] Feedback context provided (length: %d chars)", len(feedback) if feedback else 0)
 
-    payload = {
-        "pdf_extractor": {"file_path": pdf_path},
-        # The template currently only uses "focus" in addition to "documents".
-        "prompt_builder": {
-            "focus": focus or "",
-        },
-    }
-    
-    logging.debug("[MIND MAP GEN] Running pipeline with payload keys: %s", list(payload.keys()))
     try:
-        result = pdf_mind_map_generation_pipeline.run(payload)
-        mind_map = result["mind_map_parser"]["mind_map"]
-        token_usage = _extract_token_usage_from_pipeline_result(result, pipeline_instance=pdf_mind_map_generation_pipeline)
-        
-        node_count = len(mind_map.get("nodes", []))
-        edge_count = len(mind_map.get("edges", []))
-        logging.info(
-            "[MIND MAP GEN] Successfully generated mind map: topic='%s', nodes=%d, edges=%d, tokens=%d",
-            mind_map.get("topic", "N/A"),
-            node_count,
-            edge_count,
-            token_usage.get("total_tokens", 0),
-        )
-        
-        return mind_map, token_usage
+        extracted_text = PDFTextExtractor().run(file_path=pdf_path)["text"]
+        return _cached_mind_map(hash_source_text(extracted_text), extracted_text, focus, on_item)
     except Exception as e:
         logging.error("[MIND MAP GEN] Failed to generate mind map from PDF %s: %s", pdf_path, str(e))
         raise
 
 
+def generate_mind_map_from_text(
+    source_text: str,
+    focus: Optional[str] = None,
+    feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Generate a structured mind map JSON from text that has already been extracted.
+
+    Returns:
+        tuple: (mind_map_data, token_usage) where token_usage contains input_tokens, output_tokens, total_tokens
+    """
+    logging.info("[MIND MAP GEN] Starting mind map generation from stored text (%d chars)", len(source_text or ""))
+    if not source_text or not source_text.strip():
+        raise ValueError("No extractable text was found in the provided PDF.")
+
+    return _cached_mind_map(hash_source_text(source_text), source_text, focus, on_item)
+
+
+def _cached_generation(
+    content_type: str,
+    source_hash: str,
+    params: Dict[str, Any],
+    template: str,
+    feedback: Optional[str],
+    generate: Callable[[], Tuple[Dict[str, Any], Dict[str, int]]],
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    # Chunking changes what the model sees, so it is part of the key too
+    params = dict(
+        params,
+        chunk_max_tokens=_CHUNK_MAX_TOKENS,
+        chunk_overlap_tokens=_CHUNK_OVERLAP_TOKENS,
+    )
+    return cached_generation(
+        content_type,
+        source_hash,
+        params,
+        template,
+        LLM_CONFIG["model"],
+        generate,
+        personalized=bool(feedback),
+    )
+
+
+def _cached_flashcards(
+    source_hash: str,
+    source_text: str,
+    num_cards: int,
+    feedback: Optional[str],
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    return _cached_generation(
+        "flashcard",
+        source_hash,
+        {"num_cards": num_cards},
+        FLASHCARD_GENERATION_PROMPT,
+        feedback,
+        lambda: _generate_flashcards_from_text(source_text, num_cards=num_cards, feedback=feedback, on_item=on_item),
+    )
+
+
+def _cached_essay_qa(
+    source_hash: str,
+    source_text: str,
+    num_questions: int,
+    difficulty: str,
+    feedback: Optional[str],
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    return _cached_generation(
+        "essay_qa",
+        source_hash,
+        {"num_questions": num_questions, "difficulty": difficulty},
+        Essay_QA_PROMPT,
+        feedback,
+        lambda: _generate_essay_qa_from_text(
+            source_text,
+            num_questions=num_questions,
+            difficulty=difficulty,
+            feedback=feedback,
+            on_item=on_item,
+        ),
+    )
+
+
+def _cached_mind_map(
+    source_hash: str,
+    source_text: str,
+    focus: Optional[str],
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    # Mind map prompts do not include learner feedback, so every request is cacheable
+    return _cached_generation(
+        "mind_map",
+        source_hash,
+        {"focus": focus or "", "mind_map_chunk_max_tokens": _MIND_MAP_CHUNK_MAX_TOKENS},
+        MIND_MAP_PROMPT,
+        None,
+        lambda: _generate_mind_map_from_text(source_text, focus=focus, on_item=on_item),
+    )
+
+
 def _extract_text_from_url(url: str) -> str:
     fetcher = LinkContentFetcher()
     fetch_result = fetcher.run(urls=[url])
@@ -417,49 +430,44 @@ def _generate_quiz_from_text(
     num_questions: Optional[int],
     difficulty: str,
     feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, int]]:
-    chunks = _chunk_text(source_text, _QUIZ_MAX_INPUT_CHARS, _QUIZ_CHUNK_OVERLAP_CHARS)
-    if not chunks:
-        raise ValueError("Provided content did not contain any usable text segments.")
-
     auto_question_mode = num_questions is None or num_questions <= 0
-    question_targets = (
-        _distribute_question_targets(len(chunks), num_questions)
-        if not auto_question_mode
-        else [None] * len(chunks)
+    chunk_targets = _chunk_targets(source_text, None if auto_question_mode else num_questions)
+    return _generate_quiz_from_chunks(
+        chunk_targets,
+        num_questions=num_questions,
+        difficulty=difficulty,
+        feedback=feedback,
+        max_workers=min(len(chunk_targets), _CHUNK_MAX_WORKERS),
+        on_item=on_item,
     )
 
-    results: Dict[int, Dict[str, Any]] = {}
-    token_usages: List[Dict[str, int]] = []
-    max_workers = min(len(chunks), 3)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(
-                _generate_quiz_for_chunk,
-                index,
-                chunk_text,
-                target if (target and not auto_question_mode) else 0,
-                auto_question_mode,
-                difficulty,
-                feedback,
-            )
-            for index, (chunk_text, target) in enumerate(zip(chunks, question_targets))
-        ]
-
-        for future in as_completed(futures):
-            index, quiz_segment, token_usage = future.result()
-            results[index] = quiz_segment
-            token_usages.append(token_usage)
 
-    if not results:
-        raise ValueError("Quiz generation returned no questions for the provided content.")
-
-    ordered_segments = [results[idx] for idx in sorted(results.keys())]
+def _generate_quiz_from_chunks(
+    chunk_targets: Iterable[Tuple[str, Optional[int]]],
+    num_questions: Optional[int],
+    difficulty: str,
+    feedback: Optional[str] = None,
+    max_workers: int = _CHUNK_MAX_WORKERS,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Generate quiz segments for (chunk_text, question_target) pairs and merge them.
 
-    combined_topic = next((seg.get("topic") for seg in ordered_segments if seg.get("topic")), "Generated Quiz")
-    combined_category = next((seg.get("category") for seg in ordered_segments if seg.get("category")), "General Knowledge")
-    combined_subcategory = next((seg.get("subcategory") for seg in ordered_segments if seg.get("subcategory")), "General")
+    Chunks are submitted as soon as the iterable yields them, so a lazily
+    produced iterable overlaps text extraction with the LLM calls.
+    """
+    auto_question_mode = num_questions is None or num_questions <= 0
+    generate_chunk = functools.partial(
+        _generate_quiz_for_chunk,
+        auto_question_mode=auto_question_mode,
+        difficulty=difficulty,
+        feedback=feedback,
+        on_item=on_item,
+    )
+    segments, token_usage = _map_chunks(chunk_targets, generate_chunk, max_workers=max_workers)
+    ordered_segments = [segment for segment, _ in segments]
 
     combined_questions: List[Dict[str, Any]] = []
     for segment in ordered_segments:
@@ -473,95 +481,576 @@ def _generate_quiz_from_text(
     if not auto_question_mode and num_questions:
         combined_questions = combined_questions[:num_questions]
 
-    # Aggregate token usage from all chunks
-    total_input_tokens = sum(usage.get("input_tokens", 0) for usage in token_usages)
-    total_output_tokens = sum(usage.get("output_tokens", 0) for usage in token_usages)
-    total_tokens = sum(usage.get("total_tokens", 0) for usage in token_usages)
-
     quiz_data = {
-        "topic": combined_topic,
-        "category": combined_category,
-        "subcategory": combined_subcategory,
+        "topic": _first_value(ordered_segments, "topic", "Generated Quiz"),
+        "category": _first_value(ordered_segments, "category", "General Knowledge"),
+        "subcategory": _first_value(ordered_segments, "subcategory", "General"),
         "questions": combined_questions,
     }
-    
-    token_usage = {
-        "input_tokens": total_input_tokens,
-        "output_tokens": total_output_tokens,
-        "total_tokens": total_tokens,
+    return quiz_data, token_usage
+
+
+def _generate_flashcards_from_text(
+    source_text: str,
+    num_cards: int,
+    feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    chunk_targets = _chunk_targets(source_text, num_cards)
+    generate_chunk = functools.partial(_generate_flashcards_for_chunk, feedback=feedback, on_item=on_item)
+    segments, token_usage = _map_chunks(
+        chunk_targets, generate_chunk, max_workers=min(len(chunk_targets), _CHUNK_MAX_WORKERS)
+    )
+    ordered_segments = [segment for segment, _ in segments]
+
+    # The same definition often surfaces in several chunks (and in their overlap)
+    cards_per_chunk = _dedupe_across_segments(
+        [(segment.get("cards") or [], target) for segment, target in segments],
+        key_field="front",
+    )
+    cards = _balance_across_segments(cards_per_chunk, num_cards)
+    if not cards:
+        raise ValueError("Flashcard generation returned no cards for the provided content.")
+
+    flashcards = {
+        "topic": _first_value(ordered_segments, "topic", "Generated Flashcards"),
+        "category": _first_value(ordered_segments, "category", "General Knowledge"),
+        "subcategory": _first_value(ordered_segments, "subcategory", "General"),
+        "cards": cards,
     }
+    return flashcards, token_usage
 
-    return quiz_data, token_usage
 
+def _generate_essay_qa_from_text(
+    source_text: str,
+    num_questions: int,
+    difficulty: str,
+    feedback: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    chunk_targets = _chunk_targets(source_text, num_questions)
+    generate_chunk = functools.partial(
+        _generate_essay_qa_for_chunk, difficulty=difficulty, feedback=feedback, on_item=on_item
+    )
+    segments, token_usage = _map_chunks(
+        chunk_targets, generate_chunk, max_workers=min(len(chunk_targets), _CHUNK_MAX_WORKERS)
+    )
+    ordered_segments = [segment for segment, _ in segments]
+
+    questions_per_chunk = _dedupe_across_segments(
+        [(segment.get("questions") or [], target) for segment, target in segments],
+        key_field="question",
+    )
+    # Each chunk keeps its share of the questions so no part of the document dominates
+    questions = _balance_across_segments(questions_per_chunk, num_questions)
+    if not questions:
+        raise ValueError("Essay question generation returned no questions for the provided content.")
+
+    essay_qa = {
+        "topic": _first_value(ordered_segments, "topic", "Generated Essay Questions"),
+        "category": _first_value(ordered_segments, "category", "General Knowledge"),
+        "subcategory": _first_value(ordered_segments, "subcategory", "General"),
+        "questions": questions,
+    }
+    return essay_qa, token_usage
 
-def _chunk_text(text: str, max_chars: int, overlap: int) -> List[str]:
-    normalized_text = text.strip()
-    if len(normalized_text) <= max_chars:
-        return [normalized_text]
-
-    chunks: List[str] = []
-    start = 0
-    text_length = len(normalized_text)
-
-    while start < text_length:
-        end = min(start + max_chars, text_length)
-        if end < text_length:
-            split_index = max(
-                normalized_text.rfind("\n\n", start, end),
-                normalized_text.rfind(". ", start, end),
-            )
-            if split_index == -1 or split_index <= start + int(max_chars * 0.4):
-                split_index = end
-            else:
-                split_index += 1  # include the sentence-ending character
-            end = split_index
 
-        chunk = normalized_text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
+def _generate_mind_map_from_text(
+    source_text: str,
+    focus: Optional[str] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    chunk_pairs = _chunk_text(
+        source_text,
+        max_tokens=_MIND_MAP_CHUNK_MAX_TOKENS,
+        overlap_tokens=_CHUNK_OVERLAP_TOKENS,
+        max_chars=_MIND_MAP_CHUNK_MAX_CHARS,
+    )
+    if not chunk_pairs:
+        raise ValueError("Provided content did not contain any usable text segments.")
+
+    generate_chunk = functools.partial(_generate_mind_map_for_chunk, focus=focus, on_item=on_item)
+    segments, token_usage = _map_chunks(
+        [(chunk, None) for chunk, _ in chunk_pairs],
+        generate_chunk,
+        max_workers=min(len(chunk_pairs), _CHUNK_MAX_WORKERS),
+    )
+    mind_map = _merge_mind_maps([segment for segment, _ in segments])
+    logging.info(
+        "[MIND MAP GEN] Successfully generated mind map: topic='%s', chunks=%d, nodes=%d, edges=%d, tokens=%d",
+        mind_map.get("topic", "N/A"),
+        len(segments),
+        len(mind_map.get("nodes", [])),
+        len(mind_map.get("edges", [])),
+        token_usage.get("total_tokens", 0),
+    )
+    return mind_map, token_usage
+
+
+def _chunk_targets(source_text: str, total: Optional[int]) -> List[Tuple[str, Optional[int]]]:
+    """Chunk source_text and give each chunk its token-weighted share of `total` items (None: model decides)."""
+    chunk_pairs = _chunk_text(source_text)
+    if not chunk_pairs:
+        raise ValueError("Provided content did not contain any usable text segments.")
+
+    chunks = [chunk for chunk, _ in chunk_pairs]
+    if total is None:
+        return [(chunk, None) for chunk in chunks]
+    targets = _distribute_question_targets(len(chunks), total, weights=[tokens for _, tokens in chunk_pairs])
+    return list(zip(chunks, targets))
+
+
+def _map_chunks(
+    chunk_targets: Iterable[Tuple[str, Optional[int]]],
+    generate_chunk: Callable[[str, Optional[int]], Tuple[Dict[str, Any], Dict[str, int]]],
+    max_workers: int = _CHUNK_MAX_WORKERS,
+) -> Tuple[List[Tuple[Dict[str, Any], Optional[int]]], Dict[str, int]]:
+    """
+    Run generate_chunk(chunk_text, target) for every chunk in parallel.
+
+    Chunks whose target is 0 were left without a share of the requested items
+    and are skipped. Returns the (segment, target) pairs in document order and
+    the summed token usage.
+    """
+    results: Dict[int, Tuple[Dict[str, Any], Optional[int]]] = {}
+    token_usages: List[Dict[str, int]] = []
 
-        if end >= text_length:
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        futures = {
+            executor.submit(generate_chunk, chunk_text, target): (index, target)
+            for index, (chunk_text, target) in enumerate(chunk_targets)
+            if target != 0
+        }
+        if not futures:
+            raise ValueError("Provided content did not contain any usable text segments.")
+
+        for future in as_completed(futures):
+            index, target = futures[future]
+            segment, token_usage = future.result()
+            results[index] = (segment, target)
+            token_usages.append(token_usage)
+
+    token_usage = {
+        "input_tokens": sum(usage.get("input_tokens", 0) for usage in token_usages),
+        "output_tokens": sum(usage.get("output_tokens", 0) for usage in token_usages),
+        "total_tokens": sum(usage.get("total_tokens", 0) for usage in token_usages),
+        "cached_tokens": sum(usage.get("cached_tokens", 0) for usage in token_usages),
+    }
+    return [results[index] for index in sorted(results)], token_usage
+
+
+def _first_value(segments: List[Dict[str, Any]], field: str, default: str) -> str:
+    return next((segment.get(field) for segment in segments if segment.get(field)), default)
+
+
+def _dedupe_key(value: Any) -> str:
+    return re.sub(r"[\W_]+", " ", str(value or "")).strip().casefold()
+
+
+def _dedupe_across_segments(
+    segment_items: List[Tuple[List[Dict[str, Any]], Optional[int]]],
+    key_field: str,
+) -> List[Tuple[List[Dict[str, Any]], Optional[int]]]:
+    """Drop items whose key_field already appeared earlier in the document; the first occurrence wins."""
+    seen = set()
+    deduped = []
+    for items, target in segment_items:
+        kept = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            key = _dedupe_key(item.get(key_field))
+            if key and key in seen:
+                continue
+            seen.add(key)
+            kept.append(item)
+        deduped.append((kept, target))
+    return deduped
+
+
+def _balance_across_segments(
+    segment_items: List[Tuple[List[Dict[str, Any]], Optional[int]]],
+    limit: Optional[int],
+) -> List[Dict[str, Any]]:
+    """
+    Pick at most `limit` items, giving every chunk its target before any chunk
+    contributes extras (round-robin), and return them in document order.
+    """
+    if not limit or limit <= 0:
+        return [item for items, _ in segment_items for item in items]
+
+    taken = [min(len(items), target or 0) for items, target in segment_items]
+    remaining = limit - sum(taken)
+    while remaining > 0:
+        progressed = False
+        for index, (items, _) in enumerate(segment_items):
+            if remaining <= 0:
+                break
+            if taken[index] < len(items):
+                taken[index] += 1
+                remaining -= 1
+                progressed = True
+        if not progressed:
             break
 
-        next_start = max(end - overlap, start + 1)
-        start = next_start
+    selected = [item for (items, _), count in zip(segment_items, taken) for item in items[:count]]
+    return selected[:limit]
+
 
-    return chunks
+def _merge_mind_maps(segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Union per-chunk mind maps into one.
+
+    Nodes are matched by label, so a concept found in several chunks becomes a
+    single node and every chunk's root collapses into the first root. Ids that
+    collide for different concepts are renamed per chunk, and edges, parents
+    and children are rewritten to the surviving ids before being deduplicated.
+    """
+    if len(segments) == 1:
+        return segments[0]
+
+    merged: Dict[str, Any] = {
+        "topic": _first_value(segments, "topic", "Mind Map"),
+        "category": _first_value(segments, "category", "General Knowledge"),
+        "subcategory": _first_value(segments, "subcategory", "General"),
+        "central_idea": _first_value(segments, "central_idea", ""),
+        "summary": _first_value(segments, "summary", ""),
+        "key_concepts": [],
+        "nodes": [],
+        "edges": [],
+        "connections": [],
+        "callouts": [],
+        "recommended_next_steps": [],
+    }
+    nodes_by_id: Dict[str, Dict[str, Any]] = {}
+    ids_by_label: Dict[str, str] = {}
+    root_id: Optional[str] = None
+    edge_keys = set()
+    connection_keys = set()
+    seen_concepts = set()
+    seen_callouts = set()
+    seen_steps = set()
+
+    for chunk_index, segment in enumerate(segments):
+        chunk_nodes = [node for node in segment.get("nodes") or [] if isinstance(node, dict) and node.get("id")]
+        id_map: Dict[str, str] = {}
+        for node in chunk_nodes:
+            node_id = str(node["id"])
+            label_key = _dedupe_key(node.get("label"))
+            is_root = node.get("depth") == 0 or node_id == "root"
+            if is_root and root_id is not None:
+                id_map[node_id] = root_id
+            elif label_key and label_key in ids_by_label:
+                id_map[node_id] = ids_by_label[label_key]
+            else:
+                new_id = node_id if node_id not in nodes_by_id else f"{node_id}-c{chunk_index + 1}"
+                id_map[node_id] = new_id
+                merged_node = dict(node, id=new_id, parents=[], children=[])
+                nodes_by_id[new_id] = merged_node
+                merged["nodes"].append(merged_node)
+                if label_key:
+                    ids_by_label[label_key] = new_id
+                if is_root:
+                    root_id = new_id
+
+        # Relationships are rewritten to merged ids once the whole chunk is mapped
+        for node in chunk_nodes:
+            merged_node = nodes_by_id[id_map[str(node["id"])]]
+            for field in ("parents", "children"):
+                refs = merged_node[field] + [id_map.get(str(ref), ref) for ref in node.get(field) or []]
+                merged_node[field] = [ref for ref in dict.fromkeys(refs) if ref != merged_node["id"]]
+
+        for concept in segment.get("key_concepts") or []:
+            if not isinstance(concept, dict):
+                continue
+            concept_id = str(concept.get("id") or "")
+            if concept_id == "root" and root_id is not None:
+                id_map.setdefault(concept_id, root_id)
+            merged_id = id_map.get(concept_id, concept_id)
+            # Concepts backed by a merged node are deduplicated by that node, the rest by label
+            key = merged_id if merged_id in nodes_by_id else _dedupe_key(concept.get("label"))
+            if key in seen_concepts:
+                continue
+            seen_concepts.add(key)
+            merged["key_concepts"].append(dict(concept, id=merged_id) if concept_id else concept)
+
+        for edge in segment.get("edges") or []:
+            if not isinstance(edge, dict):
+                continue
+            source = id_map.get(str(edge.get("source")), edge.get("source"))
+            target = id_map.get(str(edge.get("target")), edge.get("target"))
+            if source == target or source not in nodes_by_id or target not in nodes_by_id:
+                continue
+            if (source, target) in edge_keys:
+                continue
+            edge_keys.add((source, target))
+            merged["edges"].append(dict(edge, id=f"edge-{len(merged['edges']) + 1}", source=source, target=target))
+
+        for connection in segment.get("connections") or []:
+            if not isinstance(connection, dict):
+                continue
+            source = id_map.get(str(connection.get("source")), connection.get("source"))
+            target = id_map.get(str(connection.get("target")), connection.get("target"))
+            if source == target or (source, target) in connection_keys:
+                continue
+            connection_keys.add((source, target))
+            merged["connections"].append(dict(connection, source=source, target=target))
+
+        for callout in segment.get("callouts") or []:
+            key = _dedupe_key(callout.get("title") if isinstance(callout, dict) else callout)
+            if key not in seen_callouts:
+                seen_callouts.add(key)
+                merged["callouts"].append(callout)
+
+        for step in segment.get("recommended_next_steps") or []:
+            key = _dedupe_key(step)
+            if key not in seen_steps:
+                seen_steps.add(key)
+                merged["recommended_next_steps"].append(step)
+
+    return merged
+
+
+def _chunk_text(
+    text: str,
+    max_tokens: int = _CHUNK_MAX_TOKENS,
+    overlap_tokens: int = _CHUNK_OVERLAP_TOKENS,
+    max_chars: int = _CHUNK_MAX_CHARS,
+) -> List[Tuple[str, int]]:
+    return list(_iter_text_chunks([text], max_tokens, overlap_tokens, max_chars))
+
+
+def _split_segments(paragraph: str, max_tokens: int, max_chars: int) -> List[Tuple[str, int]]:
+    """Break a paragraph into (segment, token_count) pieces that each fit the budget."""
+    paragraph = paragraph.strip()
+    if not paragraph:
+        return []
+    tokens = count_tokens(paragraph, LLM_CONFIG["model"])
+    if tokens <= max_tokens and len(paragraph) <= max_chars:
+        return [(paragraph, tokens)]
+
+    segments: List[Tuple[str, int]] = []
+    for sentence in _SENTENCE_BOUNDARY.split(paragraph):
+        sentence_tokens = count_tokens(sentence, LLM_CONFIG["model"])
+        if sentence_tokens <= max_tokens and len(sentence) <= max_chars:
+            segments.append((sentence, sentence_tokens))
+            continue
+        # No usable boundary left: split on token positions
+        for piece in split_by_tokens(sentence, max_tokens, LLM_CONFIG["model"]):
+            for start in range(0, len(piece), max_chars):
+                part = piece[start:start + max_chars]
+                segments.append((part, count_tokens(part, LLM_CONFIG["model"])))
+    return segments
+
+
+def _iter_text_chunks(
+    pieces: Iterable[str],
+    max_tokens: int,
+    overlap_tokens: int,
+    max_chars: int = _CHUNK_MAX_CHARS,
+) -> Iterator[Tuple[str, int]]:
+    """
+    Pack a stream of text into (chunk_text, token_count) chunks of at most max_tokens.
 
+    Text is split on paragraph boundaries, falling back to sentence boundaries for
+    oversized paragraphs. Whole segments are packed greedily, and each new chunk
+    starts with trailing segments of the previous one worth up to overlap_tokens.
+    Chunks are emitted as soon as they are full, so a lazily produced stream of
+    pages only keeps the current chunk in memory.
+    """
+    current: List[Tuple[str, int]] = []
+    current_tokens = 0
+    current_chars = 0
+    pending = ""
+
+    def _emit() -> Tuple[str, int]:
+        chunk = "\n\n".join(segment for segment, _ in current)
+        return chunk, count_tokens(chunk, LLM_CONFIG["model"])
+
+    def _add(segment: str, tokens: int) -> Iterator[Tuple[str, int]]:
+        nonlocal current, current_tokens, current_chars
+        # +1 token / +2 chars for the paragraph separator
+        if current and (
+            current_tokens + tokens + 1 > max_tokens
+            or current_chars + len(segment) + 2 > max_chars
+        ):
+            yield _emit()
+            overlap: List[Tuple[str, int]] = []
+            overlap_total = 0
+            for previous in reversed(current):
+                if overlap_total + previous[1] > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_total += previous[1]
+            # Never let the overlap crowd out the incoming segment
+            while overlap and (
+                overlap_total + tokens > max_tokens
+                or sum(len(text) + 2 for text, _ in overlap) + len(segment) > max_chars
+            ):
+                overlap_total -= overlap.pop(0)[1]
+            current = overlap
+            current_tokens = sum(t for _, t in current) + max(len(current) - 1, 0)
+            current_chars = sum(len(text) + 2 for text, _ in current)
+        current.append((segment, tokens))
+        current_tokens += tokens + (1 if len(current) > 1 else 0)
+        current_chars += len(segment) + 2
+
+    for piece in pieces:
+        if not piece:
+            continue
+        pending += piece
+        # Everything before the last paragraph break is complete
+        boundary = pending.rfind("\n\n")
+        if boundary == -1:
+            continue
+        complete, pending = pending[:boundary], pending[boundary + 2:]
+        for paragraph in complete.split("\n\n"):
+            for segment, tokens in _split_segments(paragraph, max_tokens, max_chars):
+                yield from _add(segment, tokens)
+
+    for paragraph in pending.split("\n\n"):
+        for segment, tokens in _split_segments(paragraph, max_tokens, max_chars):
+            yield from _add(segment, tokens)
+
+    if current:
+        yield _emit()
+
+
+def _iter_pdf_quiz_chunks(pdf_path: str, num_questions: Optional[int]) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    Stream (chunk_text, question_target) pairs for a PDF as its pages are parsed.
+
+    While pages are still being read the document's total size is unknown, so
+    each chunk's share of num_questions is its length over the estimated text
+    still to come, extrapolated from the pages read so far. Fractions carry over
+    to the next chunks. Once the last page is in (immediately on a text cache
+    hit), the chunks left are packed without further I/O and split whatever
+    remains by token count, so the targets always add up to num_questions.
+    """
+    progress = {"pages_read": 0, "page_count": 0, "chars_read": 0}
+
+    def _pages() -> Iterator[str]:
+        for pages_read, page_count, page_text in PDFTextExtractor().iter_pages(pdf_path):
+            progress["pages_read"] = pages_read
+            progress["page_count"] = page_count
+            progress["chars_read"] += len(page_text)
+            yield page_text
+        # Trailing pages without text are never yielded
+        progress["pages_read"] = progress["page_count"]
+
+    remaining = num_questions or 0
+    owed = 0.0  # Allocated to chunks already yielded but not handed out yet
+    chars_seen = 0
+    chunks = _iter_text_chunks(_pages(), _CHUNK_MAX_TOKENS, _CHUNK_OVERLAP_TOKENS)
+    for chunk, chunk_tokens in chunks:
+        if not num_questions:
+            yield chunk, None
+            continue
+
+        if progress["pages_read"] >= progress["page_count"]:
+            tail = [(chunk, chunk_tokens), *chunks]
+            targets = _distribute_question_targets(len(tail), remaining, [tokens for _, tokens in tail])
+            for (tail_chunk, _), target in zip(tail, targets):
+                yield tail_chunk, target
+            return
+
+        chars_before = chars_seen
+        chars_seen += len(chunk)
+        estimated_total = max(
+            chars_seen,
+            progress["chars_read"] * progress["page_count"] / max(progress["pages_read"], 1),
+        )
+        owed += (remaining - owed) * len(chunk) / max(estimated_total - chars_before, len(chunk), 1)
+        target = min(remaining, math.floor(owed))
+        owed -= target
+        remaining -= target
+        yield chunk, target
+
+
+def _distribute_question_targets(
+    chunk_count: int,
+    total_questions: Optional[int],
+    weights: Optional[List[int]] = None,
+) -> List[int]:
+    """
+    Split total_questions across chunks in proportion to their weights (token counts).
 
-def _distribute_question_targets(chunk_count: int, total_questions: Optional[int]) -> List[int]:
+    Every chunk gets at least one question while there are enough to go around;
+    the rest is allocated by largest remainder. Without weights chunks count equally.
+    """
     if not total_questions or total_questions <= 0 or chunk_count <= 0:
         return [0] * max(chunk_count, 1)
 
-    remaining = total_questions
-    remaining_chunks = chunk_count
-    targets: List[int] = []
+    weights = [max(weight, 1) for weight in (weights or [1] * chunk_count)]
+    if total_questions <= chunk_count:
+        # Not enough for every chunk: favour the largest chunks, in document order on ties
+        ranked = sorted(range(chunk_count), key=lambda index: (-weights[index], index))
+        selected = set(ranked[:total_questions])
+        return [1 if index in selected else 0 for index in range(chunk_count)]
+
+    extra = total_questions - chunk_count
+    total_weight = sum(weights)
+    shares = [extra * weight / total_weight for weight in weights]
+    targets = [1 + math.floor(share) for share in shares]
+    leftover = total_questions - sum(targets)
+    by_remainder = sorted(range(chunk_count), key=lambda index: (-(shares[index] - math.floor(shares[index])), index))
+    for index in by_remainder[:leftover]:
+        targets[index] += 1
+    return targets
+
 
-    for _ in range(chunk_count):
-        chunk_target = max(1, math.ceil(remaining / remaining_chunks))
-        targets.append(chunk_target)
-        remaining -= chunk_target
-        remaining_chunks -= 1
-        if remaining <= 0:
-            break
+def _run_chunk_prompt(
+    template: Template,
+    prompt_inputs: Dict[str, Any],
+    temperature: float,
+    parser: Any,
+    output_key: str,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    prompt = template.render(**prompt_inputs)
+    json_parser = IncrementalJSONParser(parser.ITEM_KEYS, on_item, top_level_items=parser.TOP_LEVEL_ITEMS)
+    streaming_callback = None
+    if on_item is not None:
+        streaming_callback = lambda chunk: json_parser.feed(chunk.content)
+    generator = create_generator(temperature=temperature, streaming_callback=streaming_callback)
+
+    generator_result = generator.run(prompt=prompt)
+    replies = generator_result["replies"]
+    if streaming_callback is None:
+        json_parser.feed(replies[0] if replies else "")
+    # The reply has already been scanned while streaming, so it is not parsed twice
+    segment = parser.build(json_parser.finish())[output_key]
+    
+    # Extract token usage - try multiple methods
+    token_usage = _extract_token_usage_from_generator_result(generator_result)
+    
+    # If not found in result, try to access generator's internal state
+    if token_usage["total_tokens"] == 0:
+        token_usage = _extract_token_usage_from_generator_instance(generator)
 
-    # If we exited early because remaining <= 0, pad the rest with zeros
-    while len(targets) < chunk_count:
-        targets.append(0)
+    # Streamed replies carry no usage block, so fall back to counting locally
+    if token_usage["total_tokens"] == 0 and streaming_callback is not None:
+        input_tokens = count_tokens(prompt)
+        output_tokens = sum(count_tokens(reply) for reply in replies)
+        token_usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "cached_tokens": 0,
+        }
 
-    return targets
+    return segment, token_usage
 
 
 def _generate_quiz_for_chunk(
-    index: int,
     chunk_text: str,
-    chunk_target: int,
+    chunk_target: Optional[int],
     auto_question_mode: bool,
     difficulty: str,
     feedback: Optional[str],
-) -> Tuple[int, Dict[str, Any], Dict[str, int]]:
-    logger.debug("Submitting quiz generation for chunk %s (length=%s characters)", index + 1, len(chunk_text))
-
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    logger.debug("Submitting quiz generation for chunk (length=%s characters)", len(chunk_text))
     prompt_inputs = {
         "documents": chunk_text,
         "num_questions": chunk_target if (chunk_target and not auto_question_mode) else 0,
@@ -569,23 +1058,95 @@ def _generate_quiz_for_chunk(
         "difficulty": difficulty,
         "feedback": feedback or "",
     }
-    prompt = _QUIZ_PROMPT_TEMPLATE.render(**prompt_inputs)
+    return _run_chunk_prompt(
+        _QUIZ_PROMPT_TEMPLATE,
+        prompt_inputs,
+        LLM_CONFIG["quiz_temperature"],
+        QuizParser(),
+        "quiz",
+        on_item=on_item,
+    )
 
-    generator = create_generator(temperature=LLM_CONFIG["quiz_temperature"])
-    parser = QuizParser()
 
-    generator_result = generator.run(prompt=prompt)
-    replies = generator_result["replies"]
-    quiz_segment = parser.run(replies=replies)["quiz"]
-    
-    # Extract token usage - try multiple methods
-    token_usage = _extract_token_usage_from_generator_result(generator_result)
-    
-    # If not found in result, try to access generator's internal state
-    if token_usage["total_tokens"] == 0:
-        token_usage = _extract_token_usage_from_generator_instance(generator)
+def _generate_flashcards_for_chunk(
+    chunk_text: str,
+    chunk_target: Optional[int],
+    feedback: Optional[str],
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    logger.debug("Submitting flashcard generation for chunk (length=%s characters)", len(chunk_text))
+    prompt_inputs = {
+        "documents": chunk_text,
+        "num_cards": chunk_target,
+        "feedback": feedback or "",
+    }
+    return _run_chunk_prompt(
+        _FLASHCARD_PROMPT_TEMPLATE,
+        prompt_inputs,
+        LLM_CONFIG["flashcard_temperature"],
+        FlashcardParser(),
+        "flashcards",
+        on_item=on_item,
+    )
+
 
-    return index, quiz_segment, token_usage
+def _generate_essay_qa_for_chunk(
+    chunk_text: str,
+    chunk_target: Optional[int],
+    difficulty: str,
+    feedback: Optional[str],
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    logger.debug("Submitting essay QA generation for chunk (length=%s characters)", len(chunk_text))
+    prompt_inputs = {
+        "documents": chunk_text,
+        "num_questions": chunk_target,
+        "difficulty": difficulty,
+        "feedback": feedback or "",
+    }
+    return _run_chunk_prompt(
+        _ESSAY_QA_PROMPT_TEMPLATE,
+        prompt_inputs,
+        LLM_CONFIG["essay_qa_temperature"],
+        EssayQAParser(),
+        "essay_qa",
+        on_item=on_item,
+    )
+
+
+def _generate_mind_map_for_chunk(
+    chunk_text: str,
+    chunk_target: Optional[int],
+    focus: Optional[str],
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    logger.debug("Submitting mind map generation for chunk (length=%s characters)", len(chunk_text))
+    prompt_inputs = {
+        "documents": chunk_text,
+        "focus": focus or "",
+    }
+    return _run_chunk_prompt(
+        _MIND_MAP_PROMPT_TEMPLATE,
+        prompt_inputs,
+        LLM_CONFIG["mind_map_temperature"],
+        MindMapParser(),
+        "mind_map",
+        on_item=on_item,
+    )
+
+
+def _extract_cached_tokens(usage: Any) -> int:
+    """Prompt tokens the provider served from its prompt cache (`prompt_tokens_details.cached_tokens`)."""
+    if not usage:
+        return 0
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    if not details:
+        return 0
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    try:
+        return int(cached or 0)
+    except (TypeError, ValueError):
+        return 0
 
 
 def _extract_token_usage_from_generator_instance(generator) -> Dict[str, int]:
@@ -615,6 +1176,7 @@ def _extract_token_usage_from_generator_instance(generator) -> Dict[str, int]:
                                 "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
                                 "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
                                 "total_tokens": getattr(usage, "total_tokens", 0) or 0,
+                                "cached_tokens": _extract_cached_tokens(usage),
                             }
                     # Also try if response is a dict
                     if isinstance(response, dict):
@@ -624,6 +1186,7 @@ def _extract_token_usage_from_generator_instance(generator) -> Dict[str, int]:
                                 "input_tokens": usage.get("prompt_tokens", 0) or usage.get("input_tokens", 0) or 0,
                                 "output_tokens": usage.get("completion_tokens", 0) or usage.get("output_tokens", 0) or 0,
                                 "total_tokens": usage.get("total_tokens", 0) or 0,
+                                "cached_tokens": _extract_cached_tokens(usage),
                             }
         
         # Try accessing the OpenAI client's last response
@@ -640,11 +1203,12 @@ def _extract_token_usage_from_generator_instance(generator) -> Dict[str, int]:
                                 "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
                                 "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
                                 "total_tokens": getattr(usage, "total_tokens", 0) or 0,
+                                "cached_tokens": _extract_cached_tokens(usage),
                             }
     except Exception as e:
         logger.debug(f"Failed to extract token usage from generator instance: {e}")
     
-    return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
 
 
 def _extract_token_usage_from_generator_result(generator_result: Dict[str, Any]) -> Dict[str, int]:
@@ -682,6 +1246,7 @@ def _extract_token_usage_from_generator_result(generator_result: Dict[str, Any])
                         "prompt_tokens": getattr(usage_obj, "prompt_tokens", 0) or 0,
                         "completion_tokens": getattr(usage_obj, "completion_tokens", 0) or 0,
                         "total_tokens": getattr(usage_obj, "total_tokens", 0) or 0,
+                        "prompt_tokens_details": getattr(usage_obj, "prompt_tokens_details", None),
                     }
         # Handle meta as a dict (fallback)
         elif isinstance(metadata, dict):
@@ -729,7 +1294,8 @@ def _extract_token_usage_from_generator_result(generator_result: Dict[str, Any])
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
             "total_tokens": total_tokens,
+            "cached_tokens": _extract_cached_tokens(usage),
         }
     except Exception as e:
         logger.warning(f"Failed to extract token usage from generator result: {e}", exc_info=True)
-        return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        return {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
@@ -0,0 +1,75 @@
+"""
+Standalone generation queue worker.
+
+Claims pending quiz, essay and mind map jobs from the `generation_jobs` table
+and runs them outside the API process, so generation capacity can be scaled
+separately from the web workers:
+
+    python -m backend.worker --concurrency 4
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from backend.api_routers.routers.student_project_router import GENERATION_JOB_PROCESSORS  # noqa: E402
+from backend.components.custom_components import shutdown_extraction_pool  # noqa: E402
+from backend.services.job_queue import JOB_LEASE_SECONDS, start_worker_threads  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run generation queue workers")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("GENERATION_WORKER_CONCURRENCY", "2")),
+        help="Number of jobs processed in parallel by this process",
+    )
+    parser.add_argument(
+        "--job-types",
+        default=",".join(GENERATION_JOB_PROCESSORS),
+        help="Comma-separated job types to handle (default: all)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(threadName)s %(message)s",
+    )
+
+    job_types = {job_type.strip() for job_type in args.job_types.split(",") if job_type.strip()}
+    processors = {
+        job_type: processor
+        for job_type, processor in GENERATION_JOB_PROCESSORS.items()
+        if job_type in job_types
+    }
+    if not processors:
+        raise SystemExit(f"No known job types in --job-types={args.job_types!r}")
+
+    workers = start_worker_threads(processors, max(1, args.concurrency))
+    shutdown = threading.Event()
+
+    def _handle_signal(signum, _frame) -> None:
+        logging.info("[WORKER] Received signal %s, finishing in-flight jobs", signum)
+        for worker in workers:
+            worker.stop()
+        shutdown.set()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    shutdown.wait()
+    # Jobs still running after this are released when their lease expires
+    for worker in workers:
+        worker.thread.join(timeout=JOB_LEASE_SECONDS)
+    shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the rate limiting middleware's per-request overhead.
+
+Drives a small FastAPI app directly over ASGI (no server, no sockets) with
+no rate limiting, with the previous `BaseHTTPMiddleware`-based middleware and
+with the current ASGI `RateLimitMiddleware`, and prints the mean time per
+request of each. Both middlewares use the same in-memory limiter with a
+limit high enough that every request is allowed, so the difference is the
+middleware plumbing itself.
+
+    python benchmark_rate_limit.py --requests 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from backend.middleware.rate_limit import InMemoryRateLimiter, RateLimitMiddleware
+
+
+class _UnlimitedRateLimiter(InMemoryRateLimiter):
+    def _get_limit_config(self, path: str) -> tuple[int, int]:
+        return (10**9, 60)
+
+
+class BaseHTTPRateLimitMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware-based middleware, running the same checks"""
+
+    def __init__(self, app, limiter: InMemoryRateLimiter):
+        super().__init__(app)
+        self.checker = RateLimitMiddleware(app, limiter)
+
+    async def dispatch(self, request: Request, call_next):
+        decision = await self.checker._check(request)
+        if decision is None:
+            return await call_next(request)
+        allowed, remaining, reset_after, limit = decision
+        response = await call_next(request) if allowed else self.checker._rate_limit_response(reset_after)
+        response.headers["X-RateLimit-Limit"] = str(limit)
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + reset_after)
+        return response
+
+
+def _build_app(middleware: type | None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/quiz/{topic_id}")
+    async def get_quiz(topic_id: int):
+        return {"id": topic_id, "topic": "Benchmark"}
+
+    @app.get("/pdf")
+    async def get_pdf():
+        async def chunks():
+            for _ in range(16):
+                yield b"x" * 4096
+
+        return StreamingResponse(chunks(), media_type="application/pdf")
+
+    if middleware is not None:
+        app.add_middleware(middleware, limiter=_UnlimitedRateLimiter(sweep_interval=0))
+    return app
+
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+
+
+async def _request(app: FastAPI, path: str) -> None:
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # Like a server whose client stays connected: block until cancelled
+            await asyncio.Future()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message["status"]
+
+    await app(_scope(path), receive, send)
+
+
+async def _time_per_request(app: FastAPI, path: str, requests: int) -> float:
+    for index in range(min(500, requests)):
+        await _request(app, path.format(index=index))
+    start = time.perf_counter()
+    for index in range(requests):
+        await _request(app, path.format(index=index))
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(requests: int) -> None:
+    variants = [
+        ("no rate limiting", None),
+        ("BaseHTTPMiddleware", BaseHTTPRateLimitMiddleware),
+        ("ASGI middleware", RateLimitMiddleware),
+    ]
+    for label, path in [("JSON route", "/quiz/{index}"), ("streaming route", "/pdf")]:
+        print(f"{label} ({requests} requests)")
+        baseline = None
+        for name, middleware in variants:
+            per_request = await _time_per_request(_build_app(middleware), path, requests)
+            if baseline is None:
+                baseline = per_request
+                print(f"  {name:<20} {per_request:8.1f} us/request")
+            else:
+                print(f"  {name:<20} {per_request:8.1f} us/request  (+{per_request - baseline:.1f} us)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10000, help="timed requests per variant")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -80,6 +80,12 @@ PY
 echo "🚀 Running database migrations..."
 python run_migration.py
 
+# `./start.sh worker` runs a standalone generation queue worker instead of the API server
+if [ "$1" = "worker" ]; then
+    echo "✅ Starting generation queue worker..."
+    exec python -m backend.worker
+fi
+
 # Use Railway's PORT environment variable if available, otherwise default to 8000
 PORT=${PORT:-8000}
 
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The backend is imported as the top-level `backend` package, as when running the API
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# content_pipelines refuses to import without a key; no test calls the API
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
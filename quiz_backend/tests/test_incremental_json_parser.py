@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from backend.components.custom_components import (
+    FlashcardParser,
+    IncrementalJSONParser,
+    QuizParser,
+    parse_json_reply,
+)
+
+QUIZ = {
+    "topic": "Cells",
+    "questions": [
+        {"question": "What is the powerhouse of the cell?", "options": ["Nucleus", "Mitochondria"], "answer": 1},
+        {"question": "What holds the DNA?", "options": ["Nucleus", "Ribosome"], "answer": 0},
+    ],
+}
+
+
+def _stream(reply: str, size: int, **kwargs) -> tuple:
+    items = []
+    parser = IncrementalJSONParser(on_item=items.append, **kwargs)
+    for start in range(0, len(reply), size):
+        parser.feed(reply[start:start + size])
+    return parser.finish(), items
+
+
+@pytest.mark.parametrize(
+    "prose",
+    [
+        "Here [is] the quiz: ",
+        "See section [1] of the notes. {Note: answers below} ",
+        "Quiz (based on [the PDF], [2]):\n```json\n",
+    ],
+)
+def test_quiz_parser_skips_bracketed_prose_before_the_json(prose):
+    assert QuizParser().run([prose + json.dumps(QUIZ)]) == {"quiz": QUIZ}
+
+
+@pytest.mark.parametrize("size", [1, 7, 1000])
+def test_streamed_items_after_bracketed_prose(size):
+    reply = "Here [is] the quiz: " + json.dumps(QUIZ) + "\n[end]"
+
+    document, items = _stream(reply, size, item_keys=("questions",), top_level_items=False)
+
+    assert document == QUIZ
+    assert items == QUIZ["questions"]
+
+
+def test_flashcard_parser_skips_bracketed_prose_before_a_top_level_array():
+    cards = [{"front": "ATP", "back": "Energy currency of the cell"}]
+
+    assert FlashcardParser().run(["Cards [2 of 2]: " + json.dumps(cards)])["flashcards"]["cards"] == cards
+
+
+def test_bracketed_prose_alone_is_still_returned():
+    assert parse_json_reply("Sorry, [] no cards") == []
+
+
+def test_truncated_reply_after_bracketed_prose_keeps_complete_items():
+    reply = "Here [is] the quiz: " + json.dumps(QUIZ)
+    cut = reply.index('{"question": "What holds')
+
+    document, items = _stream(reply[:cut + 20], 5, item_keys=("questions",), top_level_items=False)
+
+    assert document["questions"][0] == QUIZ["questions"][0]
+    assert items[0] == QUIZ["questions"][0]
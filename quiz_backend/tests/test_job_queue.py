@@ -0,0 +1,337 @@
+import datetime
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database.sqlite_dal import Base, GenerationJob
+from backend.services import job_queue, job_scheduler
+from backend.services.job_queue import JobLease, LeaseLostError
+
+
+def _limits(global_concurrency=10, free_cap=5, pro_cap=5):
+    return {
+        "global_concurrency": global_concurrency,
+        "tiers": {
+            "free_tier": {"concurrent_generations": free_cap, "queue_weight": 1},
+            "pro_tier": {"concurrent_generations": pro_cap, "queue_weight": 3},
+        },
+    }
+
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    # A file database, so concurrent claims really contend for SQLite's write lock
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(job_queue, "SessionLocal", session_factory)
+    monkeypatch.setattr(job_scheduler, "get_generation_queue_limits", lambda: _limits())
+    yield session_factory
+    engine.dispose()
+
+
+def _add_job(Session, user_id="user-a", created_offset=0, **values):
+    now = datetime.datetime.now()
+    fields = {
+        "user_id": user_id,
+        "project_id": 1,
+        "job_type": "quiz",
+        "status": "pending",
+        "attempts": 0,
+        "max_attempts": 3,
+        "available_at": now - datetime.timedelta(seconds=1),
+        "created_at": now + datetime.timedelta(seconds=created_offset),
+    }
+    fields.update(values)
+    with Session() as session:
+        job = GenerationJob(**fields)
+        session.add(job)
+        session.commit()
+        return job.id
+
+
+def _job(Session, job_id):
+    with Session() as session:
+        return session.query(GenerationJob).filter(GenerationJob.id == job_id).one()
+
+
+def _claim(Session, worker_id):
+    with Session() as session:
+        return job_queue.claim_next_job(session, worker_id)
+
+
+def _expire_lease(Session, job_id):
+    with Session() as session:
+        job = session.query(GenerationJob).filter(GenerationJob.id == job_id).one()
+        job.lease_expires_at = datetime.datetime.now() - datetime.timedelta(seconds=1)
+        session.commit()
+
+
+def test_concurrent_claims_have_one_winner(Session):
+    job_id = _add_job(Session)
+    workers = 8
+    barrier = threading.Barrier(workers)
+    results = []
+
+    def claim(worker_id):
+        barrier.wait()
+        results.append((worker_id, _claim(Session, worker_id)))
+
+    threads = [threading.Thread(target=claim, args=(f"worker-{index}",)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [worker_id for worker_id, claimed in results if claimed is not None]
+    assert len(results) == workers
+    assert len(winners) == 1
+    job = _job(Session, job_id)
+    assert job.status == "in_progress"
+    assert job.locked_by == winners[0]
+    assert job.attempts == 1
+
+
+def test_expired_lease_is_reclaimed(Session):
+    now = datetime.datetime.now()
+    held_id = _add_job(
+        Session,
+        status="in_progress",
+        locked_by="alive",
+        attempts=1,
+        lease_expires_at=now + datetime.timedelta(minutes=5),
+    )
+    expired_id = _add_job(
+        Session,
+        user_id="user-b",
+        status="in_progress",
+        locked_by="dead",
+        attempts=1,
+        lease_expires_at=now - datetime.timedelta(seconds=1),
+    )
+
+    assert _claim(Session, "worker-2") == expired_id
+    assert _claim(Session, "worker-3") is None
+
+    job = _job(Session, expired_id)
+    assert job.locked_by == "worker-2"
+    assert job.attempts == 2
+    assert job.lease_expires_at > now
+    assert _job(Session, held_id).locked_by == "alive"
+
+
+def test_finish_job_completes_held_job(Session):
+    job_id = _add_job(Session)
+    assert _claim(Session, "worker-1") == job_id
+
+    with Session() as session:
+        job_queue.finish_job(session, JobLease(job_id, "worker-1"), "completed", result_topic_id=42)
+
+    job = _job(Session, job_id)
+    assert job.status == "completed"
+    assert job.result_topic_id == 42
+    assert job.locked_by is None
+    assert job.lease_expires_at is None
+    assert job.completed_at is not None
+
+
+def test_stale_worker_cannot_finish_reclaimed_job(Session):
+    job_id = _add_job(Session)
+    assert _claim(Session, "worker-1") == job_id
+    _expire_lease(Session, job_id)
+    assert _claim(Session, "worker-2") == job_id
+
+    with Session() as session:
+        # Stands in for the content and token charge written by the stale attempt
+        session.add(GenerationJob(user_id="user-a", project_id=1, job_type="essay", status="completed"))
+        with pytest.raises(LeaseLostError):
+            job_queue.finish_job(session, JobLease(job_id, "worker-1"), "completed", result_topic_id=42)
+
+    with Session() as session:
+        assert session.query(GenerationJob).count() == 1
+    job = _job(Session, job_id)
+    assert job.status == "in_progress"
+    assert job.locked_by == "worker-2"
+    assert job.result_topic_id is None
+
+
+def test_transient_failure_is_retried_with_backoff(Session):
+    job_id = _add_job(Session)
+    assert _claim(Session, "worker-1") == job_id
+
+    with Session() as session:
+        job_queue.mark_job_failed_or_retry(session, JobLease(job_id, "worker-1"), RuntimeError("timeout"))
+
+    job = _job(Session, job_id)
+    assert job.status == "pending"
+    assert job.error_message == "timeout"
+    assert job.locked_by is None
+    assert job.available_at > datetime.datetime.now()
+    assert job.completed_at is None
+    # Not claimable again until the backoff has passed
+    assert _claim(Session, "worker-2") is None
+
+
+def test_last_attempt_fails(Session):
+    job_id = _add_job(Session, max_attempts=1)
+    assert _claim(Session, "worker-1") == job_id
+
+    with Session() as session:
+        job_queue.mark_job_failed_or_retry(session, JobLease(job_id, "worker-1"), RuntimeError("timeout"))
+
+    job = _job(Session, job_id)
+    assert job.status == "failed"
+    assert job.completed_at is not None
+
+
+def test_content_error_fails_without_retry(Session):
+    job_id = _add_job(Session)
+    assert _claim(Session, "worker-1") == job_id
+
+    with Session() as session:
+        job_queue.mark_job_failed_or_retry(session, JobLease(job_id, "worker-1"), ValueError("no text"))
+
+    assert _job(Session, job_id).status == "failed"
+
+
+def test_stale_worker_failure_does_not_reset_reclaimed_job(Session):
+    job_id = _add_job(Session)
+    assert _claim(Session, "worker-1") == job_id
+    _expire_lease(Session, job_id)
+    assert _claim(Session, "worker-2") == job_id
+
+    with Session() as session:
+        job_queue.mark_job_failed_or_retry(session, JobLease(job_id, "worker-1"), RuntimeError("timeout"))
+
+    job = _job(Session, job_id)
+    assert job.status == "in_progress"
+    assert job.locked_by == "worker-2"
+    assert job.error_message is None
+
+
+def test_exhausted_job_is_failed_when_reclaimed(Session):
+    job_id = _add_job(
+        Session,
+        status="in_progress",
+        locked_by="dead",
+        attempts=3,
+        error_message="worker killed",
+        lease_expires_at=datetime.datetime.now() - datetime.timedelta(seconds=1),
+    )
+    assert _claim(Session, "worker-1") == job_id
+
+    assert job_queue._fail_exhausted_job(JobLease(job_id, "worker-1"))
+
+    job = _job(Session, job_id)
+    assert job.status == "failed"
+    assert job.error_message == "worker killed"
+    assert job.locked_by is None
+
+
+def test_job_with_attempts_left_is_not_exhausted(Session):
+    job_id = _add_job(Session)
+    assert _claim(Session, "worker-1") == job_id
+
+    assert not job_queue._fail_exhausted_job(JobLease(job_id, "worker-1"))
+    assert _job(Session, job_id).status == "in_progress"
+
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(job_queue, "JOB_RETRY_MAX_SECONDS", 60)
+
+    for attempts, ceiling in ((1, 10), (2, 20), (3, 40), (4, 60), (8, 60)):
+        for _ in range(20):
+            assert ceiling / 2 <= job_queue.retry_delay_seconds(attempts) <= ceiling
+
+
+def test_heartbeat_reports_lease_lost_once_renewals_fail_past_expiry(monkeypatch):
+    def failing_renewal(job_id, worker_id):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 3)
+    monkeypatch.setattr(job_queue, "renew_lease", failing_renewal)
+    lease = JobLease(1, "worker-1")
+
+    with job_queue._LeaseHeartbeat(lease, datetime.datetime.now()):
+        assert lease.lost.wait(timeout=5)
+    with pytest.raises(LeaseLostError):
+        lease.check()
+
+
+def test_heartbeat_tolerates_failed_renewals_before_expiry(monkeypatch):
+    def failing_renewal(job_id, worker_id):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 3)
+    monkeypatch.setattr(job_queue, "renew_lease", failing_renewal)
+    lease = JobLease(1, "worker-1")
+
+    with job_queue._LeaseHeartbeat(lease, datetime.datetime.now() + datetime.timedelta(minutes=5)):
+        assert not lease.lost.wait(timeout=1.5)
+
+
+def test_per_user_cap_is_respected(Session, monkeypatch):
+    monkeypatch.setattr(job_scheduler, "get_generation_queue_limits", lambda: _limits(free_cap=1))
+    first_a = _add_job(Session, "user-a", created_offset=0)
+    _add_job(Session, "user-a", created_offset=1)
+    first_b = _add_job(Session, "user-b", created_offset=2)
+
+    assert _claim(Session, "worker-1") == first_a
+    assert _claim(Session, "worker-2") == first_b
+    # user-a already runs its one allowed job
+    assert _claim(Session, "worker-3") is None
+
+
+def test_global_cap_is_respected(Session, monkeypatch):
+    monkeypatch.setattr(job_scheduler, "get_generation_queue_limits", lambda: _limits(global_concurrency=2))
+    for index in range(3):
+        _add_job(Session, f"user-{index}", created_offset=index)
+
+    assert _claim(Session, "worker-1") is not None
+    assert _claim(Session, "worker-2") is not None
+    assert _claim(Session, "worker-3") is None
+
+
+def test_fair_share_interleaves_users(Session):
+    a_jobs = [_add_job(Session, "user-a", created_offset=index) for index in range(3)]
+    b_job = _add_job(Session, "user-b", created_offset=10)
+
+    # user-b's only job goes ahead of user-a's backlog once user-a has one running
+    assert _claim(Session, "worker-1") == a_jobs[0]
+    assert _claim(Session, "worker-2") == b_job
+    assert _claim(Session, "worker-3") == a_jobs[1]
+
+
+def _stale_candidates(monkeypatch, candidates):
+    # A worker that picked its candidates before another worker's claim committed
+    monkeypatch.setattr(job_queue, "select_claim_candidates", lambda *args, **kwargs: list(candidates))
+
+
+def test_claim_rechecks_global_cap(Session, monkeypatch):
+    monkeypatch.setattr(job_scheduler, "get_generation_queue_limits", lambda: _limits(global_concurrency=1))
+    _add_job(Session, "user-a", created_offset=0)
+    second = _add_job(Session, "user-b", created_offset=1)
+    with Session() as session:
+        stale = job_scheduler.select_claim_candidates(
+            session, job_queue._claimable_filter(datetime.datetime.now()), datetime.datetime.now()
+        )
+    assert [candidate.job_id for candidate in stale][-1] == second
+
+    assert _claim(Session, "worker-1") is not None
+    _stale_candidates(monkeypatch, stale)
+    assert _claim(Session, "worker-2") is None
+    assert _job(Session, second).status == "pending"
+
+
+def test_claim_rechecks_per_user_cap(Session, monkeypatch):
+    monkeypatch.setattr(job_scheduler, "get_generation_queue_limits", lambda: _limits(free_cap=1))
+    first = _add_job(Session, "user-a", created_offset=0)
+    second = _add_job(Session, "user-a", created_offset=1)
+
+    assert _claim(Session, "worker-1") == first
+    _stale_candidates(monkeypatch, [job_scheduler.ClaimCandidate(second, "user-a", user_cap=1, global_cap=10)])
+    assert _claim(Session, "worker-2") is None
+    assert _job(Session, second).status == "pending"
@@ -0,0 +1,75 @@
+import pytest
+
+from backend.utils import utils
+
+
+def _paragraphs(count: int) -> list:
+    return [f"Paragraph {index}. " + "The mitochondria is the powerhouse of the cell. " * 8 for index in range(count)]
+
+
+class _FakeExtractor:
+    """Stands in for PDFTextExtractor, yielding pages like iter_pages does."""
+
+    pages = []
+
+    def iter_pages(self, file_path):
+        yield from self.pages
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Roughly one paragraph per chunk, so a few pages make many chunks
+    monkeypatch.setattr(utils, "_CHUNK_MAX_TOKENS", 120)
+    monkeypatch.setattr(utils, "_CHUNK_OVERLAP_TOKENS", 0)
+    monkeypatch.setattr(utils, "PDFTextExtractor", _FakeExtractor)
+
+
+def _targets(pages, num_questions):
+    _FakeExtractor.pages = pages
+    return [target for _, target in utils._iter_pdf_quiz_chunks("doc.pdf", num_questions)]
+
+
+def _cached_pages(paragraphs):
+    # A text cache hit yields the whole document as one piece
+    return [(1, 1, "\n\n".join(paragraphs) + "\n\n")]
+
+
+def _uncached_pages(paragraphs, per_page=5):
+    groups = [paragraphs[start:start + per_page] for start in range(0, len(paragraphs), per_page)]
+    return [(index + 1, len(groups), "\n\n".join(group) + "\n\n") for index, group in enumerate(groups)]
+
+
+def test_cached_text_spreads_questions_across_chunks(small_chunks):
+    targets = _targets(_cached_pages(_paragraphs(25)), 10)
+
+    assert len(targets) > 10
+    assert sum(targets) == 10
+    assert max(targets) == 1
+
+
+def test_uncached_pages_give_every_question_out(small_chunks):
+    targets = _targets(_uncached_pages(_paragraphs(25)), 10)
+
+    assert len(targets) > 10
+    assert sum(targets) == 10
+    assert max(targets) == 1
+
+
+@pytest.mark.parametrize("pages", [_cached_pages, _uncached_pages])
+def test_targets_add_up_when_every_chunk_gets_questions(small_chunks, pages):
+    targets = _targets(pages(_paragraphs(25)), 60)
+
+    assert sum(targets) == 60
+    assert min(targets) >= 1
+
+
+def test_final_chunk_receives_the_remainder_after_trailing_empty_pages(small_chunks):
+    paragraphs = _paragraphs(10)
+    # iter_pages skips pages without text, so the last page reported is not the last page
+    pages = [(index + 1, 20, paragraph + "\n\n") for index, paragraph in enumerate(paragraphs)]
+
+    assert sum(_targets(pages, 7)) == 7
+
+
+def test_without_a_question_count_targets_are_none(small_chunks):
+    assert set(_targets(_cached_pages(_paragraphs(5)), None)) == {None}
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import threading
+
+from backend.utils import sse
+
+
+def _generate(gate, on_item=None):
+    on_item({"question": "first"})
+    gate.wait(timeout=5)
+    on_item({"question": "second"})
+    return {"questions": [{"question": "first"}, {"question": "second"}]}, {"total_tokens": 10}
+
+
+def _events(messages):
+    return [(message.split("\n")[0][len("event: "):], json.loads(message.split("\n")[1][len("data: "):])) for message in messages]
+
+
+def test_stream_sends_items_then_saved_result():
+    gate = threading.Event()
+    gate.set()
+    saved = []
+
+    def persist(result, token_usage):
+        saved.append(result)
+        return {"id": 7}
+
+    async def run():
+        return [message async for message in sse.stream_generation(_generate, gate, item_key="questions", persist=persist)]
+
+    events = _events(asyncio.run(run()))
+
+    assert [event for event, _ in events] == ["item", "item", "done"]
+    assert events[-1][1] == {"id": 7}
+    assert len(saved) == 1
+
+
+def test_result_is_saved_after_client_disconnects():
+    gate = threading.Event()
+    saved = threading.Event()
+
+    def persist(result, token_usage):
+        saved.set()
+        return {"id": 7}
+
+    async def run():
+        stream = sse.stream_generation(_generate, gate, item_key="questions", persist=persist)
+        assert (await stream.__anext__()).startswith("event: item")
+        # The client goes away while the model is still writing
+        await stream.aclose()
+        gate.set()
+        while sse._running_generations:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+    assert saved.is_set()